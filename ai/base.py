@@ -1,4 +1,7 @@
+import asyncio
 from abc import ABC, abstractmethod
+from typing import List
+
 from models.book import BookRecord
 
 
@@ -13,3 +16,27 @@ class AIProvider(ABC):
         Must NOT mutate input.
         """
         raise NotImplementedError
+
+    async def aenrich(self, record: BookRecord) -> BookRecord:
+        """
+        Async variant of enrich() with the same contract.
+        Providers with a native async client should override it;
+        the default runs enrich() in a worker thread.
+        """
+        return await asyncio.to_thread(self.enrich, record)
+
+    def for_tier(self, tier: str) -> "AIProvider":
+        """
+        Provider to use for an enrichment tier ("cheap" or "full").
+        Providers with a cheaper mode (smaller model, less reasoning)
+        return a variant for "cheap"; the default is the provider itself.
+        """
+        return self
+
+    def enrich_group(self, records: List[BookRecord]) -> List[BookRecord]:
+        """
+        Enrich volumes of one series together; returns NEW records in the
+        same order. Providers that can answer a group in one request
+        override it; the default enriches one by one.
+        """
+        return [self.enrich(record) for record in records]
@@ -0,0 +1,300 @@
+"""
+Offline batch enrichment for bulk backfills.
+
+export_batch() writes one provider request per book to JSONL files in
+the OpenAI Batch format, each within the Batch API's per-batch limits,
+and records the books in a BatchState next to them. A BatchBackend
+submits every file as its own batch and later returns its results file;
+ingest_results() turns every result line back into an AI BookRecord for
+the rest of the pipeline (see pipeline.batch).
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ai.providers import OpenAIProvider
+from models.book import BookRecord
+from models.serialize import book_record_from_dict, book_record_to_dict
+
+
+BATCH_ENDPOINT = "/v1/responses"
+
+# Batch API limits for one input file
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_BYTES = 200 * 1024 * 1024
+
+
+@dataclass
+class BatchState:
+    """What was exported and submitted; saved as JSON so a later run can ingest."""
+    # One batch per input file; batch_ids and output_files follow its order
+    input_files: List[str] = field(default_factory=list)
+    # custom_id -> scanner record (serialized BookRecord)
+    records: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    backend: Optional[str] = None
+    batch_ids: List[str] = field(default_factory=list)
+    status: str = "exported"
+    output_files: List[str] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, path: Path) -> "BatchState":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # A state saved when an export was a single file
+        for old, new in (("input_file", "input_files"), ("batch_id", "batch_ids"), ("output_file", "output_files")):
+            if old in data:
+                value = data.pop(old)
+                data[new] = [] if value is None else [value]
+        return cls(**data)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.__dict__, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    def record(self, custom_id: str) -> BookRecord:
+        return book_record_from_dict(self.records[custom_id])
+
+
+def export_batch(
+    records: Iterable[Tuple[BookRecord, BookRecord]],
+    directory: Path,
+    provider: Optional[OpenAIProvider] = None,
+    max_requests: int = MAX_BATCH_REQUESTS,
+    max_bytes: int = MAX_BATCH_BYTES,
+) -> BatchState:
+    """
+    Write batch input JSONL files (input-000.jsonl, ...): one request per
+    (scanner record, record with file metadata) pair, the prompt built
+    from the latter. Requests are streamed to disk; a file is closed
+    before it would pass max_requests lines or max_bytes.
+    """
+    provider = provider or OpenAIProvider()
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    state = BatchState()
+
+    f = None
+    lines = size = 0
+    try:
+        for n, (scanned, with_meta) in enumerate(records):
+            custom_id = f"book-{n}"
+            line = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": provider.batch_request(with_meta),
+            }
+            data = (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+
+            if f is None or lines >= max_requests or (lines and size + len(data) > max_bytes):
+                if f is not None:
+                    f.close()
+                input_file = directory / f"input-{len(state.input_files):03d}.jsonl"
+                f = open(input_file, "wb")
+                state.input_files.append(str(input_file))
+                lines = size = 0
+
+            f.write(data)
+            lines += 1
+            size += len(data)
+            state.records[custom_id] = book_record_to_dict(scanned)
+    finally:
+        if f is not None:
+            f.close()
+
+    return state
+
+
+def ingest_results(
+    output_file: Path,
+    state: BatchState,
+    provider: Optional[OpenAIProvider] = None,
+) -> Dict[str, BookRecord]:
+    """
+    AI record per custom_id from a batch results JSONL. Failed requests
+    give a record carrying the error, like a failed live call.
+    """
+    provider = provider or OpenAIProvider()
+    results: Dict[str, BookRecord] = {}
+
+    with open(output_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            custom_id = entry.get("custom_id")
+            if custom_id not in state.records:
+                continue
+
+            record = state.record(custom_id)
+            try:
+                raw = _response_json(entry)
+            except ValueError as e:
+                record.errors.append(f"openai batch: {e}")
+                results[custom_id] = record
+                continue
+
+            results[custom_id] = provider.batch_result(raw, record)
+
+    return results
+
+
+def _response_json(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """The model's JSON answer out of one batch output line."""
+    if entry.get("error"):
+        raise ValueError(str(entry["error"]))
+
+    response = entry.get("response") or {}
+    if response.get("status_code") != 200:
+        raise ValueError(f"status {response.get('status_code')}")
+
+    for item in (response.get("body") or {}).get("output") or []:
+        for content in item.get("content") or []:
+            if content.get("type") == "output_text":
+                return json.loads(content["text"])
+
+    raise ValueError("no output text")
+
+
+# =====================
+# Backends
+# =====================
+
+class BatchBackend(ABC):
+    name: str
+
+    @abstractmethod
+    def submit(self, input_file: Path) -> str:
+        """Upload input_file and start the batch; returns its id."""
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Provider status; "completed" once results can be fetched."""
+
+    @abstractmethod
+    def download(self, batch_id: str, output_file: Path) -> Path:
+        """Save the results JSONL to output_file."""
+
+
+class OpenAIBatchBackend(BatchBackend):
+    name = "openai"
+
+    def __init__(self, client=None):
+        self._client = client
+
+    def _get_client(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            api_key = os.environ.get("OPENAI_API_KEY")
+            if not api_key:
+                raise RuntimeError("OPENAI_API_KEY is not set")
+            self._client = OpenAI(api_key=api_key)
+        return self._client
+
+    def submit(self, input_file: Path) -> str:
+        client = self._get_client()
+        with open(input_file, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self._get_client().batches.retrieve(batch_id).status
+
+    def download(self, batch_id: str, output_file: Path) -> Path:
+        client = self._get_client()
+        batch = client.batches.retrieve(batch_id)
+        if not batch.output_file_id:
+            raise RuntimeError(f"batch {batch_id} has no output file (status {batch.status})")
+        Path(output_file).write_bytes(client.files.content(batch.output_file_id).content)
+        return Path(output_file)
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    File-based stand-in for the batch endpoint. submit() copies the input
+    into `directory`; the batch completes on the first status() call,
+    answering every request with `respond(body) -> JSON answer` (by
+    default a live OpenAIProvider call, so a batch file can also be
+    replayed without the Batch API).
+    """
+    name = "local"
+
+    def __init__(self, directory: Path, respond: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._respond = respond
+
+    def submit(self, input_file: Path) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        shutil.copyfile(input_file, self.directory / f"{batch_id}.input.jsonl")
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        output = self.directory / f"{batch_id}.output.jsonl"
+        if not output.exists():
+            self._run(batch_id, output)
+        return "completed"
+
+    def download(self, batch_id: str, output_file: Path) -> Path:
+        self.status(batch_id)
+        shutil.copyfile(self.directory / f"{batch_id}.output.jsonl", output_file)
+        return Path(output_file)
+
+    def _run(self, batch_id: str, output: Path) -> None:
+        respond = self._respond or OpenAIProvider()._send
+        lines: List[str] = []
+
+        with open(self.directory / f"{batch_id}.input.jsonl", "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                lines.append(json.dumps(_local_result(request, respond), ensure_ascii=False))
+
+        tmp = output.with_name(output.name + ".tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, output)
+
+
+def _local_result(request: Dict[str, Any], respond: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+    """One output line in the Batch API format."""
+    try:
+        answer = respond(request["body"])
+    except Exception as e:
+        return {"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}}
+
+    body = {
+        "object": "response",
+        "created_at": int(time.time()),
+        "output": [{
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": json.dumps(answer, ensure_ascii=False)}],
+        }],
+    }
+    return {"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}, "error": None}
+
+
+def backend_from_env(state_dir: Path) -> BatchBackend:
+    """AI_BATCH_BACKEND: openai (default) or local (files under state_dir/local)."""
+    name = os.environ.get("AI_BATCH_BACKEND", "openai")
+    if name == "openai":
+        return OpenAIBatchBackend()
+    if name == "local":
+        return LocalBatchBackend(Path(state_dir) / "local")
+    raise RuntimeError(f"unknown AI_BATCH_BACKEND: {name}")
@@ -0,0 +1,233 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+_ACCESS_INDEX = "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)"
+
+
+# Set while a call must not wait on an identical in-flight request
+_INDEPENDENT = contextvars.ContextVar("ai_cache_independent", default=False)
+
+
+@contextmanager
+def independent_calls() -> Iterator[None]:
+    """
+    Calls made inside still use cached answers but do not join an
+    identical in-flight request: a hedged backup exists to race the
+    primary, not to wait for it.
+    """
+    token = _INDEPENDENT.set(True)
+    try:
+        yield
+    finally:
+        _INDEPENDENT.reset(token)
+
+
+def cache_key(provider: str, request: Dict[str, Any]) -> str:
+    """
+    Hash of everything that determines the answer: provider name and the
+    request (model, options, system prompt, user prompt, response schema).
+    Prompts are normalized so whitespace-only changes still hit.
+    """
+    normalized = {
+        name: _normalize_text(value) if isinstance(value, str) else value
+        for name, value in request.items()
+    }
+    payload = json.dumps([provider, normalized], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _normalize_text(text: str) -> str:
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+class ResponseCache:
+    """
+    Disk cache of parsed AI responses (SQLite), with a TTL and LRU
+    eviction beyond max_entries.
+
+    get_or_call() / aget_or_call() also collapse identical in-flight
+    requests: while one caller waits on the provider, others asking for
+    the same key wait for its answer instead of paying for another call.
+    Only successful calls are cached, and with should_cache only answers
+    it accepts: a malformed answer is shared with the callers waiting on
+    it but asked for again next time.
+    """
+
+    def __init__(self, db_path: Path, ttl_seconds: float = 30 * 86400.0, max_entries: int = 10000):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute(_ACCESS_INDEX)
+        self._conn.commit()
+
+        self._flights: Dict[str, Future] = {}
+        self._aflights: Dict[Tuple[int, str], asyncio.Future] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """Cache at AI_CACHE_PATH, or None when it is not set."""
+        path = os.environ.get("AI_CACHE_PATH")
+        if not path:
+            return None
+        return cls(
+            Path(path),
+            ttl_seconds=float(os.environ.get("AI_CACHE_TTL_SECONDS", str(30 * 86400))),
+            max_entries=int(os.environ.get("AI_CACHE_MAX_ENTRIES", "10000")),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if self.ttl_seconds > 0 and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+        return json.loads(value)
+
+    def put(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            if self.max_entries > 0:
+                # Least recently used first
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _store(self, key: str, value: Any, should_cache: Optional[Callable[[Any], bool]]) -> None:
+        if should_cache is None or should_cache(value):
+            self.put(key, value)
+
+    def get_or_call(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        should_cache: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        if _INDEPENDENT.get():
+            value = fn()
+            self._store(key, value, should_cache)
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+
+        if not leader:
+            return flight.result()
+
+        try:
+            # An earlier leader may have finished since the first lookup
+            value = self.get(key)
+            if value is None:
+                value = fn()
+                self._store(key, value, should_cache)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    async def aget_or_call(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        should_cache: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            return cached
+
+        if _INDEPENDENT.get():
+            value = await fn()
+            await asyncio.to_thread(self._store, key, value, should_cache)
+            return value
+
+        # Futures belong to one event loop: in-flight calls are shared per loop
+        flight_key = (id(asyncio.get_running_loop()), key)
+        while (flight := self._aflights.get(flight_key)) is not None:
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                # The leader was cancelled (e.g. it lost a hedge race):
+                # take over unless this caller is the one cancelled
+                if not flight.cancelled():
+                    raise
+
+        flight = self._aflights[flight_key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await asyncio.to_thread(self.get, key)
+            if value is None:
+                value = await fn()
+                await asyncio.to_thread(self._store, key, value, should_cache)
+            flight.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Nobody may be waiting: don't log "exception never retrieved"
+            flight.exception()
+            raise
+        finally:
+            del self._aflights[flight_key]
@@ -0,0 +1,95 @@
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from ai.parse.book_metadata import parse_book_metadata
+
+
+@dataclass(frozen=True)
+class CascadeTier:
+    model: str
+    effort: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.model}:{self.effort}"
+
+
+def parse_cascade(spec: str, default_model: str) -> List[CascadeTier]:
+    """
+    "gpt-5-mini:low,gpt-5.2:high" -> tiers, cheapest first.
+    A tier without a model (":medium") uses default_model.
+    """
+    tiers = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        model, sep, effort = part.rpartition(":")
+        if not sep or not effort:
+            raise ValueError(f"cascade tier needs model:effort, got {part!r}")
+        tiers.append(CascadeTier(model or default_model, effort))
+    return tiers
+
+
+def cascade_from_env(default_model: str) -> List[CascadeTier]:
+    """OPENAI_CASCADE; empty when unset (one call, no cascade)."""
+    return parse_cascade(os.environ.get("OPENAI_CASCADE", ""), default_model)
+
+
+def min_confidence() -> float:
+    return float(os.environ.get("OPENAI_CASCADE_MIN_CONFIDENCE", "0.8"))
+
+
+def accepts(raw: Any, threshold: float) -> bool:
+    """An answer good enough to stop at: valid, with an edition, confident enough."""
+    parsed, errors = parse_book_metadata(raw)
+    if errors or not parsed.get("edition"):
+        return False
+    return parsed.get("confidence", 0.0) >= threshold
+
+
+@dataclass
+class TierStats:
+    calls: int = 0
+    accepted: int = 0
+    seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.accepted / self.calls if self.calls else 0.0
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.seconds / self.calls if self.calls else 0.0
+
+
+@dataclass
+class CascadeStats:
+    tiers: Dict[str, TierStats] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, tier: str, seconds: float, accepted: bool) -> None:
+        with self._lock:
+            stats = self.tiers.setdefault(tier, TierStats())
+            stats.calls += 1
+            stats.accepted += accepted
+            stats.seconds += seconds
+
+    def snapshot(self) -> Dict[str, TierStats]:
+        with self._lock:
+            return {name: TierStats(s.calls, s.accepted, s.seconds) for name, s in self.tiers.items()}
+
+    def summary(self) -> str:
+        return " ".join(
+            f"{name}={s.calls}calls/{s.hit_rate:.0%}hit/{s.mean_seconds:.1f}s"
+            for name, s in self.snapshot().items()
+        )
+
+
+_STATS = CascadeStats()
+
+
+def get_cascade_stats() -> CascadeStats:
+    return _STATS
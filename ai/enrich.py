@@ -1,9 +1,40 @@
 from models.book import BookRecord
 import ai.providers  # triggers provider registration
-from ai.registry import get
+from ai.registry import get, get_hedger
 import copy
+from typing import List
 
-def enrich(record: BookRecord, provider_name: str) -> BookRecord:
-    provider = get(provider_name)
-    record_copy = copy.deepcopy(record)
-    return provider.enrich(record_copy)
+
+def enrich(record: BookRecord, provider_name: str, tier: str = "full") -> BookRecord:
+    provider = get(provider_name).for_tier(tier)
+    hedger = get_hedger()
+    if hedger is None:
+        record_copy = copy.deepcopy(record)
+        return provider.enrich(record_copy)
+
+    backup = get(hedger.backup_provider or provider_name).for_tier(tier)
+    return hedger.call(
+        lambda: provider.enrich(copy.deepcopy(record)),
+        lambda: backup.enrich(copy.deepcopy(record)),
+        known_errors=len(record.errors),
+    )
+
+
+async def aenrich(record: BookRecord, provider_name: str, tier: str = "full") -> BookRecord:
+    provider = get(provider_name).for_tier(tier)
+    hedger = get_hedger()
+    if hedger is None:
+        record_copy = copy.deepcopy(record)
+        return await provider.aenrich(record_copy)
+
+    backup = get(hedger.backup_provider or provider_name).for_tier(tier)
+    return await hedger.acall(
+        lambda: provider.aenrich(copy.deepcopy(record)),
+        lambda: backup.aenrich(copy.deepcopy(record)),
+        known_errors=len(record.errors),
+    )
+
+
+def enrich_group(records: List[BookRecord], provider_name: str, tier: str = "full") -> List[BookRecord]:
+    provider = get(provider_name).for_tier(tier)
+    return provider.enrich_group([copy.deepcopy(record) for record in records])
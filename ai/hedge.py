@@ -0,0 +1,199 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Optional
+
+from ai.cache import independent_calls
+from models.book import BookRecord
+
+
+@dataclass
+class HedgeStats:
+    calls: int = 0
+    hedges: int = 0
+    # Hedges whose answer was used
+    wins: int = 0
+
+    def summary(self) -> str:
+        rate = self.hedges / self.calls if self.calls else 0.0
+        return f"calls={self.calls} hedged={self.hedges} ({rate:.1%}) won={self.wins}"
+
+
+def valid(record: Optional[BookRecord], known_errors: int = 0) -> bool:
+    """An AI answer that added no errors to the `known_errors` the input already had."""
+    return record is not None and len(record.errors) <= known_errors and record.source == "ai"
+
+
+class Hedger:
+    """
+    Hedged AI calls: when the primary call has not answered by the
+    `percentile` of recent latencies, a backup call is started (same or
+    another provider) and the first valid answer wins; the loser is
+    cancelled (async) or its answer dropped (threads cannot be killed).
+
+    Until min_samples latencies are known the delay is default_delay.
+    Hedges are capped at `budget` (a share of all calls). Backups bypass
+    the response cache's in-flight sharing, which would otherwise make
+    them wait on the very call they race.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        budget: float = 0.05,
+        default_delay: float = 30.0,
+        min_samples: int = 20,
+        window: int = 200,
+        backup_provider: Optional[str] = None,
+    ):
+        self.percentile = percentile
+        self.budget = budget
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.backup_provider = backup_provider
+
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._stats = HedgeStats()
+        # Every hedged call runs on the pool: size it above any sane
+        # WATCH_CONCURRENCY so primaries never queue behind each other
+        self._pool = ThreadPoolExecutor(max_workers=128, thread_name_prefix="ai-hedge")
+
+    @classmethod
+    def from_env(cls) -> Optional["Hedger"]:
+        """Hedger configured by AI_HEDGE_* variables; None unless AI_HEDGE=1."""
+        if os.environ.get("AI_HEDGE") != "1":
+            return None
+        return cls(
+            percentile=float(os.environ.get("AI_HEDGE_PERCENTILE", "0.95")),
+            budget=float(os.environ.get("AI_HEDGE_BUDGET", "0.05")),
+            default_delay=float(os.environ.get("AI_HEDGE_DELAY_SECONDS", "30")),
+            min_samples=int(os.environ.get("AI_HEDGE_MIN_SAMPLES", "20")),
+            backup_provider=os.environ.get("AI_HEDGE_PROVIDER") or None,
+        )
+
+    def delay(self) -> float:
+        """Seconds to wait for the primary before hedging."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.default_delay
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+
+    def stats(self) -> HedgeStats:
+        with self._lock:
+            return HedgeStats(self._stats.calls, self._stats.hedges, self._stats.wins)
+
+    def call(
+        self,
+        primary: Callable[[], BookRecord],
+        backup: Callable[[], BookRecord],
+        known_errors: int = 0,
+    ) -> BookRecord:
+        """`known_errors`: errors already on the input record, which do not make an answer invalid."""
+        self._count_call()
+        first = self._timed(primary)
+        future = self._pool.submit(first)
+
+        done, _ = wait([future], timeout=self.delay())
+        if done or not self._allow_hedge():
+            return future.result()
+
+        second = self._pool.submit(_independent(backup))
+        pending = {future, second}
+        fallback: Optional[Future] = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for finished in done:
+                if finished.exception() is None and valid(finished.result(), known_errors):
+                    for loser in pending:
+                        loser.cancel()
+                    if finished is second:
+                        self._count_win()
+                    return finished.result()
+                fallback = fallback or finished
+
+        # Neither answer is valid: report the primary's
+        return future.result() if future.exception() is None else fallback.result()
+
+    async def acall(
+        self,
+        primary: Callable[[], Awaitable[BookRecord]],
+        backup: Callable[[], Awaitable[BookRecord]],
+        known_errors: int = 0,
+    ) -> BookRecord:
+        self._count_call()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        first = asyncio.ensure_future(primary())
+        # Also when a winning backup cancels it: the primary took at least
+        # that long, and leaving it out would bias the percentile low
+        first.add_done_callback(lambda _: self._observe(loop.time() - started))
+
+        done, _ = await asyncio.wait({first}, timeout=self.delay())
+        if done or not self._allow_hedge():
+            return await first
+
+        with independent_calls():
+            # The task copies the context now
+            second = asyncio.ensure_future(backup())
+        pending = {first, second}
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for finished in done:
+                if finished.exception() is None and valid(finished.result(), known_errors):
+                    for loser in pending:
+                        loser.cancel()
+                    if finished is second:
+                        self._count_win()
+                    return finished.result()
+
+        if first.exception() is None:
+            return first.result()
+        return await second
+
+    # ---------------- helpers ----------------
+
+    def _timed(self, fn: Callable[[], BookRecord]) -> Callable[[], BookRecord]:
+        # Runs to the end even when the backup wins: threads cannot be cancelled
+        def run() -> BookRecord:
+            started = time.monotonic()
+            try:
+                return fn()
+            finally:
+                self._observe(time.monotonic() - started)
+
+        return run
+
+    def _observe(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _count_call(self) -> None:
+        with self._lock:
+            self._stats.calls += 1
+
+    def _count_win(self) -> None:
+        with self._lock:
+            self._stats.wins += 1
+
+    def _allow_hedge(self) -> bool:
+        with self._lock:
+            if self._stats.hedges + 1 > self.budget * self._stats.calls:
+                return False
+            self._stats.hedges += 1
+            return True
+
+
+def _independent(fn: Callable[[], BookRecord]) -> Callable[[], BookRecord]:
+    def run() -> BookRecord:
+        with independent_calls():
+            return fn()
+
+    return run
@@ -0,0 +1,92 @@
+import os
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+from models.book import BookRecord
+
+
+class _Batch:
+    def __init__(self):
+        self.items: List[Tuple[BookRecord, Future]] = []
+        self.closed = threading.Event()
+
+
+class PromptPacker:
+    """
+    Packs concurrent enrich() calls into one multi-book request.
+
+    The first caller opens a batch and waits up to wait_seconds for
+    others to join; a batch that reaches `size` books, or holds every one
+    of the `callers` that can submit at once, is sent at once (a lone
+    caller never waits). `send` enriches a list of records and returns
+    them in order.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[List[BookRecord]], List[BookRecord]],
+        size: int,
+        wait_seconds: float = 0.2,
+        callers: Optional[int] = None,
+    ):
+        self.size = size
+        self.wait_seconds = wait_seconds
+        self.callers = callers
+        self._send = send
+        self._lock = threading.Lock()
+        self._open: Optional[_Batch] = None
+
+    @classmethod
+    def from_env(cls, send: Callable[[List[BookRecord]], List[BookRecord]]) -> Optional["PromptPacker"]:
+        """
+        Packer for AI_PACK_SIZE books (None when it is 1 or unset), waiting
+        AI_PACK_WAIT_MS for the other WATCH_CONCURRENCY jobs.
+        """
+        size = int(os.environ.get("AI_PACK_SIZE", "1"))
+        if size <= 1:
+            return None
+        return cls(
+            send,
+            size,
+            float(os.environ.get("AI_PACK_WAIT_MS", "200")) / 1000,
+            callers=int(os.environ.get("WATCH_CONCURRENCY", "1")),
+        )
+
+    @property
+    def _full(self) -> int:
+        return min(self.size, self.callers) if self.callers is not None else self.size
+
+    def submit(self, record: BookRecord) -> BookRecord:
+        future: Future = Future()
+
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            batch.items.append((record, future))
+            if len(batch.items) >= self._full:
+                batch.closed.set()
+                self._open = None
+
+        if leader:
+            batch.closed.wait(self.wait_seconds)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            self._flush(batch)
+
+        return future.result()
+
+    def _flush(self, batch: _Batch) -> None:
+        records = [record for record, _ in batch.items]
+        try:
+            results = self._send(records)
+        except BaseException as e:
+            for _, future in batch.items:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch.items, results):
+            future.set_result(result)
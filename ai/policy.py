@@ -0,0 +1,136 @@
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence, Tuple
+
+from models.book import BookRecord
+
+
+# Enrichment tiers, cheapest first
+TIERS = ("skip", "cheap", "full")
+
+# Fields counted by the completeness score; "isbn" means a valid ISBN-10/13
+SCORED_FIELDS = (
+    "title", "authors", "language", "series", "isbn",
+    "publisher", "published", "description", "tags",
+)
+
+
+def isbn_valid(value: Optional[str]) -> bool:
+    """ISBN-10 or ISBN-13 with a correct check digit (hyphens/spaces ignored)."""
+    if not value:
+        return False
+    digits = value.replace("-", "").replace(" ", "").upper()
+
+    if len(digits) == 13 and digits.isdigit():
+        total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits))
+        return total % 10 == 0
+
+    if len(digits) == 10 and digits[:9].isdigit() and (digits[9].isdigit() or digits[9] == "X"):
+        total = sum((10 - i) * (10 if d == "X" else int(d)) for i, d in enumerate(digits))
+        return total % 11 == 0
+
+    return False
+
+
+def has_field(record: BookRecord, name: str) -> bool:
+    if name == "isbn":
+        return isbn_valid(record.isbn13) or isbn_valid(record.isbn10)
+    if name == "published":
+        return record.published is not None or record.year is not None
+    value = getattr(record, name, None)
+    return value is not None and value != "" and value != []
+
+
+@dataclass
+class PolicyStats:
+    decisions: Dict[str, int] = field(default_factory=lambda: {tier: 0 for tier in TIERS})
+    # Mean latency of a full enrichment, used to price the skipped ones
+    full_seconds: float = 0.0
+    full_calls: int = 0
+    saved_seconds: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return sum(self.decisions.values())
+
+    @property
+    def skip_rate(self) -> float:
+        return self.decisions["skip"] / self.total if self.total else 0.0
+
+    def summary(self) -> str:
+        counts = " ".join(f"{tier}={n}" for tier, n in self.decisions.items())
+        return f"{counts} skip_rate={self.skip_rate:.0%} saved={self.saved_seconds:.1f}s"
+
+
+class AIPolicy:
+    """
+    Decides, from the cleaned file metadata, how much AI a book needs.
+
+    skip:  every required field is present, no ISBN is invalid and the
+           completeness score (share of SCORED_FIELDS present) reaches
+           skip_score;
+    cheap: the score reaches cheap_score, the provider only fills gaps;
+    full:  anything else.
+    """
+
+    def __init__(
+        self,
+        required: Sequence[str] = ("title", "authors", "language"),
+        skip_score: float = 0.8,
+        cheap_score: float = 0.5,
+    ):
+        self.required = tuple(required)
+        self.skip_score = skip_score
+        self.cheap_score = cheap_score
+
+        self._lock = threading.Lock()
+        self._stats = PolicyStats()
+
+    @classmethod
+    def from_env(cls) -> Optional["AIPolicy"]:
+        """Policy configured by AI_POLICY_* variables; None unless AI_POLICY=1."""
+        if os.environ.get("AI_POLICY") != "1":
+            return None
+        required = os.environ.get("AI_POLICY_REQUIRED", "title,authors,language")
+        return cls(
+            required=[f.strip() for f in required.split(",") if f.strip()],
+            skip_score=float(os.environ.get("AI_POLICY_SKIP_SCORE", "0.8")),
+            cheap_score=float(os.environ.get("AI_POLICY_CHEAP_SCORE", "0.5")),
+        )
+
+    def score(self, record: BookRecord) -> float:
+        return sum(has_field(record, name) for name in SCORED_FIELDS) / len(SCORED_FIELDS)
+
+    def evaluate(self, record: BookRecord) -> Tuple[str, str]:
+        """Returns (tier, reason)."""
+        score = self.score(record)
+        missing = [name for name in self.required if not has_field(record, name)]
+        invalid_isbn = any(v and not isbn_valid(v) for v in (record.isbn13, record.isbn10))
+
+        if missing:
+            reason = f"missing {', '.join(missing)}, score {score:.2f}"
+        elif invalid_isbn:
+            reason = f"invalid ISBN, score {score:.2f}"
+        elif score >= self.skip_score:
+            return "skip", f"score {score:.2f}"
+        else:
+            reason = f"score {score:.2f}"
+
+        return ("cheap" if score >= self.cheap_score else "full"), reason
+
+    def record(self, tier: str, seconds: Optional[float] = None) -> None:
+        """Count a decision; `seconds` is the enrichment latency when AI ran."""
+        with self._lock:
+            stats = self._stats
+            stats.decisions[tier] += 1
+            if tier == "full" and seconds is not None:
+                stats.full_calls += 1
+                stats.full_seconds += (seconds - stats.full_seconds) / stats.full_calls
+            elif tier == "skip":
+                stats.saved_seconds += stats.full_seconds
+
+    def stats(self) -> PolicyStats:
+        with self._lock:
+            s = self._stats
+            return PolicyStats(dict(s.decisions), s.full_seconds, s.full_calls, s.saved_seconds)
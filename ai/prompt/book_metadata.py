@@ -70,20 +70,26 @@ def build_book_metadata_prompt(record: BookRecord) -> str:
             + " / ".join(record.directories)
         )
 
+    lines.extend(_existing_metadata_lines(record))
+
+    lines.append("}")
+
+    return "\n".join(lines)
+
+
+def _existing_metadata_lines(record: BookRecord, indent: str = "") -> list[str]:
+    lines: list[str] = []
+
     # --- Existing edition (dynamically from schema) ---
     edition_fields = get_edition_fields()
     edition_values = _extract_edition_values(record, edition_fields)
 
     if edition_values:
-        lines.append("\nExisting edition metadata:")
+        lines.append(f"\n{indent}Existing edition metadata:")
         for field_name, field_def in edition_fields.items():
             value = edition_values.get(field_name)
             if value is not None:
-                label = get_prompt_label(field_def)
-                if isinstance(value, list):
-                    lines.append(f"- {label}: {', '.join(str(v) for v in value)}")
-                else:
-                    lines.append(f"- {label}: {value}")
+                lines.append(f"{indent}- {_label_value(field_def, value)}")
 
     # --- Existing original (dynamically from schema) ---
     original_fields = get_original_fields()
@@ -91,20 +97,138 @@ def build_book_metadata_prompt(record: BookRecord) -> str:
         original_values = _extract_original_values(record, original_fields)
 
         if original_values:
-            lines.append("\nExisting original work metadata:")
+            lines.append(f"\n{indent}Existing original work metadata:")
             for field_name, field_def in original_fields.items():
                 value = original_values.get(field_name)
                 if value is not None:
-                    label = get_prompt_label(field_def)
-                    if isinstance(value, list):
-                        lines.append(f"- {label}: {', '.join(str(v) for v in value)}")
-                    else:
-                        lines.append(f"- {label}: {value}")
+                    lines.append(f"{indent}- {_label_value(field_def, value)}")
+
+    return lines
+
+
+def _label_value(field_def: dict, value) -> str:
+    label = get_prompt_label(field_def)
+    if isinstance(value, list):
+        return f"{label}: {', '.join(str(v) for v in value)}"
+    return f"{label}: {value}"
 
-    lines.append("}")
+
+# =====================
+# Series groups
+# =====================
+
+# Edition fields a whole series shares: asked for once per group
+SHARED_EDITION_FIELDS = ("authors", "series", "series_total", "language", "publisher")
+
+
+def build_group_system_prompt() -> str:
+    return build_system_prompt() + (
+        "\nThe request lists several files from one directory, usually volumes of one series. "
+        "Return the fields all volumes share once in 'shared' (universe: the fictional universe "
+        "or cycle the series belongs to, empty string if none) and one entry per file in 'volumes', "
+        "identified by its file number. "
+    )
+
+
+def build_group_metadata_prompt(records: list[BookRecord]) -> str:
+    """One prompt for a group of files sharing a directory: the context is given once."""
+    lines: list[str] = []
+
+    lines.append("\nKnown shared context:")
+    if records[0].directories:
+        lines.append("- Directory context: " + " / ".join(records[0].directories))
+
+    lines.append("\nFiles:")
+    for number, record in enumerate(records):
+        lines.append(f"\n[{number}] Filename: {record.original_filename}")
+        lines.extend(_existing_metadata_lines(record, indent="    "))
 
     return "\n".join(lines)
 
+
+def get_group_response_format() -> dict:
+    """
+    Grouped variant of the v2 contract: shared series fields once,
+    per-volume edition data without them, original and confidence.
+    """
+    single = get_response_format()["format"]["schema"]
+    edition = single["properties"]["edition"]
+
+    shared_props = {name: edition["properties"][name] for name in SHARED_EDITION_FIELDS}
+    shared_props["universe"] = {
+        "type": "string",
+        "description": "Fictional universe or cycle of the series; empty string if none.",
+    }
+    volume_props = {
+        name: field for name, field in edition["properties"].items() if name not in SHARED_EDITION_FIELDS
+    }
+
+    volume = {
+        "type": "object",
+        "properties": {
+            "file": {"type": "integer", "description": "Number of the file in the request."},
+            "edition": {
+                "type": "object",
+                "properties": volume_props,
+                "required": list(volume_props),
+                "additionalProperties": False,
+            },
+            "original": single["properties"]["original"],
+            "confidence": single["properties"]["confidence"],
+        },
+        "required": ["file", "edition", "original", "confidence"],
+        "additionalProperties": False,
+    }
+
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": "book_series_info",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "shared": {
+                        "type": "object",
+                        "properties": shared_props,
+                        "required": list(shared_props),
+                        "additionalProperties": False,
+                    },
+                    "volumes": {"type": "array", "items": volume},
+                },
+                "required": ["shared", "volumes"],
+                "additionalProperties": False,
+            },
+        }
+    }
+
+
+def split_group_response(data: dict, count: int) -> list:
+    """
+    Fan a grouped response back out into single-book responses (the v2
+    contract), one per requested file; None for files it does not cover.
+    """
+    shared = dict(data.get("shared") or {})
+    universe = shared.pop("universe", None)
+
+    responses: list = [None] * count
+    for volume in data.get("volumes") or []:
+        number = volume.get("file")
+        if not isinstance(number, int) or not 0 <= number < count:
+            continue
+
+        edition = {**shared, **(volume.get("edition") or {})}
+        if universe and isinstance(edition.get("tags"), list) and universe not in edition["tags"]:
+            edition["tags"] = edition["tags"] + [universe]
+
+        responses[number] = {
+            "edition": edition,
+            "original": volume.get("original"),
+            "confidence": volume.get("confidence"),
+        }
+    return responses
+
+
 def _extract_edition_values(record: BookRecord, edition_fields: dict) -> dict:
     """Extract edition values from BookRecord based on schema fields"""
     values = {}
@@ -135,3 +259,56 @@ def _extract_original_values(record: BookRecord, original_fields: dict) -> dict:
             values[field_name] = value
 
     return values
+
+
+# =====================
+# Packed requests
+# =====================
+
+def build_packed_system_prompt() -> str:
+    return build_system_prompt() + (
+        "\nThe request lists several unrelated books, each introduced by its request id in brackets. "
+        "Identify each book on its own and return one entry per book in 'books', with its request id. "
+    )
+
+
+def build_packed_metadata_prompt(records: dict[str, BookRecord]) -> str:
+    """Several unrelated books in one prompt, keyed by request id."""
+    parts = [f"\n[{request_id}]" + build_book_metadata_prompt(record) for request_id, record in records.items()]
+    return "\n".join(parts)
+
+
+def get_packed_response_format() -> dict:
+    """Wrapper around the v2 contract: an array of book_metadata.v2 objects with their request id."""
+    single = get_response_format()["format"]["schema"]
+    book = {
+        "type": "object",
+        "properties": {"id": {"type": "string", "description": "Request id of the book."}, **single["properties"]},
+        "required": ["id"] + list(single["required"]),
+        "additionalProperties": False,
+    }
+
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": "book_edition_info_packed",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {"books": {"type": "array", "items": book}},
+                "required": ["books"],
+                "additionalProperties": False,
+            },
+        }
+    }
+
+
+def split_packed_response(data: dict) -> dict:
+    """Single-book (v2) responses by request id; entries without an id are dropped."""
+    responses = {}
+    for entry in (data.get("books") if isinstance(data, dict) else None) or []:
+        if not isinstance(entry, dict) or not isinstance(entry.get("id"), str):
+            continue
+        entry = dict(entry)
+        responses[entry.pop("id")] = entry
+    return responses
@@ -1,13 +1,34 @@
+import asyncio
 import os
 import json
+import time
 from copy import deepcopy
-from typing import Any, Dict, Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional
 
-from openai import OpenAI
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, OpenAI
 
 from ai.base import AIProvider
+from ai.cache import cache_key
+from ai.cascade import CascadeTier, accepts, cascade_from_env, get_cascade_stats, min_confidence
+from ai.packing import PromptPacker
+from ai.rate_limit import RetryableError
+from ai.registry import get_cache, get_limiter
 from ai.parse.book_metadata import parse_book_metadata
-from ai.prompt.book_metadata import build_book_metadata_prompt, build_system_prompt, get_response_format
+from ai.prompt.book_metadata import (
+    build_book_metadata_prompt,
+    build_group_metadata_prompt,
+    build_group_system_prompt,
+    build_packed_metadata_prompt,
+    build_packed_system_prompt,
+    build_system_prompt,
+    get_group_response_format,
+    get_packed_response_format,
+    get_response_format,
+    split_group_response,
+    split_packed_response,
+)
 from ai.contracts.schema_loader import get_edition_fields, get_original_fields
 from models.book import BookRecord, OriginalWork
 
@@ -15,62 +36,332 @@ from models.book import BookRecord, OriginalWork
 class OpenAIProvider(AIProvider):
     name = "openai"
 
-    def __init__(self) -> None:
+    def __init__(self, tier: str = "full") -> None:
+        # "cheap": OPENAI_CHEAP_MODEL with OPENAI_CHEAP_REASONING_EFFORT
+        self.tier = tier
+        self._cheap: Optional["OpenAIProvider"] = None
+        # AI_PACK_SIZE > 1: concurrent calls share one packed request
+        self._packer: Optional[PromptPacker] = None
+        self._packer_loaded = False
         self._client: Optional[OpenAI] = None
+        # One pooled keep-alive client per event loop: httpx connections
+        # cannot be shared between loops.
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def for_tier(self, tier: str) -> "OpenAIProvider":
+        if tier != "cheap" or self.tier == "cheap":
+            return self
+        if self._cheap is None:
+            self._cheap = OpenAIProvider(tier="cheap")
+        return self._cheap
 
     def enrich(self, record: BookRecord) -> BookRecord:
+        packer = self._get_packer()
+        if packer is not None:
+            return packer.submit(record)
+        return self._enrich_one(record)
+
+    def _enrich_one(self, record: BookRecord) -> BookRecord:
         result = deepcopy(record)
 
         try:
             raw = self._call_openai(record)
-            parsed, errors = parse_book_metadata(raw)
+            self._apply_response(raw, result)
+        except Exception as e:
+            result.errors.append(f"openai: {e}")
+
+        return result
 
-            result.errors.extend(errors)
+    async def aenrich(self, record: BookRecord) -> BookRecord:
+        if self._get_packer() is not None:
+            # Packing collects concurrent callers on threads
+            return await asyncio.to_thread(self.enrich, record)
 
-            if parsed:
-                self._apply(parsed, result)
+        result = deepcopy(record)
 
+        try:
+            raw = await self._acall_openai(record)
+            self._apply_response(raw, result)
         except Exception as e:
             result.errors.append(f"openai: {e}")
 
         return result
 
+    def enrich_group(self, records: List[BookRecord]) -> List[BookRecord]:
+        """
+        One request for the whole group; each volume's answer is applied
+        as a single-book response. Volumes the answer misses, or a failed
+        call, fall back to one request per book.
+        """
+        results = [deepcopy(record) for record in records]
+
+        try:
+            raw = self._send(
+                self._build_group_request(records),
+                lambda answer: all(map(_valid_answer, split_group_response(answer, len(records)))),
+            )
+            responses = split_group_response(raw, len(records))
+        except Exception as e:
+            print(f"[openai] grouped request failed, enriching one by one: {e}")
+            responses = [None] * len(records)
+
+        missing = [i for i, response in enumerate(responses) if response is None]
+        for i, response in enumerate(responses):
+            if response is not None:
+                self._apply_response(response, results[i])
+
+        if missing and self._get_packer() is not None:
+            for i, result in zip(missing, self.enrich_many([records[i] for i in missing])):
+                results[i] = result
+        else:
+            for i in missing:
+                results[i] = self._enrich_one(records[i])
+
+        return results
+
+    def enrich_many(self, records: List[BookRecord]) -> List[BookRecord]:
+        """
+        Unrelated books packed into one request, keyed by request id.
+        Each entry is validated with parse_book_metadata; a book whose
+        entry is missing or malformed gets its own single-book call.
+        """
+        if len(records) == 1:
+            return [self._enrich_one(records[0])]
+
+        packed = {f"b{i}": record for i, record in enumerate(records)}
+
+        def complete(answer: Any) -> bool:
+            entries = split_packed_response(answer)
+            return all(_valid_answer(entries.get(request_id)) for request_id in packed)
+
+        try:
+            responses = split_packed_response(self._send(self._build_packed_request(packed), complete))
+        except Exception as e:
+            print(f"[openai] packed request failed, enriching one by one: {e}")
+            responses = {}
+
+        results = []
+        for request_id, record in packed.items():
+            raw = responses.get(request_id)
+            if not _valid_answer(raw):
+                results.append(self._enrich_one(record))
+                continue
+
+            result = deepcopy(record)
+            self._apply(parse_book_metadata(raw)[0], result)
+            results.append(result)
+
+        return results
+
+    # =====================
+    # Batch API
+    # =====================
+
+    def batch_request(self, record: BookRecord) -> Dict[str, Any]:
+        """Body of the single-book request, for a batch input file."""
+        return self._build_request(record)
+
+    def batch_result(self, raw: Any, record: BookRecord) -> BookRecord:
+        """Apply one batch answer as enrich() applies a live one; returns a NEW record."""
+        result = deepcopy(record)
+        try:
+            self._apply_response(raw, result)
+        except Exception as e:
+            result.errors.append(f"openai: {e}")
+        return result
+
+    def _get_packer(self) -> Optional[PromptPacker]:
+        if not self._packer_loaded:
+            self._packer = PromptPacker.from_env(self.enrich_many)
+            self._packer_loaded = True
+        return self._packer
+
     # =====================
     # Transport
     # =====================
 
     def _call_openai(self, record: BookRecord) -> Dict[str, Any]:
+        cascade = self._cascade()
+        if not cascade:
+            return self._send(self._live_request(record))
+
+        for n, tier in enumerate(cascade):
+            started = time.monotonic()
+            last = n == len(cascade) - 1
+            try:
+                raw = self._send(self._live_request(record, tier))
+            except Exception:
+                get_cascade_stats().record(tier.name, time.monotonic() - started, False)
+                if last:
+                    raise
+                continue
+            accepted = last or accepts(raw, min_confidence())
+            get_cascade_stats().record(tier.name, time.monotonic() - started, accepted)
+            if accepted:
+                return raw
+
+    async def _acall_openai(self, record: BookRecord) -> Dict[str, Any]:
+        cascade = self._cascade()
+        if not cascade:
+            return await self._asend(self._live_request(record))
+
+        for n, tier in enumerate(cascade):
+            started = time.monotonic()
+            last = n == len(cascade) - 1
+            try:
+                raw = await self._asend(self._live_request(record, tier))
+            except Exception:
+                get_cascade_stats().record(tier.name, time.monotonic() - started, False)
+                if last:
+                    raise
+                continue
+            accepted = last or accepts(raw, min_confidence())
+            get_cascade_stats().record(tier.name, time.monotonic() - started, accepted)
+            if accepted:
+                return raw
+
+    def _cascade(self) -> List[CascadeTier]:
+        """
+        OPENAI_CASCADE tiers, cheapest first: each answer that fails
+        validation or is below OPENAI_CASCADE_MIN_CONFIDENCE escalates to
+        the next tier. The policy's cheap tier never cascades.
+        """
+        if self.tier == "cheap":
+            return []
+        return cascade_from_env(os.environ.get("OPENAI_MODEL", "gpt-5.2"))
+
+    def _send(
+        self,
+        request: Dict[str, Any],
+        valid: Optional[Callable[[Any], bool]] = None,
+    ) -> Dict[str, Any]:
+        """
+        The parsed answer. It is cached only when `valid` accepts it, by
+        default a single-book answer with an edition and no parse errors.
+        """
         client = self._get_client()
+
+        def create():
+            try:
+                return client.responses.create(**request)
+            except (APIStatusError, APIConnectionError) as e:
+                raise _retryable(e) or e
+
+        def fetch():
+            response = get_limiter().call(create, _estimate_tokens(request), _used_tokens)
+            content = response.output_text
+            print(content)
+            return json.loads(content)
+
+        cache = get_cache()
+        if cache is None:
+            return fetch()
+        return cache.get_or_call(cache_key(self.name, request), fetch, _guarded(valid or _valid_answer))
+
+    async def _asend(
+        self,
+        request: Dict[str, Any],
+        valid: Optional[Callable[[Any], bool]] = None,
+    ) -> Dict[str, Any]:
+        client = self._get_async_client()
+
+        async def create():
+            try:
+                return await client.responses.create(**request)
+            except (APIStatusError, APIConnectionError) as e:
+                raise _retryable(e) or e
+
+        async def fetch():
+            response = await get_limiter().acall(create, _estimate_tokens(request), _used_tokens)
+            content = response.output_text
+            print(content)
+            return json.loads(content)
+
+        cache = get_cache()
+        if cache is None:
+            return await fetch()
+        return await cache.aget_or_call(cache_key(self.name, request), fetch, _guarded(valid or _valid_answer))
+
+    def _build_request(self, record: BookRecord, tier: Optional[CascadeTier] = None) -> Dict[str, Any]:
         system_prompt = build_system_prompt()
         user_prompt = build_book_metadata_prompt(record)
         format_prompt = get_response_format()
-        print(system_prompt)
+
+        return self._request(system_prompt, user_prompt, format_prompt, tier)
+
+    def _live_request(self, record: BookRecord, tier: Optional[CascadeTier] = None) -> Dict[str, Any]:
+        """_build_request for a live call, echoing its prompts (batch export stays quiet)."""
+        request = self._build_request(record, tier)
+        print(request["instructions"])
+        print(request["input"])
+        return request
+
+    def _build_group_request(self, records: List[BookRecord]) -> Dict[str, Any]:
+        user_prompt = build_group_metadata_prompt(records)
         print(user_prompt)
+        return self._request(build_group_system_prompt(), user_prompt, get_group_response_format())
 
-        response = client.responses.create(
-            model=os.environ.get("OPENAI_MODEL", "gpt-5.2"),
-            reasoning={"effort": "high"},
-            instructions=system_prompt,
-            input=user_prompt,
-            text=format_prompt
-        )
+    def _build_packed_request(self, records: Dict[str, BookRecord]) -> Dict[str, Any]:
+        user_prompt = build_packed_metadata_prompt(records)
+        print(user_prompt)
+        return self._request(build_packed_system_prompt(), user_prompt, get_packed_response_format())
 
-        content = response.output_text
-        print(content)
-        return json.loads(content)
+    def _request(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        format_prompt: Any,
+        tier: Optional[CascadeTier] = None,
+    ) -> Dict[str, Any]:
+        model = os.environ.get("OPENAI_MODEL", "gpt-5.2")
+        effort = "high"
+        if tier is not None:
+            model, effort = tier.model, tier.effort
+        elif self.tier == "cheap":
+            model = os.environ.get("OPENAI_CHEAP_MODEL", model)
+            effort = os.environ.get("OPENAI_CHEAP_REASONING_EFFORT", "low")
+
+        return {
+            "model": model,
+            "reasoning": {"effort": effort},
+            "instructions": system_prompt,
+            "input": user_prompt,
+            "text": format_prompt,
+        }
 
     def _get_client(self) -> OpenAI:
         if self._client is None:
-            api_key = os.environ.get("OPENAI_API_KEY")
-            if not api_key:
-                raise RuntimeError("OPENAI_API_KEY is not set")
-            self._client = OpenAI(api_key=api_key)
+            # Retries are done by the shared limiter, not the SDK
+            self._client = OpenAI(api_key=self._api_key(), max_retries=0)
         return self._client
 
+    def _get_async_client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = AsyncOpenAI(api_key=self._api_key(), max_retries=0)
+            self._async_loop = loop
+        return self._async_client
+
+    @staticmethod
+    def _api_key() -> str:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY is not set")
+        return api_key
+
     # =====================
     # Apply parsed data
     # =====================
 
+    def _apply_response(self, raw: Any, record: BookRecord) -> None:
+        parsed, errors = parse_book_metadata(raw)
+
+        record.errors.extend(errors)
+
+        if parsed:
+            self._apply(parsed, record)
+
     def _apply(self, data: Dict[str, Any], record: BookRecord) -> None:
         """Apply parsed data to BookRecord using schema field definitions"""
         edition = data.get("edition", {})
@@ -96,4 +387,76 @@ class OpenAIProvider(AIProvider):
         if "confidence" in data:
             record.confidence = data["confidence"]
 
-        record.source = "ai"
\ No newline at end of file
+        record.source = "ai"
+
+# =====================
+# Rate limit helpers
+# =====================
+
+def _valid_answer(raw: Any) -> bool:
+    """A single-book answer worth keeping: it parses cleanly and has an edition."""
+    parsed, errors = parse_book_metadata(raw)
+    return not errors and bool(parsed.get("edition"))
+
+
+def _guarded(valid: Callable[[Any], bool]) -> Callable[[Any], bool]:
+    """`valid`, with an answer it cannot even take apart counted as invalid."""
+    def check(raw: Any) -> bool:
+        try:
+            return valid(raw)
+        except Exception:
+            return False
+    return check
+
+
+_RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _retryable(e: Exception) -> Optional[RetryableError]:
+    """RetryableError for throttling / transient failures, None otherwise."""
+    if isinstance(e, APIConnectionError):
+        return RetryableError(f"connection error: {e}")
+
+    status = e.status_code
+    if status not in _RETRY_STATUSES:
+        return None
+
+    return RetryableError(
+        str(e),
+        status=status,
+        retry_after=_retry_after(e.response.headers),
+        throttled=status in (429, 503),
+    )
+
+
+def _retry_after(headers) -> Optional[float]:
+    """Parse retry-after-ms / Retry-After (seconds or HTTP date)."""
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _estimate_tokens(request: Dict[str, Any]) -> int:
+    """Rough prompt size (~4 chars per token) plus the expected output."""
+    prompt_chars = len(request["instructions"]) + len(request["input"]) + len(json.dumps(request["text"]))
+    return prompt_chars // 4 + int(os.environ.get("AI_EXPECTED_OUTPUT_TOKENS", "2000"))
+
+
+def _used_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
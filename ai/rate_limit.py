@@ -0,0 +1,338 @@
+"""
+Adaptive rate limiting for AI provider calls.
+
+One limiter is shared by all providers (see ai.registry.get_limiter).
+It enforces requests-per-minute and tokens-per-minute budgets, adapts
+the number of in-flight calls AIMD-style from observed latency and
+throttling responses (growing by one per success until the first sign
+of push-back, like TCP slow start), and retries retryable failures with
+jittered exponential backoff that honours Retry-After.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class RetryableError(Exception):
+    """
+    Raised by providers for failures worth retrying (429, 5xx, network).
+    `throttled` marks provider push-back, which shrinks the window.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        throttled: bool = False,
+    ):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.throttled = throttled
+
+
+@dataclass
+class LimiterStats:
+    calls: int = 0
+    retries: int = 0
+    throttled: int = 0
+    failures: int = 0
+    in_flight: int = 0
+    limit: float = 0.0
+    latency_avg: float = 0.0
+
+
+class _Bucket:
+    """Token bucket refilled continuously at `per_minute` / 60 per second."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        # Requests bigger than the whole bucket wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+
+class AdaptiveRateLimiter:
+    def __init__(
+        self,
+        rpm: int = 0,
+        tpm: int = 0,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        initial_concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        if min_concurrency < 1 or max_concurrency < min_concurrency:
+            raise ValueError("invalid concurrency bounds")
+
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._requests = _Bucket(rpm) if rpm > 0 else None
+        self._tokens = _Bucket(tpm) if tpm > 0 else None
+
+        self._lock = threading.Lock()
+        # Notified whenever a slot is released
+        self._released = threading.Condition(self._lock)
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._limit = float(min(max_concurrency, max(min_concurrency, initial_concurrency)))
+        # Slow start until the first throttle or latency blow-up
+        self._threshold = float(max_concurrency)
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._latency_avg = 0.0
+        self._samples = 0
+        self._stats = LimiterStats()
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveRateLimiter":
+        return cls(
+            rpm=int(os.environ.get("AI_RPM", "0")),
+            tpm=int(os.environ.get("AI_TPM", "0")),
+            max_concurrency=int(os.environ.get("AI_MAX_CONCURRENCY", "16")),
+            min_concurrency=int(os.environ.get("AI_MIN_CONCURRENCY", "1")),
+            initial_concurrency=int(os.environ.get("AI_INITIAL_CONCURRENCY", "4")),
+            max_retries=int(os.environ.get("AI_MAX_RETRIES", "5")),
+            backoff_base=float(os.environ.get("AI_RETRY_BASE_SECONDS", "1")),
+            backoff_max=float(os.environ.get("AI_RETRY_MAX_SECONDS", "60")),
+        )
+
+    # =====================
+    # Public API
+    # =====================
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        tokens: int = 0,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> T:
+        """
+        Run fn() within the budgets, retrying RetryableError.
+        `tokens` is the estimated cost; `usage` may report the actual
+        cost from the result so the token budget is corrected.
+        """
+        attempt = 0
+        while True:
+            self._acquire(tokens)
+
+            started = time.monotonic()
+            try:
+                result = fn()
+            except RetryableError as e:
+                delay = self._on_retryable(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            except Exception:
+                self._release(None, failed=True)
+                raise
+
+            self._release(time.monotonic() - started)
+            self._correct_tokens(tokens, usage, result)
+            return result
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> T:
+        """Async variant of call(); waits without blocking the event loop."""
+        attempt = 0
+        while True:
+            await self._aacquire(tokens)
+
+            started = time.monotonic()
+            try:
+                result = await fn()
+            except RetryableError as e:
+                delay = self._on_retryable(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._release(None, failed=True)
+                raise
+
+            self._release(time.monotonic() - started)
+            self._correct_tokens(tokens, usage, result)
+            return result
+
+    def stats(self) -> LimiterStats:
+        with self._lock:
+            s = self._stats
+            return LimiterStats(
+                calls=s.calls,
+                retries=s.retries,
+                throttled=s.throttled,
+                failures=s.failures,
+                in_flight=self._in_flight,
+                limit=self._limit,
+                latency_avg=self._latency_avg,
+            )
+
+    # =====================
+    # Budget accounting
+    # =====================
+
+    def _acquire(self, tokens: int) -> None:
+        with self._released:
+            while (wait := self._try_acquire(tokens)) != 0:
+                self._released.wait(wait)
+
+    async def _aacquire(self, tokens: int) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                wait = self._try_acquire(tokens)
+                if wait == 0:
+                    return
+                waiter = (loop, asyncio.Event())
+                self._async_waiters.append(waiter)
+
+            try:
+                await asyncio.wait_for(waiter[1].wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+
+    def _try_acquire(self, tokens: int) -> Optional[float]:
+        """
+        Take a slot and budget (caller holds the lock), or return how long
+        to wait first: None while the window is full, until a release.
+        """
+        now = time.monotonic()
+
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        if self._in_flight >= int(self._limit):
+            return None
+
+        wait = 0.0
+        if self._requests is not None:
+            self._requests.refill(now)
+            wait = max(wait, self._requests.wait_for(1))
+        if self._tokens is not None and tokens:
+            self._tokens.refill(now)
+            wait = max(wait, self._tokens.wait_for(tokens))
+        if wait > 0:
+            return wait
+
+        if self._requests is not None:
+            self._requests.level -= 1
+        if self._tokens is not None and tokens:
+            self._tokens.level -= min(tokens, self._tokens.capacity)
+
+        self._in_flight += 1
+        self._stats.calls += 1
+        return 0.0
+
+    def _notify(self) -> None:
+        """Wake every waiter (caller holds the lock); they re-check the window."""
+        self._released.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+        self._async_waiters.clear()
+
+    def _correct_tokens(self, estimated: int, usage, result) -> None:
+        if self._tokens is None or usage is None:
+            return
+        try:
+            actual = usage(result)
+        except Exception:
+            return
+        if actual is None:
+            return
+        with self._lock:
+            # May go negative: the overdraft is paid back by refill time
+            self._tokens.level += estimated - actual
+
+    # =====================
+    # AIMD window
+    # =====================
+
+    def _release(self, latency: Optional[float], failed: bool = False, throttled: bool = False) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._notify()
+
+            if throttled:
+                self._stats.throttled += 1
+                self._limit = max(float(self.min_concurrency), self._limit / 2)
+                self._threshold = self._limit
+                return
+
+            if failed or latency is None:
+                self._stats.failures += 1
+                return
+
+            slow = self._samples >= 5 and latency > 2 * self._latency_avg
+
+            self._samples += 1
+            if self._samples == 1:
+                self._latency_avg = latency
+            else:
+                self._latency_avg += 0.2 * (latency - self._latency_avg)
+
+            if slow:
+                # Latency blow-up: the provider is queueing our requests
+                self._limit = max(float(self.min_concurrency), self._limit * 0.75)
+                self._threshold = self._limit
+            elif self._limit < self._threshold:
+                self._limit = min(float(self.max_concurrency), self._limit + 1)
+            else:
+                self._limit = min(float(self.max_concurrency), self._limit + 1 / self._limit)
+
+    def _on_retryable(self, e: RetryableError, attempt: int) -> Optional[float]:
+        """Account for a retryable failure; returns the delay or None to give up."""
+        self._release(None, failed=not e.throttled, throttled=e.throttled)
+
+        if attempt >= self.max_retries:
+            return None
+
+        if e.retry_after is not None:
+            delay = e.retry_after + random.uniform(0, self.backoff_base)
+        else:
+            # Full jitter
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+        with self._lock:
+            self._stats.retries += 1
+            if e.throttled and e.retry_after is not None:
+                # Everyone backs off, not just this caller
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+
+        return delay
@@ -1,6 +1,19 @@
+from typing import Optional
+
 from ai.base import AIProvider
+from ai.cache import ResponseCache
+from ai.hedge import Hedger
+from ai.policy import AIPolicy
+from ai.rate_limit import AdaptiveRateLimiter
 
 _PROVIDERS: dict[str, AIProvider] = {}
+_LIMITER: Optional[AdaptiveRateLimiter] = None
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOADED = False
+_POLICY: Optional[AIPolicy] = None
+_POLICY_LOADED = False
+_HEDGER: Optional[Hedger] = None
+_HEDGER_LOADED = False
 
 
 def register(provider: AIProvider) -> None:
@@ -9,3 +22,65 @@ def register(provider: AIProvider) -> None:
 
 def get(name: str) -> AIProvider:
     return _PROVIDERS[name]
+
+
+def get_limiter() -> AdaptiveRateLimiter:
+    """Rate limiter shared by all providers, configured from AI_* env vars."""
+    global _LIMITER
+    if _LIMITER is None:
+        _LIMITER = AdaptiveRateLimiter.from_env()
+    return _LIMITER
+
+
+def set_limiter(limiter: Optional[AdaptiveRateLimiter]) -> None:
+    """Replace the shared limiter; None re-reads the environment on next use."""
+    global _LIMITER
+    _LIMITER = limiter
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """Response cache shared by all providers; None unless AI_CACHE_PATH is set."""
+    global _CACHE, _CACHE_LOADED
+    if not _CACHE_LOADED:
+        _CACHE = ResponseCache.from_env()
+        _CACHE_LOADED = True
+    return _CACHE
+
+
+def set_cache(cache: Optional[ResponseCache], reload: bool = False) -> None:
+    """Replace the shared cache (None disables it); reload re-reads the environment on next use."""
+    global _CACHE, _CACHE_LOADED
+    _CACHE = cache
+    _CACHE_LOADED = not reload
+
+
+def get_policy() -> Optional[AIPolicy]:
+    """AI-skip policy; None (always run full enrichment) unless AI_POLICY=1."""
+    global _POLICY, _POLICY_LOADED
+    if not _POLICY_LOADED:
+        _POLICY = AIPolicy.from_env()
+        _POLICY_LOADED = True
+    return _POLICY
+
+
+def set_policy(policy: Optional[AIPolicy], reload: bool = False) -> None:
+    """Replace the policy (None disables it); reload re-reads the environment on next use."""
+    global _POLICY, _POLICY_LOADED
+    _POLICY = policy
+    _POLICY_LOADED = not reload
+
+
+def get_hedger() -> Optional[Hedger]:
+    """Hedging for enrich calls; None unless AI_HEDGE=1."""
+    global _HEDGER, _HEDGER_LOADED
+    if not _HEDGER_LOADED:
+        _HEDGER = Hedger.from_env()
+        _HEDGER_LOADED = True
+    return _HEDGER
+
+
+def set_hedger(hedger: Optional[Hedger], reload: bool = False) -> None:
+    """Replace the hedger (None disables it); reload re-reads the environment on next use."""
+    global _HEDGER, _HEDGER_LOADED
+    _HEDGER = hedger
+    _HEDGER_LOADED = not reload
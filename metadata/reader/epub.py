@@ -1,12 +1,71 @@
+import posixpath
+import zipfile
 from datetime import date
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from ebooklib import epub
+from lxml import etree
 
 from models.book import BookRecord
 from metadata.reader.base import MetadataReader
 
 
+_NAMESPACES = {
+    "DC": "http://purl.org/dc/elements/1.1/",
+    "OPF": "http://www.idpf.org/2007/opf",
+}
+_CONTAINER_NS = "urn:oasis:names:tc:opendocument:xmlns:container"
+
+_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
+
+
+class OPFMetadata:
+    """
+    The <metadata> block of an EPUB package document, read without
+    loading the rest of the archive.
+
+    get_metadata() mirrors ebooklib's EpubBook.get_metadata: values are
+    grouped by namespace and local tag name as (text, attributes) pairs.
+    """
+
+    def __init__(self, metadata: Dict[str, Dict[str, List[Tuple[Optional[str], Dict[str, Any]]]]]):
+        self.metadata = metadata
+
+    def get_metadata(self, namespace: str, name: str) -> List[Tuple[Optional[str], Dict[str, Any]]]:
+        namespace = _NAMESPACES.get(namespace, namespace)
+        return self.metadata.get(namespace, {}).get(name, [])
+
+
+def read_opf_metadata(path: str) -> OPFMetadata:
+    """
+    Open the zip central directory, follow META-INF/container.xml to the
+    OPF and parse only that entry. Raises on anything malformed.
+    """
+    with zipfile.ZipFile(path) as archive:
+        container = etree.fromstring(archive.read("META-INF/container.xml"), _PARSER)
+        rootfile = container.find(f"{{{_CONTAINER_NS}}}rootfiles/{{{_CONTAINER_NS}}}rootfile")
+        if rootfile is None or not rootfile.get("full-path"):
+            raise ValueError("container.xml has no rootfile")
+
+        opf_path = posixpath.normpath(rootfile.get("full-path"))
+        package = etree.fromstring(archive.read(opf_path), _PARSER)
+
+    metadata = package.find(f"{{{_NAMESPACES['OPF']}}}metadata")
+    if metadata is None:
+        raise ValueError("package document has no metadata")
+
+    grouped: Dict[str, Dict[str, List[Tuple[Optional[str], Dict[str, Any]]]]] = {}
+    for element in metadata:
+        if not isinstance(element.tag, str):
+            continue  # comments, processing instructions
+        qname = etree.QName(element)
+        grouped.setdefault(qname.namespace or "", {}).setdefault(qname.localname, []).append(
+            (element.text, dict(element.items()))
+        )
+
+    return OPFMetadata(grouped)
+
+
 class EPUBMetadataReader(MetadataReader):
 
     def supports(self, record: BookRecord) -> bool:
@@ -14,7 +73,7 @@ class EPUBMetadataReader(MetadataReader):
 
     def read(self, record: BookRecord) -> BookRecord:
         try:
-            book = epub.read_epub(record.path)
+            book = self._load(record.path)
         except Exception as e:
             record.errors.append(f"epub read error: {e}")
             return record
@@ -101,6 +160,29 @@ class EPUBMetadataReader(MetadataReader):
             elif not record.isbn10 and len(v) == 10 and v.isdigit():
                 record.isbn10 = value
 
+        # ---- Series / ASIN (EPUB 3 properties, as written by our writer) ----
+        # Read before the calibre metas so a series we wrote wins over one
+        # left behind by calibre.
+        for value, attrs in book.get_metadata("OPF", "meta"):
+            if not attrs or not value or attrs.get("refines"):
+                continue
+            prop = attrs.get("property")
+
+            if prop == "belongs-to-collection" and not record.series:
+                record.series = value
+            elif prop == "group-position" and record.series_index is None:
+                try:
+                    record.series_index = int(float(value))
+                except ValueError:
+                    pass
+            elif prop == "collection-total" and record.series_total is None:
+                try:
+                    record.series_total = int(value)
+                except ValueError:
+                    pass
+            elif prop == "asin" and not record.asin:
+                record.asin = value
+
         # ---- Series (Calibre-compatible) ----
         if not record.series or record.series_index is None:
             metas = book.get_metadata("OPF", "meta")
@@ -121,6 +203,17 @@ class EPUBMetadataReader(MetadataReader):
         record.source = record.source or "file"
         return record
 
+    @staticmethod
+    def _load(path: str):
+        """
+        Header-only read of the OPF; the full ebooklib parse (every item
+        in the archive) is only the fallback for malformed files.
+        """
+        try:
+            return read_opf_metadata(path)
+        except Exception:
+            return epub.read_epub(path)
+
     @staticmethod
     def _parse_date(value: str) -> Optional[date]:
         """
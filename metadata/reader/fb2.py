@@ -1,4 +1,5 @@
 from datetime import date
+from typing import Tuple
 
 from lxml import etree
 
@@ -13,8 +14,7 @@ class FB2MetadataReader(MetadataReader):
 
     def read(self, record: BookRecord) -> BookRecord:
         try:
-            tree = etree.parse(record.path)
-            root = tree.getroot()
+            root, header = self._parse_header(record.path)
         except Exception as e:
             record.errors.append(f"fb2 parse error: {e}")
             return record
@@ -33,19 +33,23 @@ class FB2MetadataReader(MetadataReader):
             return f"{{{fb2_ns}}}{tag}" if fb2_ns else tag
 
         # ---- Title ----
-        title_el = root.find(f".//{q('book-title')}")
+        title_el = header.find(f".//{q('book-title')}")
         if title_el is not None and title_el.text and not record.title:
             record.title = title_el.text.strip()
 
         # ---- Subtitle ----
-        subtitle_el = root.find(f".//{q('subtitle')}")
+        subtitle_el = header.find(f".//{q('subtitle')}")
         if subtitle_el is not None and subtitle_el.text and not record.subtitle:
             record.subtitle = subtitle_el.text.strip()
 
         # ---- Authors ----
         if not record.authors:
             authors = []
-            for author in root.findall(f".//{q('author')}"):
+            # Book authors live in title-info; document-info/author is
+            # whoever produced the file
+            title_info = header.find(f".//{q('title-info')}")
+            scope = title_info if title_info is not None else header
+            for author in scope.findall(f".//{q('author')}"):
                 first = (author.findtext(q("first-name")) or "").strip()
                 last = (author.findtext(q("last-name")) or "").strip()
                 middle = (author.findtext(q("middle-name")) or "").strip()
@@ -57,7 +61,7 @@ class FB2MetadataReader(MetadataReader):
 
         # ---- Description ----
         if not record.description:
-            annotation_el = root.find(f".//{q('annotation')}")
+            annotation_el = header.find(f".//{q('annotation')}")
             if annotation_el is not None:
                 # annotation may contain child tags (p, strong, etc.) — collect all text
                 text = "".join(annotation_el.itertext()).strip()
@@ -66,19 +70,19 @@ class FB2MetadataReader(MetadataReader):
 
         # ---- Tags (keywords) ----
         if not record.tags:
-            keywords_el = root.find(f".//{q('keywords')}")
+            keywords_el = header.find(f".//{q('keywords')}")
             if keywords_el is not None and keywords_el.text:
                 tags = [t.strip() for t in keywords_el.text.split(",") if t.strip()]
                 if tags:
                     record.tags = tags
 
         # ---- Language ----
-        lang_el = root.find(f".//{q('lang')}")
+        lang_el = header.find(f".//{q('lang')}")
         if lang_el is not None and lang_el.text and not record.language:
             record.language = lang_el.text.strip()
 
         # ---- Series ----
-        sequence = root.find(f".//{q('sequence')}")
+        sequence = header.find(f".//{q('sequence')}")
         if sequence is not None:
             if not record.series:
                 record.series = sequence.attrib.get("name")
@@ -88,12 +92,12 @@ class FB2MetadataReader(MetadataReader):
                     record.series_index = int(num)
 
         # ---- Publisher ----
-        publisher_el = root.find(f".//{q('publish-info')}/{q('publisher')}")
+        publisher_el = header.find(f".//{q('publish-info')}/{q('publisher')}")
         if publisher_el is not None and publisher_el.text and not record.publisher:
             record.publisher = publisher_el.text.strip()
 
         # ---- Published / Year ----
-        year_el = root.find(f".//{q('publish-info')}/{q('year')}")
+        year_el = header.find(f".//{q('publish-info')}/{q('year')}")
         if year_el is not None and year_el.text:
             try:
                 y = int(year_el.text.strip())
@@ -105,7 +109,7 @@ class FB2MetadataReader(MetadataReader):
                 pass
 
         # ---- ISBN ----
-        isbn_el = root.find(f".//{q('publish-info')}/{q('isbn')}")
+        isbn_el = header.find(f".//{q('publish-info')}/{q('isbn')}")
         if isbn_el is not None and isbn_el.text:
             isbn = isbn_el.text.replace("-", "").strip()
             if len(isbn) == 13 and isbn.isdigit() and not record.isbn13:
@@ -113,5 +117,36 @@ class FB2MetadataReader(MetadataReader):
             elif len(isbn) == 10 and isbn.isdigit() and not record.isbn10:
                 record.isbn10 = isbn_el.text.strip()
 
+        # ---- Custom info (written by our FB2 writer) ----
+        for el in header.findall(q("custom-info")):
+            info_type = el.get("info-type")
+            value = (el.text or "").strip()
+            if not value:
+                continue
+            if info_type == "asin" and not record.asin:
+                record.asin = value
+            elif info_type == "series_total" and record.series_total is None and value.isdigit():
+                record.series_total = int(value)
+
         record.source = record.source or "file"
-        return record
\ No newline at end of file
+        return record
+
+    @staticmethod
+    def _parse_header(path: str) -> Tuple[etree._Element, etree._Element]:
+        """
+        Incrementally parse up to </description> and stop: the body and
+        the base64 <binary> blobs after it are never read.
+        Returns (root, description); without a description the whole
+        document is parsed and the root is returned for both.
+        """
+        root = None
+        with open(path, "rb") as f:
+            for event, el in etree.iterparse(f, events=("start", "end"), resolve_entities=False):
+                if event == "start":
+                    if root is None:
+                        root = el
+                    continue
+                if etree.QName(el).localname == "description":
+                    return root, el
+
+        return root, root
\ No newline at end of file
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import List
+from datetime import date
+from typing import Any, Dict, List, Optional
 
 from models.book import BookRecord
 
@@ -10,11 +11,52 @@ class WriteResult:
     success: bool
     skipped: bool = False
     errors: List[str] = field(default_factory=list)
+    # Fields that differed from the file; None when no comparison was made
+    changed_fields: Optional[List[str]] = None
 
 
 class MetadataWriter(ABC):
     extensions: set[str]
 
     @abstractmethod
-    def write(self, record: BookRecord) -> WriteResult:
+    def write(self, record: BookRecord, output_path: Optional[str] = None) -> WriteResult:
+        """
+        Write record's metadata. By default the file at record.path is
+        replaced; with output_path the result goes there instead and the
+        source is left untouched.
+        """
         ...
+
+    def expected_fields(self, record: BookRecord) -> Optional[Dict[str, Any]]:
+        """
+        Field values a reader would see after write(record), for the
+        fields write() touches. None if the writer cannot tell.
+        """
+        return None
+
+    def changed_fields(self, record: BookRecord, current: BookRecord) -> Optional[List[str]]:
+        """
+        Fields whose written form differs from `current` (the metadata
+        read from the file). None means "unknown": the file must be written.
+        """
+        expected = self.expected_fields(record)
+        if expected is None:
+            return None
+        return [
+            name for name, value in expected.items()
+            if self.normalize(name, value) != self.normalize(name, getattr(current, name, None))
+        ]
+
+    def normalize(self, name: str, value: Any) -> Any:
+        """Comparable form of a field value: whitespace, ISBN dashes and dates."""
+        if value is None or value == "" or value == []:
+            return None
+        if isinstance(value, date):
+            return value.isoformat()
+        if isinstance(value, (list, tuple)):
+            return tuple(self.normalize(name, v) for v in value)
+        if isinstance(value, str):
+            if name in ("isbn10", "isbn13"):
+                return value.replace("-", "").replace(" ", "").upper()
+            return " ".join(value.split())
+        return value
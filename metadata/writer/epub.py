@@ -1,11 +1,13 @@
-import zipfile
-import tempfile
-import shutil
+import copy
 import os
+import struct
+import zipfile
+from typing import Any, Dict, Optional
 from xml.etree import ElementTree as ET
 
 from metadata.writer.base import MetadataWriter, WriteResult
 from models.book import BookRecord
+from utils.fs import copy_range
 
 
 OPF_NS = {
@@ -13,75 +15,193 @@ OPF_NS = {
     "dc": "http://purl.org/dc/elements/1.1/",
 }
 
+for _prefix, _uri in OPF_NS.items():
+    ET.register_namespace(_prefix, _uri)
 
-class EPUBMetadataWriter(MetadataWriter):
-    extensions = {"epub"}
-
-    def write(self, record: BookRecord) -> WriteResult:
-        try:
-            with zipfile.ZipFile(record.path, "r") as zin:
-                opf_path = self._find_opf(zin)
-                if not opf_path:
-                    return WriteResult(False, errors=["epub: OPF not found"])
+_META = f"{{{OPF_NS['opf']}}}meta"
+_SCHEME = f"{{{OPF_NS['opf']}}}scheme"
 
-                with tempfile.TemporaryDirectory() as tmp:
-                    zin.extractall(tmp)
+# General purpose flag: CRC and sizes follow the data in a descriptor
+_DATA_DESCRIPTOR = 0x08
 
-                    opf_full = os.path.join(tmp, opf_path)
-                    tree = ET.parse(opf_full)
-                    root = tree.getroot()
 
-                    metadata = root.find("opf:metadata", OPF_NS)
-                    if metadata is None:
-                        return WriteResult(False, errors=["epub: no metadata"])
+def _strip_zip64(extra: bytes) -> bytes:
+    """Drop the zip64 extra field (id 1) from a raw extra block."""
+    out = b""
+    i = 0
+    while i + 4 <= len(extra):
+        field_id, size = struct.unpack("<HH", extra[i:i + 4])
+        if field_id != 1:
+            out += extra[i:i + 4 + size]
+        i += 4 + size
+    return out
 
-                    # ---- Basic fields ----
-                    epub_version = root.get("version", "2.0")
-                    self._set_title(metadata, record.title, record.subtitle, epub_version)
-                    self._set_list(metadata, "dc:creator", record.authors)
-                    self._set_text(metadata, "dc:language", record.language)
-                    self._set_text(metadata, "dc:publisher", record.publisher)
 
-                    # ---- Description + OriginalWork ----
-                    self._set_description(metadata, record)
+def _combined_title(title: str | None, subtitle: str | None) -> str:
+    """EPUB 2 dc:title: "Title: Subtitle"."""
+    combined = title or ""
+    if subtitle:
+        combined = f"{combined}: {subtitle}" if combined else subtitle
+    return combined
 
-                    # ---- Tags ----
-                    self._set_list(metadata, "dc:subject", record.tags)
 
-                    # ---- Dates ----
-                    if record.published:
-                        self._set_text(metadata, "dc:date", record.published)
+class EPUBMetadataWriter(MetadataWriter):
+    extensions = {"epub"}
 
-                    # ---- Identifiers ----
-                    self._set_identifier(metadata, "ISBN-10", record.isbn10)
-                    self._set_identifier(metadata, "ISBN-13", record.isbn13)
-                    self._set_meta(metadata, "asin", record.asin)
+    def write(self, record: BookRecord, output_path: Optional[str] = None) -> WriteResult:
+        tmp_epub = output_path or record.path + ".tmp"
+        try:
+            with zipfile.ZipFile(record.path, "r") as zin:
+                opf_path = self._find_opf(zin)
+                if not opf_path:
+                    return WriteResult(False, errors=["epub: OPF not found"])
 
-                    # ---- Series ----
-                    if record.series:
-                        self._set_meta(metadata, "belongs-to-collection", record.series)
-                        if record.series_index is not None:
-                            self._set_meta(metadata, "group-position", str(record.series_index))
-                        if record.series_total is not None:
-                            self._set_meta(metadata, "collection-total", str(record.series_total))
+                root = ET.fromstring(zin.read(opf_path))
 
-                    tree.write(opf_full, encoding="utf-8", xml_declaration=True)
+                metadata = root.find("opf:metadata", OPF_NS)
+                if metadata is None:
+                    return WriteResult(False, errors=["epub: no metadata"])
 
-                    tmp_epub = record.path + ".tmp"
-                    with zipfile.ZipFile(tmp_epub, "w", zipfile.ZIP_DEFLATED) as zout:
-                        for root_dir, _, files in os.walk(tmp):
-                            for f in files:
-                                full = os.path.join(root_dir, f)
-                                rel = os.path.relpath(full, tmp)
-                                zout.write(full, rel)
+                self._apply(root, metadata, record)
+                opf_data = ET.tostring(root, encoding="utf-8", xml_declaration=True)
 
-                    shutil.move(tmp_epub, record.path)
+                self._rewrite(record.path, zin, tmp_epub, opf_path, opf_data)
 
+            if output_path is None:
+                os.replace(tmp_epub, record.path)
             return WriteResult(True)
 
         except Exception as e:
+            if os.path.exists(tmp_epub):
+                os.remove(tmp_epub)
             return WriteResult(False, errors=[f"epub: {e}"])
 
+    def _apply(self, root: ET.Element, metadata: ET.Element, record: BookRecord) -> None:
+        # ---- Basic fields ----
+        epub_version = root.get("version", "2.0")
+        self._set_title(metadata, record.title, record.subtitle, epub_version)
+        self._set_list(metadata, "dc:creator", record.authors)
+        self._set_text(metadata, "dc:language", record.language)
+        self._set_text(metadata, "dc:publisher", record.publisher)
+
+        # ---- Description + OriginalWork ----
+        self._set_description(metadata, record)
+
+        # ---- Tags ----
+        self._set_list(metadata, "dc:subject", record.tags)
+
+        # ---- Dates ----
+        if record.published:
+            self._set_text(metadata, "dc:date", record.published)
+
+        # ---- Identifiers ----
+        self._set_identifier(metadata, "ISBN-10", record.isbn10)
+        self._set_identifier(metadata, "ISBN-13", record.isbn13)
+        self._set_meta(metadata, "asin", record.asin)
+
+        # ---- Series ----
+        if record.series:
+            self._set_meta(metadata, "belongs-to-collection", record.series)
+            if record.series_index is not None:
+                self._set_meta(metadata, "group-position", str(record.series_index))
+            if record.series_total is not None:
+                self._set_meta(metadata, "collection-total", str(record.series_total))
+
+    def expected_fields(self, record: BookRecord) -> Optional[Dict[str, Any]]:
+        try:
+            epub_version = self._package_version(record.path)
+        except (OSError, zipfile.BadZipFile, ET.ParseError):
+            return None
+        if epub_version is None:
+            return None
+
+        title, subtitle = record.title, record.subtitle
+        if not epub_version.startswith("3") and (title or subtitle):
+            # EPUB 2 keeps one dc:title, read back whole
+            title, subtitle = _combined_title(title, subtitle), None
+
+        fields = {
+            "title": title,
+            "subtitle": subtitle,
+            "authors": record.authors,
+            "language": record.language,
+            "publisher": record.publisher,
+            "description": self._description_text(record),
+            "tags": record.tags,
+            "published": record.published,
+            "isbn10": record.isbn10,
+            "isbn13": record.isbn13,
+            "asin": record.asin,
+        }
+        if record.series:
+            fields["series"] = record.series
+            fields["series_index"] = record.series_index
+            fields["series_total"] = record.series_total
+        return {name: value for name, value in fields.items() if self.normalize(name, value) is not None}
+
+    # ---------------- streaming rewrite ----------------
+
+    def _rewrite(
+        self,
+        src_path: str,
+        zin: zipfile.ZipFile,
+        dst_path: str,
+        opf_path: str,
+        opf_data: bytes,
+    ) -> None:
+        """
+        Stream the archive into dst_path entry by entry: `mimetype` first
+        and stored, the OPF replaced, every other member copied as raw
+        compressed bytes (no inflate/deflate, original CRC kept).
+        """
+        with open(src_path, "rb") as src, zipfile.ZipFile(dst_path, "w") as zout:
+            mimetype = zin.NameToInfo.get("mimetype")
+            if mimetype is not None:
+                zout.writestr(
+                    zipfile.ZipInfo("mimetype", date_time=mimetype.date_time),
+                    zin.read(mimetype),
+                    compress_type=zipfile.ZIP_STORED,
+                )
+
+            for info in zin.infolist():
+                if info.filename == "mimetype":
+                    continue
+                if info.filename == opf_path:
+                    opf_info = zipfile.ZipInfo(opf_path, date_time=info.date_time)
+                    opf_info.external_attr = info.external_attr
+                    zout.writestr(opf_info, opf_data, compress_type=zipfile.ZIP_DEFLATED)
+                    continue
+                self._copy_raw(src, zout, info)
+
+    @staticmethod
+    def _copy_raw(src, zout: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+        # Skip the source local header to the compressed data
+        src.seek(info.header_offset)
+        header = src.read(zipfile.sizeFileHeader)
+        if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile(f"bad local header for {info.filename}")
+        name_len, extra_len = struct.unpack("<HH", header[26:30])
+        src.seek(info.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+
+        out = copy.copy(info)
+        # Sizes and CRC go into the local header, not a trailing data descriptor;
+        # a zip64 extra is rebuilt by FileHeader when needed.
+        out.flag_bits &= ~_DATA_DESCRIPTOR
+        out.extra = _strip_zip64(info.extra)
+        out.header_offset = zout.fp.tell()
+
+        zout.fp.write(out.FileHeader())
+        # In-kernel copy of the compressed bytes; the kernel may share
+        # extents with the source where the filesystem and alignment allow
+        zout.fp.flush()
+        copy_range(src.fileno(), zout.fp.fileno(), src.tell(), info.compress_size)
+        zout.fp.seek(0, os.SEEK_END)
+
+        zout.filelist.append(out)
+        zout.NameToInfo[out.filename] = out
+        zout.start_dir = zout.fp.tell()
+        zout._didModify = True
+
     # ---------------- helpers ----------------
 
     def _find_opf(self, zin: zipfile.ZipFile) -> str | None:
@@ -90,6 +210,14 @@ class EPUBMetadataWriter(MetadataWriter):
                 return name
         return None
 
+    def _package_version(self, path: str) -> str | None:
+        """The OPF package version write() would go by, None without an OPF."""
+        with zipfile.ZipFile(path, "r") as zin:
+            opf_path = self._find_opf(zin)
+            if not opf_path:
+                return None
+            return ET.fromstring(zin.read(opf_path)).get("version", "2.0")
+
     def _set_title(
         self,
         meta: ET.Element,
@@ -106,7 +234,7 @@ class EPUBMetadataWriter(MetadataWriter):
         for el in meta.findall("dc:title", OPF_NS):
             meta.remove(el)
         # Remove any stale title-type refines
-        for el in list(meta.findall("meta")):
+        for el in list(meta.findall(_META)):
             if (el.get("property") == "title-type"
                     and el.get("refines") in ("#subtitle", "#main-title")):
                 meta.remove(el)
@@ -121,19 +249,27 @@ class EPUBMetadataWriter(MetadataWriter):
                 el = ET.SubElement(meta, dc_title_tag)
                 el.set("id", "subtitle")
                 el.text = subtitle
-                refines = ET.SubElement(meta, "meta")
+                refines = ET.SubElement(meta, _META)
                 refines.set("refines", "#subtitle")
                 refines.set("property", "title-type")
                 refines.text = "subtitle"
         else:
             # EPUB 2: merge into a single dc:title as "Title: Subtitle"
-            combined = title or ""
-            if subtitle:
-                combined = f"{combined}: {subtitle}" if combined else subtitle
             el = ET.SubElement(meta, dc_title_tag)
-            el.text = combined
+            el.text = _combined_title(title, subtitle)
 
     def _set_description(self, meta, record: BookRecord):
+        text = self._description_text(record)
+        if text is None:
+            return
+
+        el = meta.find("dc:description", OPF_NS)
+        if el is None:
+            el = ET.SubElement(meta, f"{{{OPF_NS['dc']}}}description")
+        el.text = text
+
+    @staticmethod
+    def _description_text(record: BookRecord) -> str | None:
         parts = []
 
         if record.description:
@@ -156,13 +292,9 @@ class EPUBMetadataWriter(MetadataWriter):
                     parts.append("\n".join(block))
 
         if not parts:
-            return
+            return None
 
-        text = "\n\n".join(parts)
-        el = meta.find("dc:description", OPF_NS)
-        if el is None:
-            el = ET.SubElement(meta, f"{{{OPF_NS['dc']}}}description")
-        el.text = text
+        return "\n\n".join(parts)
 
     def _set_text(self, meta, tag, value):
         if not value:
@@ -170,7 +302,7 @@ class EPUBMetadataWriter(MetadataWriter):
         el = meta.find(tag, OPF_NS)
         if el is None:
             el = ET.SubElement(meta, f"{{{OPF_NS['dc']}}}{tag.split(':')[1]}")
-        el.text = value
+        el.text = str(value)
 
     def _set_list(self, meta, tag, values):
         if not values:
@@ -184,13 +316,25 @@ class EPUBMetadataWriter(MetadataWriter):
     def _set_identifier(self, meta, scheme, value):
         if not value:
             return
+        # Replace ISBNs of the same kind (except the package's unique
+        # identifier, which always carries an id) so readers see this one
+        digits = len(value.replace("-", ""))
+        for el in meta.findall("dc:identifier", OPF_NS):
+            if el.get("id"):
+                continue
+            existing = (el.text or "").replace("-", "").strip()
+            if el.get(_SCHEME) == scheme or (existing.isdigit() and len(existing) == digits):
+                meta.remove(el)
         el = ET.SubElement(meta, f"{{{OPF_NS['dc']}}}identifier")
-        el.set("opf:scheme", scheme)
+        el.set(_SCHEME, scheme)
         el.text = value
 
     def _set_meta(self, meta, name, value):
         if not value:
             return
-        el = ET.SubElement(meta, "meta")
+        for el in meta.findall(_META):
+            if el.get("property") == name and not el.get("refines"):
+                meta.remove(el)
+        el = ET.SubElement(meta, _META)
         el.set("property", name)
         el.text = value
\ No newline at end of file
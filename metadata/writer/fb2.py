@@ -1,190 +1,365 @@
+import os
+import re
+import shutil
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
 from lxml import etree
 
 from metadata.writer.base import MetadataWriter, WriteResult
 from models.book import BookRecord
+from utils.fs import copy_range
+
+
+# <description> start / end tags, with or without a namespace prefix
+_DESC_START = re.compile(rb"<(?:[A-Za-z_][\w.-]*:)?description[\s>]")
+_DESC_END = re.compile(rb"</(?:[A-Za-z_][\w.-]*:)?description\s*>")
+_ENCODING = re.compile(rb"""^<\?xml[^>]*encoding\s*=\s*["']([A-Za-z0-9._-]+)["']""")
+_CHUNK = 64 * 1024
+
+def own_description(record: BookRecord) -> Optional[str]:
+    """
+    record's description without the paragraphs the writer generates for
+    it. The reader glues an annotation's paragraphs together, so in text
+    read back from a file this writer produced they are matched as its
+    exact tail; anything else is the description's own text.
+    """
+    text = record.description
+    if not text:
+        return text
+    generated = _generated_paragraphs(record)
+    if generated:
+        tail = re.search(r"\s*".join(map(re.escape, generated)) + r"\s*\Z", text)
+        if tail:
+            text = text[:tail.start()]
+    return text.strip() or None
+
+
+def _generated_paragraphs(record: BookRecord) -> List[str]:
+    """Annotation paragraphs after the description: original work, then tags."""
+    paragraphs = []
+
+    orig = record.original
+    has_original = (
+        orig is not None
+        and (
+            (orig.title and orig.title != record.title)
+            or (orig.authors and orig.authors != record.authors)
+        )
+    )
+    if has_original:
+        if orig.title and orig.title != record.title:
+            paragraphs.append(f"Оригинальное название: {orig.title}")
+
+        if orig.language:
+            paragraphs.append(f"Язык оригинала: {orig.language}")
+
+        if orig.authors and orig.authors != record.authors:
+            paragraphs.append(f"Автор: {', '.join(orig.authors)}")
+
+    # Append tags to annotation so readers that don't parse <keywords> still show them
+    if record.tags:
+        paragraphs.append(f"Теги: {', '.join(record.tags)}")
+
+    return paragraphs
 
 
 class FB2MetadataWriter(MetadataWriter):
     extensions = {"fb2"}
 
-    def write(self, record: BookRecord) -> WriteResult:
+    def write(self, record: BookRecord, output_path: Optional[str] = None) -> WriteResult:
         try:
-            parser = etree.XMLParser(remove_blank_text=False)
-            tree = etree.parse(record.path, parser)
-            root = tree.getroot()
-
-            # Extract the primary namespace URI from the root tag
-            nsmap = root.nsmap
-            fb2_ns = None
-            for prefix, uri in nsmap.items():
-                if "fictionbook" in uri.lower():
-                    fb2_ns = uri
-                    break
-            # Fall back to the default namespace (prefix=None) or the first available one
-            if fb2_ns is None:
-                fb2_ns = nsmap.get(None) or next(iter(nsmap.values()), "")
-
-            def q(tag: str) -> str:
-                return f"{{{fb2_ns}}}{tag}" if fb2_ns else tag
-
-            def find(el, tag):
-                return el.find(q(tag))
-
-            def sub(parent, tag):
-                return etree.SubElement(parent, q(tag))
-
-            desc = root.find(f".//{q('description')}")
-            if desc is None:
-                return WriteResult(False, errors=["fb2: no description"])
-
-            title_info = find(desc, "title-info")
-            if title_info is None:
-                title_info = sub(desc, "title-info")
-
-            # ---- Title ----
-
-            if record.title:
-                el = find(title_info, "book-title")
-                if el is None:
-                    el = sub(title_info, "book-title")
-                el.text = record.title
-
-            # ---- Subtitle ----
-            if record.subtitle:
-                el = find(title_info, "subtitle")
-                if el is None:
-                    el = sub(title_info, "subtitle")
-                el.text = record.subtitle
-
-            # ---- Authors ----
-            if record.authors:
-                for a in title_info.findall(q("author")):
-                    title_info.remove(a)
-
-                for name in record.authors:
-                    author = sub(title_info, "author")
-                    parts = name.split(" ", 1)
-                    sub(author, "first-name").text = parts[0]
-                    if len(parts) > 1:
-                        sub(author, "last-name").text = parts[1]
-
-            # ---- Annotation (description + OriginalWork) ----
-            has_description = bool(record.description)
-            has_original = (
-                record.original is not None
-                and (
-                    (record.original.title and record.original.title != record.title)
-                    or (record.original.authors and record.original.authors != record.authors)
-                )
-            )
-
-            if has_description or has_original or record.tags:
-                annotation = find(title_info, "annotation")
-                if annotation is None:
-                    annotation = sub(title_info, "annotation")
-                else:
-                    for child in list(annotation):
-                        annotation.remove(child)
-                    annotation.text = None
-
-                if has_description:
-                    p = sub(annotation, "p")
-                    p.text = record.description
-
-                if has_original:
-                    orig = record.original
-                    if orig.title and orig.title != record.title:
-                        p = sub(annotation, "p")
-                        p.text = f"Оригинальное название: {orig.title}"
-
-                    if orig.language:
-                        p = sub(annotation, "p")
-                        p.text = f"Язык оригинала: {orig.language}"
-
-                    if orig.authors and orig.authors != record.authors:
-                        p = sub(annotation, "p")
-                        p.text = f"Автор: {', '.join(orig.authors)}"
-
-                # Append tags to annotation so readers that don't parse <keywords> still show them
-                if record.tags:
-                    p = sub(annotation, "p")
-                    p.text = f"Теги: {', '.join(record.tags)}"
-
-            # ---- Keywords (tags) ----
-            # Per FB2 spec, <keywords> must come after <annotation>.
-            # We write it fresh and then move it to the correct position.
-            if record.tags:
-                # Remove existing keywords element if present
-                existing_kw = find(title_info, "keywords")
-                if existing_kw is not None:
-                    title_info.remove(existing_kw)
-
-                # Create new keywords element
-                kw_el = etree.SubElement(title_info, q("keywords"))
-                kw_el.text = ", ".join(record.tags)
-
-                # Move it to just after <annotation> (or <book-title> if no annotation)
-                annotation_el = find(title_info, "annotation")
-                anchor = annotation_el if annotation_el is not None else find(title_info, "book-title")
-                if anchor is not None:
-                    anchor_idx = list(title_info).index(anchor)
-                    title_info.remove(kw_el)
-                    title_info.insert(anchor_idx + 1, kw_el)
-
-            # ---- Series ----
-            if record.series:
-                seq = find(title_info, "sequence")
-                if seq is None:
-                    seq = sub(title_info, "sequence")
-                seq.set("name", record.series)
-                if record.series_index is not None:
-                    seq.set("number", str(record.series_index))
-
-            # ---- Language ----
-            if record.language:
-                el = find(title_info, "lang")
-                if el is None:
-                    el = sub(title_info, "lang")
-                el.text = record.language
-
-            # ---- Publish info ----
-            pub = find(desc, "publish-info")
-            if pub is None:
-                pub = sub(desc, "publish-info")
-
-            if record.publisher:
-                el = find(pub, "publisher")
-                if el is None:
-                    el = sub(pub, "publisher")
-                el.text = record.publisher
-
-            if record.published:
-                el = find(pub, "year")
-                if el is None:
-                    el = sub(pub, "year")
-                el.text = str(record.published)[:4]
-
-            if record.isbn13 or record.isbn10:
-                el = find(pub, "isbn")
-                if el is None:
-                    el = sub(pub, "isbn")
-                el.text = record.isbn13 or record.isbn10
-
-            # ---- Custom info (non-standard) ----
-            self._set_custom(desc, q, "asin", record.asin)
-            self._set_custom(desc, q, "series_total", record.series_total)
-
-            tree.write(
-                record.path,
-                encoding="utf-8",
-                xml_declaration=True,
-                pretty_print=False,
-            )
-            return WriteResult(True)
-
+            if self._write_spliced(record, output_path):
+                return WriteResult(True)
+            return self._write_full(record, output_path)
         except Exception as e:
             return WriteResult(False, errors=[f"fb2: {e}"])
 
+    # ---------------- header splice ----------------
+
+    def _write_spliced(self, record: BookRecord, output_path: Optional[str] = None) -> bool:
+        """
+        Rewrite only the <description> bytes: the new file is the original
+        prefix, the rebuilt header and the untouched tail (body, binaries)
+        copied in-kernel. Returns False when the header cannot be located
+        or parsed on its own; the caller then rewrites the whole tree.
+        """
+        tmp_path = output_path or record.path + ".tmp"
+
+        with open(record.path, "rb") as src:
+            located = self._locate_description(src)
+            if located is None:
+                return False
+            head, start = located
+
+            header = self._rebuild_header(head, record)
+            if header is None:
+                return False
+
+            try:
+                with open(tmp_path, "wb") as dst:
+                    dst.write(head[:start])
+                    dst.write(header)
+                    dst.flush()
+                    size = os.fstat(src.fileno()).st_size
+                    copy_range(src.fileno(), dst.fileno(), len(head), size - len(head))
+                shutil.copymode(record.path, tmp_path)
+                if output_path is None:
+                    os.replace(tmp_path, record.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        return True
+
+    @staticmethod
+    def _locate_description(src) -> Optional[Tuple[bytes, int]]:
+        """
+        Read the file up to the end of </description>. Returns the bytes
+        read so far (ending with that tag) and the offset of <description>.
+        """
+        buf = b""
+        start = None
+        while True:
+            chunk = src.read(_CHUNK)
+            if not chunk:
+                return None
+            # Tags may straddle chunk boundaries: rescan a small overlap
+            scan_from = max(0, len(buf) - 32)
+            buf += chunk
+
+            if start is None:
+                m = _DESC_START.search(buf, scan_from)
+                if m is None:
+                    continue
+                start = m.start()
+
+            m = _DESC_END.search(buf, max(scan_from, start))
+            if m is not None:
+                return buf[:m.end()], start
+
+    def _rebuild_header(self, head: bytes, record: BookRecord) -> Optional[bytes]:
+        """
+        Parse prefix + description as a small document closed right after
+        the header, apply the record, and serialize the description back
+        in the file's own encoding. None if that document does not parse.
+        """
+        if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+            return None  # UTF-16: the ASCII byte scan is meaningless
+
+        m = _ENCODING.match(head.removeprefix(b"\xef\xbb\xbf"))
+        encoding = m.group(1).decode("ascii") if m else "utf-8"
+        if encoding.lower().replace("-", "").startswith("utf16"):
+            return None
+
+        parser = etree.XMLPullParser(events=("start",), resolve_entities=False)
+        try:
+            parser.feed(head)
+            root = next((el for _, el in parser.read_events()), None)
+            if root is None:
+                return None
+            name = etree.QName(root).localname
+            closing = f"</{root.prefix}:{name}>" if root.prefix else f"</{name}>"
+            parser.feed(closing.encode(encoding))
+            root = parser.close()
+        except etree.XMLSyntaxError:
+            return None
+
+        desc = root[-1] if len(root) else None
+        if desc is None or not isinstance(desc.tag, str) or etree.QName(desc).localname != "description":
+            return None
+
+        self._apply(record, desc, _qualifier(root))
+
+        # Serialize via the root so namespace declarations stay on the root
+        # and are not repeated on <description>; then cut the root tags off.
+        for child in list(root)[:-1]:
+            root.remove(child)
+        root.text = None
+        desc.tail = None
+        data = etree.tostring(root, encoding=encoding, xml_declaration=False)
+        return data[data.index(b">") + 1:data.rindex(b"</")]
+
+    # ---------------- full rewrite ----------------
+
+    def _write_full(self, record: BookRecord, output_path: Optional[str] = None) -> WriteResult:
+        parser = etree.XMLParser(remove_blank_text=False)
+        tree = etree.parse(record.path, parser)
+        root = tree.getroot()
+        q = _qualifier(root)
+
+        desc = root.find(f".//{q('description')}")
+        if desc is None:
+            return WriteResult(False, errors=["fb2: no description"])
+
+        self._apply(record, desc, q)
+
+        tree.write(
+            output_path or record.path,
+            encoding="utf-8",
+            xml_declaration=True,
+            pretty_print=False,
+        )
+        return WriteResult(True)
+
+    # ---------------- fields ----------------
+
+    def _apply(self, record: BookRecord, desc, q: Callable[[str], str]) -> None:
+        def find(el, tag):
+            return el.find(q(tag))
+
+        def sub(parent, tag):
+            return etree.SubElement(parent, q(tag))
+
+        title_info = find(desc, "title-info")
+        if title_info is None:
+            title_info = sub(desc, "title-info")
+
+        # ---- Title ----
+
+        if record.title:
+            el = find(title_info, "book-title")
+            if el is None:
+                el = sub(title_info, "book-title")
+            el.text = record.title
+
+        # ---- Subtitle ----
+        if record.subtitle:
+            el = find(title_info, "subtitle")
+            if el is None:
+                el = sub(title_info, "subtitle")
+            el.text = record.subtitle
+
+        # ---- Authors ----
+        if record.authors:
+            for a in title_info.findall(q("author")):
+                title_info.remove(a)
+
+            for name in record.authors:
+                author = sub(title_info, "author")
+                parts = name.split(" ", 1)
+                sub(author, "first-name").text = parts[0]
+                if len(parts) > 1:
+                    sub(author, "last-name").text = parts[1]
+
+        # ---- Annotation (description + OriginalWork) ----
+        paragraphs = self._annotation_paragraphs(record)
+        if paragraphs:
+            annotation = find(title_info, "annotation")
+            if annotation is None:
+                annotation = sub(title_info, "annotation")
+            else:
+                for child in list(annotation):
+                    annotation.remove(child)
+                annotation.text = None
+
+            for text in paragraphs:
+                p = sub(annotation, "p")
+                p.text = text
+
+        # ---- Keywords (tags) ----
+        # Per FB2 spec, <keywords> must come after <annotation>.
+        # We write it fresh and then move it to the correct position.
+        if record.tags:
+            # Remove existing keywords element if present
+            existing_kw = find(title_info, "keywords")
+            if existing_kw is not None:
+                title_info.remove(existing_kw)
+
+            # Create new keywords element
+            kw_el = etree.SubElement(title_info, q("keywords"))
+            kw_el.text = ", ".join(record.tags)
+
+            # Move it to just after <annotation> (or <book-title> if no annotation)
+            annotation_el = find(title_info, "annotation")
+            anchor = annotation_el if annotation_el is not None else find(title_info, "book-title")
+            if anchor is not None:
+                anchor_idx = list(title_info).index(anchor)
+                title_info.remove(kw_el)
+                title_info.insert(anchor_idx + 1, kw_el)
+
+        # ---- Series ----
+        if record.series:
+            seq = find(title_info, "sequence")
+            if seq is None:
+                seq = sub(title_info, "sequence")
+            seq.set("name", record.series)
+            if record.series_index is not None:
+                seq.set("number", str(record.series_index))
+
+        # ---- Language ----
+        if record.language:
+            el = find(title_info, "lang")
+            if el is None:
+                el = sub(title_info, "lang")
+            el.text = record.language
+
+        # ---- Publish info ----
+        pub = find(desc, "publish-info")
+        if pub is None:
+            pub = sub(desc, "publish-info")
+
+        if record.publisher:
+            el = find(pub, "publisher")
+            if el is None:
+                el = sub(pub, "publisher")
+            el.text = record.publisher
+
+        if record.published:
+            el = find(pub, "year")
+            if el is None:
+                el = sub(pub, "year")
+            el.text = str(record.published)[:4]
+
+        if record.isbn13 or record.isbn10:
+            el = find(pub, "isbn")
+            if el is None:
+                el = sub(pub, "isbn")
+            el.text = record.isbn13 or record.isbn10
+
+        # ---- Custom info (non-standard) ----
+        self._set_custom(desc, q, "asin", record.asin)
+        self._set_custom(desc, q, "series_total", record.series_total)
+
+    @staticmethod
+    def _annotation_paragraphs(record: BookRecord) -> List[str]:
+        # A description read back from a file written here already ends
+        # with the generated paragraphs
+        description = own_description(record)
+        return ([description] if description else []) + _generated_paragraphs(record)
+
+    # ---------------- change detection ----------------
+
+    def expected_fields(self, record: BookRecord) -> Dict[str, Any]:
+        fields: Dict[str, Any] = {
+            "title": record.title,
+            "subtitle": record.subtitle,
+            "authors": record.authors,
+            # As read back: the generated paragraphs glued to the description
+            "description": "".join(self._annotation_paragraphs(record)),
+            "tags": record.tags,
+            "language": record.language,
+            "publisher": record.publisher,
+            # Only the year goes into publish-info
+            "year": record.published.year if record.published else None,
+            "asin": record.asin,
+            "series_total": record.series_total,
+        }
+        if record.series:
+            fields["series"] = record.series
+            fields["series_index"] = record.series_index
+        if record.isbn13:
+            fields["isbn13"] = record.isbn13
+        elif record.isbn10:
+            fields["isbn10"] = record.isbn10
+        return {name: value for name, value in fields.items() if self.normalize(name, value) is not None}
+
+    def normalize(self, name: str, value: Any) -> Any:
+        if name == "description" and isinstance(value, str):
+            # Paragraph boundaries and indentation are lost on read
+            return "".join(value.split()) or None
+        return super().normalize(name, value)
+
     def _set_custom(self, desc, q, name, value):
         if not value:
             return
@@ -194,4 +369,22 @@ class FB2MetadataWriter(MetadataWriter):
                 return
         el = etree.SubElement(desc, q("custom-info"))
         el.set("info-type", name)
-        el.text = str(value)
\ No newline at end of file
+        el.text = str(value)
+
+
+def _qualifier(root) -> Callable[[str], str]:
+    # Extract the primary namespace URI from the root tag
+    nsmap = root.nsmap
+    fb2_ns = None
+    for prefix, uri in nsmap.items():
+        if "fictionbook" in uri.lower():
+            fb2_ns = uri
+            break
+    # Fall back to the default namespace (prefix=None) or the first available one
+    if fb2_ns is None:
+        fb2_ns = nsmap.get(None) or next(iter(nsmap.values()), "")
+
+    def q(tag: str) -> str:
+        return f"{{{fb2_ns}}}{tag}" if fb2_ns else tag
+
+    return q
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Optional
 
 from metadata.writer.base import MetadataWriter, WriteResult
 from models.book import BookRecord
@@ -11,8 +11,24 @@ def register(writer: MetadataWriter) -> None:
         _WRITERS[ext.lower()] = writer
 
 
-def write_metadata(record: BookRecord) -> WriteResult:
+def write_metadata(
+    record: BookRecord,
+    current: Optional[BookRecord] = None,
+    output_path: Optional[str] = None,
+) -> WriteResult:
+    """
+    Write record's metadata into its file, or into output_path. With
+    `current` (what the file already holds, as read), the write is
+    skipped when nothing differs.
+    """
     writer = _WRITERS.get(record.extension.lower())
     if not writer:
         return WriteResult(success=False, skipped=True)
-    return writer.write(record)
+
+    changed = writer.changed_fields(record, current) if current is not None else None
+    if changed == []:
+        return WriteResult(success=True, skipped=True, changed_fields=[])
+
+    result = writer.write(record, output_path)
+    result.changed_fields = changed
+    return result
@@ -0,0 +1,34 @@
+from dataclasses import asdict, fields
+from datetime import date
+from typing import Any, Dict, Optional
+
+from models.book import BookRecord, OriginalWork
+
+
+def book_record_to_dict(record: BookRecord) -> Dict[str, Any]:
+    """JSON-compatible dict for a BookRecord (dates as ISO strings)."""
+    data = asdict(record)
+    if record.published is not None:
+        data["published"] = record.published.isoformat()
+    return data
+
+
+def book_record_from_dict(data: Dict[str, Any]) -> BookRecord:
+    """Inverse of book_record_to_dict; unknown keys are ignored."""
+    known = {f.name for f in fields(BookRecord)}
+    kwargs = {k: v for k, v in data.items() if k in known}
+
+    published = kwargs.get("published")
+    if isinstance(published, str):
+        kwargs["published"] = date.fromisoformat(published)
+
+    kwargs["original"] = _original_from_dict(kwargs.get("original"))
+
+    return BookRecord(**kwargs)
+
+
+def _original_from_dict(data: Optional[Dict[str, Any]]) -> Optional[OriginalWork]:
+    if data is None:
+        return None
+    known = {f.name for f in fields(OriginalWork)}
+    return OriginalWork(**{k: v for k, v in data.items() if k in known})
@@ -1,5 +1,15 @@
 from pathlib import Path
+import ctypes
+import ctypes.util
+import errno
+import fcntl
+import os
 import re
+import shutil
+import stat
+import threading
+
+from utils.fs import copy_range
 
 
 class MoveError(Exception):
@@ -9,6 +19,48 @@ class MoveError(Exception):
 # Characters illegal in Windows filenames
 _ILLEGAL_CHARS = re.compile(r'[\\/:*?"<>|]')
 
+# Striped per-target locks: concurrent workers moving to the same target
+# path are serialized, unrelated targets rarely contend.
+_TARGET_LOCKS = [threading.Lock() for _ in range(64)]
+
+# What to do when the target name is taken
+COLLISION_MODES = ("overwrite", "version", "fail")
+
+# How a file gets to its target: move it, or place a copy and keep the source
+PLACEMENT_MODES = ("move", "reflink", "hardlink", "copy")
+
+_FICLONE = 0x40049409
+# errnos meaning "this kind of clone is not possible here": try the next one
+_CLONE_UNSUPPORTED = {
+    errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM, errno.EMLINK, errno.ENOSYS,
+}
+
+# Target directories this process already created: skips a mkdir (several
+# round-trips on NFS) per file
+_CREATED_DIRS: set[str] = set()
+
+_AT_FDCWD = -100
+_RENAME_NOREPLACE = 1
+
+
+def _load_renameat2():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        fn = libc.renameat2
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+_renameat2 = _load_renameat2()
+
+
+def target_lock(target: Path) -> threading.Lock:
+    """Lock guarding every filesystem change at `target`."""
+    return _TARGET_LOCKS[hash(str(target)) % len(_TARGET_LOCKS)]
+
 
 def sanitize_filename(filename: str) -> str:
     """Replace illegal Windows filename characters with safe alternatives."""
@@ -25,27 +77,221 @@ def move_file(
     dst_dir: Path,
     filename: str,
     subdirs: list[str] | None = None,
+    on_collision: str = "overwrite",
 ) -> Path:
-    if not src.exists():
+    try:
+        st = os.stat(src)
+    except FileNotFoundError:
         raise MoveError(f"source file does not exist: {src}")
 
-    if not src.is_file():
+    if not stat.S_ISREG(st.st_mode):
         raise MoveError(f"source is not a file: {src}")
 
+    target = target_path(dst_dir, filename, subdirs)
+
+    return _place(src, target, on_collision)
+
+
+def place_file(
+    src: Path,
+    dst_dir: Path,
+    filename: str,
+    subdirs: list[str] | None = None,
+    mode: str = "move",
+    on_collision: str = "overwrite",
+) -> Path:
+    """
+    Put src at its target. "move" is move_file; the other modes leave
+    src in place and create the target as a reflink (falling back to a
+    hardlink, then a copy), a hardlink (falling back to a copy) or a copy.
+    """
+    if mode == "move":
+        return move_file(src, dst_dir, filename, subdirs, on_collision)
+    if mode not in PLACEMENT_MODES:
+        raise MoveError(f"unknown placement mode: {mode}")
+
+    if not src.is_file():
+        raise MoveError(f"source file does not exist: {src}")
+
+    target = target_path(dst_dir, filename, subdirs)
+    tmp = temp_path(target)
+    try:
+        clone_file(src, tmp, mode)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    return install_file(src, tmp, target, on_collision, keep_source=True)
+
+
+def clone_file(src: Path, dst: Path, mode: str = "reflink") -> str:
+    """
+    Create dst with src's content as cheaply as `mode` allows.
+    Returns the method actually used: reflink, hardlink or copy.
+    """
+    if mode == "reflink":
+        try:
+            reflink(src, dst)
+            return "reflink"
+        except OSError as e:
+            if e.errno not in _CLONE_UNSUPPORTED:
+                raise
+            dst.unlink(missing_ok=True)
+
+    if mode in ("reflink", "hardlink"):
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError as e:
+            if e.errno not in _CLONE_UNSUPPORTED:
+                raise
+
+    _copy_data(src, dst)
+    return "copy"
+
+
+def reflink(src: Path, dst: Path) -> None:
+    """FICLONE: dst shares all of src's extents (btrfs, XFS, ...)."""
+    with open(src, "rb") as fin, open(dst, "xb") as fout:
+        fcntl.ioctl(fout.fileno(), _FICLONE, fin.fileno())
+    shutil.copystat(src, dst)
+
+
+def target_path(dst_dir: Path, filename: str, subdirs: list[str] | None = None) -> Path:
+    """Final path of `filename` under dst_dir; creates the directories."""
     # Preserve subdirectory structure from BookRecord.directories
     if subdirs:
         target_dir = dst_dir.joinpath(*subdirs)
     else:
         target_dir = dst_dir
 
-    target_dir.mkdir(parents=True, exist_ok=True)
+    ensure_dir(target_dir)
+
+    return target_dir / sanitize_filename(filename)
+
+
+def ensure_dir(path: Path) -> None:
+    key = str(path)
+    if key in _CREATED_DIRS:
+        return
+    path.mkdir(parents=True, exist_ok=True)
+    _CREATED_DIRS.add(key)
+
+
+def temp_path(target: Path) -> Path:
+    """Hidden temp file next to target: same filesystem, so rename is atomic."""
+    return target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def install_file(
+    src: Path,
+    written: Path,
+    target: Path,
+    on_collision: str = "overwrite",
+    keep_source: bool = False,
+) -> Path:
+    """
+    Finish a write-to-destination: `written` (a complete copy of src made
+    in target's directory) atomically takes target's place, then src is
+    removed unless keep_source.
+    """
+    try:
+        target = _place(written, target, on_collision)
+    except BaseException:
+        written.unlink(missing_ok=True)
+        raise
+
+    if not keep_source:
+        src.unlink()
+    return target
+
+
+def rename_noreplace(src: Path, dst: Path) -> None:
+    """
+    Atomically rename src to dst; FileExistsError if dst exists.
+    renameat2(RENAME_NOREPLACE), else link + unlink (also atomic).
+    """
+    if _renameat2 is not None:
+        if _renameat2(_AT_FDCWD, os.fsencode(src), _AT_FDCWD, os.fsencode(dst), _RENAME_NOREPLACE) == 0:
+            return
+        err = ctypes.get_errno()
+        # Old kernel, or a filesystem without the flag (e.g. NFS)
+        if err not in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+            raise OSError(err, os.strerror(err), str(src), None, str(dst))
+
+    os.link(src, dst)
+    os.unlink(src)
+
+
+# ---------------- placement ----------------
+
+def _place(src: Path, target: Path, on_collision: str) -> Path:
+    if on_collision not in COLLISION_MODES:
+        raise MoveError(f"unknown collision mode: {on_collision}")
+
+    for candidate in _candidates(target, on_collision):
+        try:
+            _rename(src, candidate, replace=on_collision == "overwrite")
+            return candidate
+        except FileExistsError:
+            if on_collision == "fail":
+                raise MoveError(f"target already exists: {candidate}")
+        except FileNotFoundError:
+            # The cached target directory may have been removed under us
+            if not src.exists():
+                raise MoveError(f"source file does not exist: {src}")
+            _CREATED_DIRS.discard(str(candidate.parent))
+            ensure_dir(candidate.parent)
+            _rename(src, candidate, replace=on_collision == "overwrite")
+            return candidate
+
+    raise MoveError(f"no free name for {target}")
+
+
+def _candidates(target: Path, on_collision: str):
+    yield target
+    if on_collision == "version":
+        for n in range(1, 1000):
+            yield target.with_name(f"{target.stem}_v{n}{target.suffix}")
+
+
+def _rename(src: Path, target: Path, replace: bool) -> None:
+    with target_lock(target):
+        try:
+            if replace:
+                os.replace(src, target)
+            else:
+                rename_noreplace(src, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            _copy_across(src, target, replace)
+
+
+def _copy_across(src: Path, target: Path, replace: bool) -> None:
+    """
+    Cross-device move: in-kernel copy to a temp file beside target, fsync,
+    rename into place, then unlink the source.
+    """
+    tmp = temp_path(target)
+    try:
+        _copy_data(src, tmp)
+
+        if replace:
+            os.replace(tmp, target)
+        else:
+            rename_noreplace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
 
-    filename = sanitize_filename(filename)
-    target = target_dir / filename
+    os.unlink(src)
 
-    # Overwrite existing file if present
-    if target.exists():
-        target.unlink()
 
-    src.rename(target.resolve())
-    return target
\ No newline at end of file
+def _copy_data(src: Path, dst: Path) -> None:
+    """In-kernel copy (reflinked by the kernel where it can), fsync'd, with src's stat."""
+    with open(src, "rb") as fin, open(dst, "xb") as fout:
+        copy_range(fin.fileno(), fout.fileno(), 0, os.fstat(fin.fileno()).st_size)
+        fout.flush()
+        os.fsync(fout.fileno())
+    shutil.copystat(src, dst)
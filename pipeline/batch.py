@@ -0,0 +1,151 @@
+import os
+from copy import deepcopy
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ai.batch import (
+    MAX_BATCH_BYTES,
+    MAX_BATCH_REQUESTS,
+    BatchBackend,
+    BatchState,
+    backend_from_env,
+    export_batch,
+    ingest_results,
+)
+from models.book import BookRecord
+from models.pipeline import PipelineResult
+from pipeline.process_file import close_job
+from pipeline.stages import STAGES, add_ai_record, read_stage, start_job
+
+
+# Stages run after a batch result arrives
+RESUME_STAGES = ("merge", "write", "rename", "move")
+
+STATE_FILE = "state.json"
+
+
+def batch_dir() -> Path:
+    return Path(os.environ.get("AI_BATCH_DIR", "batch"))
+
+
+def prepare(records: Iterable[BookRecord]) -> Iterator[Tuple[BookRecord, BookRecord]]:
+    """Read each file's metadata for its prompt, one at a time; unreadable files are left out."""
+    for record in records:
+        job = start_job(deepcopy(record))
+        read_stage(job)
+        if job.errors:
+            print(f"[batch] skipped, {'; '.join(job.errors)}: {record.path}")
+            continue
+        yield record, job.record
+
+
+def export_pending(records: Iterable[BookRecord], directory: Path) -> BatchState:
+    """
+    Export into as many input files as the Batch API limits need
+    (AI_BATCH_MAX_REQUESTS / AI_BATCH_MAX_BYTES per file lower them).
+    """
+    state = export_batch(
+        prepare(records),
+        directory,
+        max_requests=int(os.environ.get("AI_BATCH_MAX_REQUESTS", str(MAX_BATCH_REQUESTS))),
+        max_bytes=int(os.environ.get("AI_BATCH_MAX_BYTES", str(MAX_BATCH_BYTES))),
+    )
+    state.save(directory / STATE_FILE)
+    print(f"[batch] exported {len(state.records)} requests: {', '.join(state.input_files)}")
+    return state
+
+
+def submit(directory: Path, backend: Optional[BatchBackend] = None) -> BatchState:
+    """Start a batch per input file; after a failure, a rerun submits the rest."""
+    state = BatchState.load(directory / STATE_FILE)
+    if not state.input_files:
+        raise RuntimeError("nothing was exported")
+    if len(state.batch_ids) == len(state.input_files):
+        raise RuntimeError(f"already submitted as {', '.join(state.batch_ids)}")
+
+    backend = backend or backend_from_env(directory)
+    state.backend = backend.name
+    for input_file in state.input_files[len(state.batch_ids):]:
+        batch_id = backend.submit(Path(input_file))
+        # Saved per batch so a failed upload does not lose the started ones
+        state.batch_ids.append(batch_id)
+        state.status = "submitted"
+        state.save(directory / STATE_FILE)
+        print(f"[batch] submitted: {batch_id}")
+    return state
+
+
+def refresh(directory: Path, backend: Optional[BatchBackend] = None) -> BatchState:
+    """Status of every batch; the state is "completed" once all of them are."""
+    state = BatchState.load(directory / STATE_FILE)
+    if not state.batch_ids or len(state.batch_ids) < len(state.input_files):
+        raise RuntimeError("batch is not submitted")
+
+    backend = backend or backend_from_env(directory)
+    statuses = [backend.status(batch_id) for batch_id in state.batch_ids]
+    state.status = next((status for status in statuses if status != "completed"), "completed")
+    state.save(directory / STATE_FILE)
+    for batch_id, status in zip(state.batch_ids, statuses):
+        print(f"[batch] {batch_id}: {status}")
+    return state
+
+
+def ingest(directory: Path, backend: Optional[BatchBackend] = None) -> List[PipelineResult]:
+    """Fetch the results and finish every book: merge, write, rename, move."""
+    backend = backend or backend_from_env(directory)
+    state = refresh(directory, backend)
+    if state.status != "completed":
+        raise RuntimeError(f"batch {', '.join(state.batch_ids)} is {state.status}")
+
+    ai_records: Dict[str, BookRecord] = {}
+    state.output_files = []
+    for n, batch_id in enumerate(state.batch_ids):
+        output = backend.download(batch_id, directory / f"output-{n:03d}.jsonl")
+        state.output_files.append(str(output))
+        ai_records.update(ingest_results(output, state))
+
+    results = []
+    for custom_id in state.records:
+        record = state.record(custom_id)
+        ai_record = ai_records.get(custom_id)
+        if ai_record is None:
+            print(f"[batch] no result: {record.path}")
+            continue
+
+        if ai_record.errors:
+            # Left in NEW_BOOKS_DIR for the next export instead of being
+            # filed without AI metadata
+            result = PipelineResult(False, errors=list(ai_record.errors))
+        else:
+            result = resume(record, ai_record)
+        results.append(result)
+        if result.success:
+            print(f"[batch] OK: {record.path}")
+        else:
+            print(f"[batch] FAILED: {record.path}")
+            for err in result.errors:
+                print(f"  - {err}")
+
+    state.status = "ingested"
+    state.save(directory / STATE_FILE)
+    return results
+
+
+def resume(record: BookRecord, ai_record: BookRecord) -> PipelineResult:
+    """
+    process_file with the AI answer already at hand: the file is read
+    again (it may have changed since the export), then merged, written,
+    renamed and moved as usual.
+    """
+    job = start_job(record)
+    read_stage(job)
+    add_ai_record(job, ai_record)
+
+    for name, stage in STAGES:
+        if name not in RESUME_STAGES:
+            continue
+        stage(job)
+        if job.done:
+            break
+
+    return close_job(job, None)
@@ -0,0 +1,120 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+# What to do with a file whose content was already processed
+DEDUP_ACTIONS = ("skip", "link", "replace")
+
+_CHUNK = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    hash TEXT PRIMARY KEY,
+    final_path TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def content_hash(path: str) -> str:
+    """BLAKE2b of the file content, read in chunks."""
+    digest = hashlib.blake2b(digest_size=20)
+    buf = bytearray(_CHUNK)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+class DedupIndex:
+    """
+    Content hashes of processed input files and where their output went
+    (SQLite). Entries whose output has disappeared are dropped on lookup.
+
+    Inputs being processed hold an in-memory claim on their hash, so a
+    copy dropped at the same time is not processed twice; the claim ends
+    with record() or release().
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+        # hash -> input path being processed
+        self._claims: Dict[str, str] = {}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, digest: str) -> Optional[Path]:
+        """Output of an earlier input with this content hash, if it still exists."""
+        with self._lock:
+            return self._output(digest)
+
+    def claim(self, digest: str, owner: str) -> Tuple[Optional[Path], Optional[str]]:
+        """
+        Check and claim the hash for input `owner` under one lock.
+
+        Returns (earlier output, other input holding the claim). Unless
+        another input holds it, `owner` now holds the claim, also when an
+        earlier output exists; it must end with record() or release().
+        """
+        with self._lock:
+            holder = self._claims.setdefault(digest, owner)
+            if holder != owner:
+                return None, holder
+            return self._output(digest), None
+
+    def release(self, digest: str, owner: str) -> None:
+        with self._lock:
+            if self._claims.get(digest) == owner:
+                del self._claims[digest]
+
+    def record(self, digest: str, final_path: Path) -> None:
+        """Remember the output for this hash and end its claim."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO outputs (hash, final_path, updated_at) VALUES (?, ?, ?)",
+                (digest, str(final_path), time.time()),
+            )
+            self._conn.commit()
+            self._claims.pop(digest, None)
+
+    def forget(self, digest: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM outputs WHERE hash = ?", (digest,))
+            self._conn.commit()
+
+    def _output(self, digest: str) -> Optional[Path]:
+        # Caller holds the lock
+        row = self._conn.execute(
+            "SELECT final_path FROM outputs WHERE hash = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        final_path = Path(row[0])
+        if not final_path.exists():
+            self._conn.execute("DELETE FROM outputs WHERE hash = ?", (digest,))
+            self._conn.commit()
+            return None
+        return final_path
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outputs").fetchone()[0]
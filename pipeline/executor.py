@@ -0,0 +1,168 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional, Set
+
+
+class _KeyedExecutor:
+    """In-flight key bookkeeping shared by the executors."""
+
+    # Whether submit() expects a coroutine function instead of a plain callable
+    asynchronous = False
+
+    def __init__(self, concurrency: int, max_pending: Optional[int]):
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+
+        self.concurrency = concurrency
+
+        pending = max_pending if max_pending is not None else concurrency
+        self._slots = threading.BoundedSemaphore(concurrency + pending)
+
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight: Set[str] = set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def wait(self) -> None:
+        """Block until every submitted task has finished."""
+        with self._idle:
+            while self._in_flight:
+                self._idle.wait()
+
+    def shutdown(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+
+    def _claim(self, key: str) -> bool:
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+            return True
+
+    def _finished(self, future: Future, key: str) -> None:
+        self._slots.release()
+
+        if not future.cancelled() and future.exception() is not None:
+            print(f"[executor] task {key} crashed: {future.exception()}")
+
+        self._done(key)
+
+    def _done(self, key: str) -> None:
+        with self._idle:
+            self._in_flight.discard(key)
+            if not self._in_flight:
+                self._idle.notify_all()
+
+
+class PipelineExecutor(_KeyedExecutor):
+    """
+    Bounded worker pool for pipeline tasks.
+
+    At most `concurrency` tasks run at once and at most `max_pending`
+    more wait in the queue; submit() blocks while the queue is full so
+    a streaming scan never gets far ahead of the workers.
+    Tasks are keyed (usually by source path): a key that is already
+    queued or running is not submitted twice.
+    With concurrency == 1 tasks run inline in the caller's thread.
+    """
+
+    def __init__(self, concurrency: int = 1, max_pending: Optional[int] = None):
+        super().__init__(concurrency, max_pending)
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+        if concurrency > 1:
+            self._pool = ThreadPoolExecutor(
+                max_workers=concurrency,
+                thread_name_prefix="pipeline",
+            )
+
+    def submit(self, key: str, fn: Callable[[], None]) -> bool:
+        if not self._claim(key):
+            return False
+
+        if self._pool is None:
+            try:
+                fn()
+            finally:
+                self._done(key)
+            return True
+
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(fn)
+        except Exception:
+            self._slots.release()
+            self._done(key)
+            raise
+
+        future.add_done_callback(lambda f, k=key: self._finished(f, k))
+        return True
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+
+class AsyncPipelineExecutor(_KeyedExecutor):
+    """
+    Runs coroutine tasks on a single event loop in a background thread.
+
+    Same contract as PipelineExecutor, but `concurrency` bounds the
+    number of coroutines in flight rather than threads, so one loop
+    can keep hundreds of AI requests open at once.
+    """
+
+    asynchronous = True
+
+    def __init__(self, concurrency: int = 100, max_pending: Optional[int] = None):
+        super().__init__(concurrency, max_pending)
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="pipeline-loop",
+            daemon=True,
+        )
+        self._thread.start()
+
+        self._running = asyncio.run_coroutine_threadsafe(
+            self._make_semaphore(), self._loop
+        ).result()
+
+    def submit(self, key: str, fn: Callable[[], Awaitable[None]]) -> bool:
+        if not self._claim(key):
+            return False
+
+        self._slots.acquire()
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._run(fn), self._loop)
+        except Exception:
+            self._slots.release()
+            self._done(key)
+            raise
+
+        future.add_done_callback(lambda f, k=key: self._finished(f, k))
+        return True
+
+    def shutdown(self) -> None:
+        self.wait()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _make_semaphore(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(self.concurrency)
+
+    async def _run(self, fn: Callable[[], Awaitable[None]]) -> None:
+        async with self._running:
+            await fn()
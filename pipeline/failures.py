@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from pipeline.job_store import file_fingerprint
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS failures (
+    path TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    next_retry REAL NOT NULL,
+    last_error TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+@dataclass
+class FailureState:
+    attempts: int
+    next_retry: float
+    last_error: str
+
+
+class FailureRegistry:
+    """
+    Memory of files that failed to leave NEW_BOOKS_DIR (SQLite).
+
+    Failures are keyed by path and file fingerprint: a file that keeps
+    failing is retried with exponential backoff, and any change to the
+    file resets its history.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        backoff_seconds: float = 60.0,
+        backoff_max_seconds: float = 6 * 3600.0,
+        max_attempts: int = 5,
+    ):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.max_attempts = max_attempts
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls, db_path: Path) -> "FailureRegistry":
+        return cls(
+            db_path,
+            backoff_seconds=float(os.environ.get("FAILURE_BACKOFF_SECONDS", "60")),
+            backoff_max_seconds=float(os.environ.get("FAILURE_BACKOFF_MAX_SECONDS", "21600")),
+            max_attempts=int(os.environ.get("FAILURE_MAX_ATTEMPTS", "5")),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def is_due(self, path: str, now: Optional[float] = None) -> bool:
+        """False while a failed, unchanged file is backing off."""
+        state = self.get(path)
+        if state is None:
+            return True
+        return (now if now is not None else time.time()) >= state.next_retry
+
+    def get(self, path: str) -> Optional[FailureState]:
+        """Failure history of path, or None if it is unknown or the file changed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, attempts, next_retry, last_error FROM failures WHERE path = ?",
+                (path,),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        fingerprint, attempts, next_retry, last_error = row
+        if fingerprint != file_fingerprint(path):
+            self.clear(path)
+            return None
+
+        return FailureState(attempts, next_retry, last_error)
+
+    def record_failure(self, path: str, errors: List[str]) -> int:
+        """Count a failed attempt; returns the number of attempts so far."""
+        fingerprint = file_fingerprint(path)
+        if fingerprint is None:
+            return 0
+
+        state = self.get(path)
+        attempts = (state.attempts if state is not None else 0) + 1
+        delay = min(self.backoff_max_seconds, self.backoff_seconds * 2 ** (attempts - 1))
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO failures "
+                "(path, fingerprint, attempts, next_retry, last_error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, fingerprint, attempts, now + delay, "; ".join(errors), now),
+            )
+            self._conn.commit()
+
+        return attempts
+
+    def exhausted(self, attempts: int) -> bool:
+        return self.max_attempts > 0 and attempts >= self.max_attempts
+
+    def clear(self, path: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM failures WHERE path = ?", (path,))
+            self._conn.commit()
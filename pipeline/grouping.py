@@ -0,0 +1,221 @@
+import os
+import re
+import threading
+from concurrent.futures import Future
+from copy import deepcopy
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from ai.enrich import enrich_group
+from ai.registry import get_policy
+from metadata.cleaner import clean_record
+from metadata.reader.registry import read_metadata
+from models.book import BookRecord
+
+
+# Volume markers dropped before comparing filenames: numbers and words
+# like "vol", "book", "том"
+_VOLUME_MARKERS = re.compile(
+    r"\d+|\b(?:vol|volume|book|part|pt|no|tome|том|книга|часть|выпуск)\b\.?",
+    re.IGNORECASE,
+)
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def series_key(filename: str) -> str:
+    """Filename stem without volume numbers: equal for volumes of one series."""
+    stem = _VOLUME_MARKERS.sub(" ", Path(filename).stem.lower())
+    return _NON_WORD.sub(" ", stem).strip()
+
+
+def group_records(
+    records: Sequence[BookRecord],
+    min_size: int = 2,
+    max_size: int = 12,
+    similarity: float = 0.75,
+) -> List[List[BookRecord]]:
+    """
+    Groups of records sharing their directories and a similar filename
+    (after series_key), at most max_size volumes each. Records that fit
+    no group of min_size are left out.
+    """
+    by_dir: Dict[tuple, List[List[BookRecord]]] = {}
+
+    for record in records:
+        clusters = by_dir.setdefault(tuple(record.directories), [])
+        key = series_key(record.original_filename)
+        for cluster in clusters:
+            if SequenceMatcher(None, series_key(cluster[0].original_filename), key).ratio() >= similarity:
+                cluster.append(record)
+                break
+        else:
+            clusters.append([record])
+
+    groups = []
+    for clusters in by_dir.values():
+        for cluster in clusters:
+            for start in range(0, len(cluster), max_size):
+                chunk = cluster[start:start + max_size]
+                if len(chunk) >= min_size:
+                    groups.append(chunk)
+    return groups
+
+
+def windows(records: Iterable[BookRecord], size: int = 64) -> Iterator[List[BookRecord]]:
+    """
+    Consecutive records of one directory, at most `size` at a time. The
+    scanner yields a directory's files together, so a scan is grouped as
+    it streams instead of being collected first.
+    """
+    window: List[BookRecord] = []
+    for record in records:
+        if window and (record.directories != window[0].directories or len(window) >= size):
+            yield window
+            window = []
+        window.append(record)
+    if window:
+        yield window
+
+
+class GroupEnricher:
+    """
+    Series groups registered by the scanner, enriched with one AI call.
+
+    Members' metadata is read once, when their group is added: the
+    leader builds the request from those reads and each member's own
+    read stage reuses its record (see was_read) instead of reading again.
+    The first member to reach the enrich stage makes the call for the
+    whole group, so it never waits on other jobs; the others pick their
+    answer up when they get there. Members the AI policy would skip are
+    left out of the request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._group_of: Dict[str, List[BookRecord]] = {}
+        self._results: Dict[str, Future] = {}
+        # Paths whose record was read in place by add()
+        self._read: Set[str] = set()
+
+    def add(self, groups: Sequence[Sequence[BookRecord]]) -> None:
+        """Register groups, reading each member's metadata into its record."""
+        for group in groups:
+            for record in group:
+                try:
+                    read_metadata(record)
+                except Exception as e:
+                    record.errors.append(f"read_metadata: {e}")
+
+        with self._lock:
+            for group in groups:
+                # Snapshots for the leader's request: the records
+                # themselves travel on with their own jobs
+                members = [deepcopy(record) for record in group]
+                for record in members:
+                    self._group_of[record.path] = members
+                    self._read.add(record.path)
+
+    def was_read(self, record: BookRecord) -> bool:
+        """True once for a record add() already read."""
+        with self._lock:
+            if record.path not in self._read:
+                return False
+            self._read.discard(record.path)
+            return True
+
+    def clear(self) -> None:
+        """Forget groups and answers of members that never arrived."""
+        with self._lock:
+            self._group_of.clear()
+            self._results.clear()
+            self._read.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._group_of) + len(self._results)
+
+    def enrich(self, record: BookRecord, provider_name: str, tier: str = "full") -> Optional[BookRecord]:
+        """
+        AI record for `record` (the job's record after reading) from its
+        group's call; None when it is not in a group or the call failed.
+        """
+        with self._lock:
+            result = self._results.pop(record.path, None)
+            group = None
+            if result is None:
+                group = self._group_of.pop(record.path, None)
+                if group is None:
+                    return None
+                others = [m for m in group if m.path != record.path and m.path in self._group_of]
+                for member in others:
+                    del self._group_of[member.path]
+                    self._results[member.path] = Future()
+
+        if result is not None:
+            try:
+                answer = result.result()
+            except Exception:
+                return None
+            return deepcopy(answer) if answer is not None else None
+
+        return self._lead(record, others, provider_name, tier)
+
+    def _lead(self, record: BookRecord, others: List[BookRecord], provider_name: str, tier: str) -> Optional[BookRecord]:
+        with self._lock:
+            futures = {m.path: self._results[m.path] for m in others if m.path in self._results}
+
+        try:
+            members = [record] + self._needing_ai(others, futures)
+            if len(members) < 2:
+                answers = {}
+            else:
+                print(f"[group] one request for {len(members)} volumes in {' / '.join(record.directories) or '.'}")
+                enriched = enrich_group(members, provider_name, tier)
+                answers = {m.path: e for m, e in zip(members, enriched)}
+        except Exception as e:
+            for future in futures.values():
+                future.set_exception(e)
+            return None
+
+        for path, future in futures.items():
+            future.set_result(answers.get(path))
+        return answers.get(record.path)
+
+    @staticmethod
+    def _needing_ai(others: List[BookRecord], futures: Dict[str, Future]) -> List[BookRecord]:
+        """The other members (already read), without unreadable ones and those the policy skips."""
+        policy = get_policy()
+        members = []
+        for member in others:
+            if member.errors:
+                continue
+            if policy is not None and policy.evaluate(clean_record(member))[0] == "skip":
+                continue
+            members.append(member)
+        return members
+
+
+_ENRICHER = GroupEnricher()
+
+
+def get_group_enricher() -> GroupEnricher:
+    return _ENRICHER
+
+
+def grouping_enabled() -> bool:
+    """ENRICH_GROUPS=1: enrich volumes of a series found in one scan together."""
+    return os.environ.get("ENRICH_GROUPS") == "1"
+
+
+def windows_from_env(records: Iterable[BookRecord]) -> Iterator[List[BookRecord]]:
+    return windows(records, size=int(os.environ.get("ENRICH_GROUP_WINDOW", "64")))
+
+
+def groups_from_env(records: Sequence[BookRecord]) -> List[List[BookRecord]]:
+    return group_records(
+        records,
+        min_size=int(os.environ.get("ENRICH_GROUP_MIN_SIZE", "2")),
+        max_size=int(os.environ.get("ENRICH_GROUP_MAX_SIZE", "12")),
+        similarity=float(os.environ.get("ENRICH_GROUP_SIMILARITY", "0.75")),
+    )
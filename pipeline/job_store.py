@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from models.serialize import book_record_from_dict, book_record_to_dict
+from pipeline.stages import PipelineJob
+
+
+# Stages worth checkpointing: everything after them is cheap to redo
+CHECKPOINT_STAGES = ("read", "enrich", "merge", "write")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    path TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def file_fingerprint(path: str) -> Optional[str]:
+    """Cheap identity of the file content: size and mtime."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+class JobStore:
+    """
+    Durable per-file checkpoints of pipeline stages (SQLite).
+
+    After a stage in CHECKPOINT_STAGES completes, the job state is
+    saved together with the file fingerprint. A later run for the same,
+    unchanged file resumes after the last saved stage.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def save(self, job: PipelineJob, stage: str) -> None:
+        if stage not in CHECKPOINT_STAGES:
+            return
+
+        # A failed AI call must be retried, never resumed past
+        after_ai = CHECKPOINT_STAGES.index(stage) >= CHECKPOINT_STAGES.index("enrich")
+        if after_ai and job.ai_record is None:
+            return
+
+        fingerprint = file_fingerprint(job.record.path)
+        if fingerprint is None:
+            return
+
+        payload = {
+            "record": book_record_to_dict(job.record),
+            "records": [book_record_to_dict(r) for r in job.records],
+            "errors": list(job.errors),
+            "final_record": (
+                book_record_to_dict(job.final_record) if job.final_record is not None else None
+            ),
+            "file_record": (
+                book_record_to_dict(job.file_record) if job.file_record is not None else None
+            ),
+        }
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (path, fingerprint, stage, payload, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job.record.path, fingerprint, stage, json.dumps(payload, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+        job.debugger.log("checkpoint", f"checkpoint saved after {stage}")
+
+    def restore(self, job: PipelineJob) -> Optional[str]:
+        """
+        Load the checkpoint for job's file into `job`.
+        Returns the restored stage, or None when there is no usable
+        checkpoint (none saved, or the file changed since).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, stage, payload FROM jobs WHERE path = ?",
+                (job.record.path,),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        fingerprint, stage, payload = row
+        if fingerprint != file_fingerprint(job.record.path):
+            self.delete(job.record.path)
+            return None
+
+        data = json.loads(payload)
+        job.record = book_record_from_dict(data["record"])
+        job.records = [book_record_from_dict(r) for r in data["records"]]
+        job.errors = list(data["errors"])
+        if data["final_record"] is not None:
+            job.final_record = book_record_from_dict(data["final_record"])
+        if data.get("file_record") is not None:
+            job.file_record = book_record_from_dict(data["file_record"])
+        job.completed = stage
+
+        job.debugger.log("checkpoint", f"resumed after {stage}", job.record)
+        return stage
+
+    def delete(self, path: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE path = ?", (path,))
+            self._conn.commit()
+
+    def stage_of(self, path: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT stage FROM jobs WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
@@ -1,98 +1,78 @@
-from pathlib import Path
-import os
+import asyncio
+from typing import Optional
 
 from models.book import BookRecord
 from models.pipeline import PipelineResult
-from move.mover import move_file
-from naming.renamer import build_filename
-from utils.debug import Debugger
-
-from metadata.reader.registry import read_metadata
-from metadata.cleaner import clean_record
-from ai.enrich import enrich
-from metadata.merge.book_record_merger import merge_book_records
-from metadata.writer.registry import write_metadata
-
-
-def process_file(record: BookRecord) -> PipelineResult:
-    path = Path(record.path)
-    debugger = Debugger(path)
-    errors: list[str] = []
-
-    debugger.log("init", "input BookRecord from scanner", record)
-
-    records = [record]
-
-    # 2. Read embedded metadata
-    try:
-        record_with_meta = read_metadata(record)
-        debugger.log("read_metadata", "metadata read from file", record_with_meta)
-
-        # 2a. Clean file metadata from null-equivalent values
-        record_with_meta = clean_record(record_with_meta)
-        debugger.log("clean_file_meta", "cleaned file metadata", record_with_meta)
-
-        records.append(record_with_meta)
-    except Exception as e:
-        errors.append(f"read_metadata: {e}")
-        debugger.log("read_metadata_error", str(e), record)
-
-    # 3. AI enrichment
-    try:
-        ai_provider = os.getenv("AI_PROVIDER")
-        ai_record = enrich(record, ai_provider)
-
-        ai_record = clean_record(ai_record)
-        debugger.log("ai_enrich", "AI metadata enrichment (cleaned)", ai_record)
-
-        records.append(ai_record)
-    except Exception as e:
-        errors.append(f"ai_enrich: {e}")
-        debugger.log("ai_enrich_error", str(e), record)
-
-    # 4. Merge
-    try:
-        final_record = merge_book_records(records)
-        debugger.log("merge", "merged metadata from all sources", final_record)
-    except Exception as e:
-        debugger.log("merge_error", str(e))
-        return PipelineResult(False, errors=errors + [f"merge: {e}"])
-
-    # 5. Write metadata
-    write_result = write_metadata(final_record)
-    if write_result.success:
-        debugger.log("write_metadata", "metadata written to file", final_record)
-    elif write_result.skipped:
-        debugger.log("write_metadata", "metadata writing skipped", final_record)
-    else:
-        errors.extend(write_result.errors)
-        debugger.log("write_metadata_error", "; ".join(write_result.errors), final_record)
-
-    # 6. Rename
-    try:
-        template = os.environ.get("FILENAME_TEMPLATE")
-        if not template:
-            raise RuntimeError("FILENAME_TEMPLATE not set")
-
-        filename = build_filename(final_record, template)
-        filename = f"{filename}.{final_record.extension}"
-        debugger.log("rename", f"filename built: {filename}", final_record)
-    except Exception as e:
-        debugger.log("rename_error", str(e), final_record)
-        return PipelineResult(False, final_record, errors=errors + [f"rename: {e}"])
-
-    # 7. Move
-    try:
-        target_dir = Path(os.environ.get("BOOKS_READY_DIR", "books_ready"))
-        final_path = move_file(path, target_dir, filename, subdirs=record.directories)
-        debugger.log("move", f"file moved to {final_path}", final_record)
-    except Exception as e:
-        debugger.log("move_error", str(e), final_record)
-        return PipelineResult(False, final_record, errors=errors + [f"move: {e}"])
-
-    return PipelineResult(
-        success=len(errors) == 0,
-        record=final_record,
-        final_path=final_path,
-        errors=errors,
-    )
\ No newline at end of file
+from pipeline.job_store import JobStore
+from pipeline.stages import (
+    STAGES,
+    PipelineJob,
+    aenrich_stage,
+    finish_job,
+    merge_stage,
+    move_stage,
+    read_stage,
+    rename_stage,
+    start_job,
+    write_stage,
+)
+
+
+def process_file(record: BookRecord, job_store: Optional[JobStore] = None) -> PipelineResult:
+    job = start_job(record)
+    if job_store is not None:
+        job_store.restore(job)
+
+    for name, stage in STAGES:
+        if job.skips(name):
+            continue
+
+        stage(job)
+        if job.done:
+            break
+
+        if job_store is not None:
+            job_store.save(job, name)
+
+    return close_job(job, job_store)
+
+
+async def aprocess_file(record: BookRecord, job_store: Optional[JobStore] = None) -> PipelineResult:
+    """
+    Async process_file: the AI call is awaited on the event loop,
+    disk-bound stages (read, write, move) run in worker threads.
+    """
+    job = start_job(record)
+    if job_store is not None:
+        await asyncio.to_thread(job_store.restore, job)
+
+    async def run(name, stage, offload=True):
+        if job.done or job.skips(name):
+            return
+        if asyncio.iscoroutinefunction(stage):
+            await stage(job)
+        elif offload:
+            await asyncio.to_thread(stage, job)
+        else:
+            stage(job)
+        if not job.done and job_store is not None:
+            await asyncio.to_thread(job_store.save, job, name)
+
+    await run("read", read_stage)
+    await run("enrich", aenrich_stage)
+    await run("merge", merge_stage, offload=False)
+    await run("write", write_stage)
+    await run("rename", rename_stage, offload=False)
+    await run("move", move_stage)
+
+    return await asyncio.to_thread(close_job, job, job_store)
+
+
+def close_job(job: PipelineJob, job_store: Optional[JobStore]) -> PipelineResult:
+    result = finish_job(job)
+
+    # Once the file has left NEW_BOOKS_DIR there is nothing to resume
+    if job_store is not None and result.final_path is not None:
+        job_store.delete(job.record.path)
+
+    return result
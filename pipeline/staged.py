@@ -0,0 +1,210 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+from models.book import BookRecord
+from models.pipeline import PipelineResult
+from pipeline.job_store import JobStore
+from pipeline.process_file import close_job
+from pipeline.stages import STAGES, PipelineJob, start_job
+
+
+# Stages doing lxml/zip work; the only ones worth a process pool
+CPU_STAGES = ("read", "write")
+
+_STOP = object()
+
+
+@dataclass
+class StageSpec:
+    name: str
+    fn: Callable[[PipelineJob], PipelineJob]
+    workers: int = 1
+    queue_size: int = 16
+    # Run fn in a process pool (fn and PipelineJob must be picklable)
+    processes: bool = False
+
+
+@dataclass
+class StageStats:
+    processed: int = 0
+    busy_seconds: float = 0.0
+
+
+def stages_from_env() -> List[StageSpec]:
+    """
+    Build stage specs from STAGE_<NAME>_WORKERS, STAGE_<NAME>_PROCESSES
+    and STAGE_QUEUE_SIZE. The AI stage defaults to more workers since
+    it mostly waits on the network.
+    """
+    queue_size = int(os.environ.get("STAGE_QUEUE_SIZE", "16"))
+    specs = []
+
+    for name, fn in STAGES:
+        default_workers = "8" if name == "enrich" else "1"
+        workers = int(os.environ.get(f"STAGE_{name.upper()}_WORKERS", default_workers))
+        processes = (
+            name in CPU_STAGES
+            and os.environ.get(f"STAGE_{name.upper()}_PROCESSES") == "1"
+        )
+        specs.append(StageSpec(name, fn, workers, queue_size, processes))
+
+    return specs
+
+
+class StagedPipeline:
+    """
+    Pipeline stages connected by bounded queues.
+
+    Every stage has its own worker threads, so parsing the next book
+    overlaps with the AI call of the current one. Stages marked
+    `processes` hand their work to a shared process pool. submit()
+    blocks while the first queue is full. Finished jobs are passed to
+    `on_result` from the last stage's worker thread.
+    With a job_store, stages are checkpointed and resumed as in
+    process_file.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[StageSpec],
+        on_result: Callable[[BookRecord, PipelineResult], None],
+        job_store: Optional[JobStore] = None,
+    ):
+        if not stages:
+            raise ValueError("no stages")
+
+        self.stages = list(stages)
+        self._on_result = on_result
+        self._job_store = job_store
+
+        self._queues: List[queue.Queue] = [
+            queue.Queue(maxsize=spec.queue_size) for spec in self.stages
+        ]
+        self._stats: Dict[str, StageStats] = {spec.name: StageStats() for spec in self.stages}
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        pool_workers = sum(spec.workers for spec in self.stages if spec.processes)
+        if pool_workers:
+            self._pool = ProcessPoolExecutor(max_workers=pool_workers)
+
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight: Set[str] = set()
+
+        self._threads: List[threading.Thread] = []
+        for index, spec in enumerate(self.stages):
+            for n in range(spec.workers):
+                t = threading.Thread(
+                    target=self._worker,
+                    args=(index,),
+                    name=f"stage-{spec.name}-{n}",
+                    daemon=True,
+                )
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, record: BookRecord) -> bool:
+        with self._lock:
+            if record.path in self._in_flight:
+                return False
+            self._in_flight.add(record.path)
+
+        job = start_job(record)
+        if self._job_store is not None:
+            self._job_store.restore(job)
+
+        self._queues[0].put(job)
+        return True
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {spec.name: q.qsize() for spec, q in zip(self.stages, self._queues)}
+
+    def stats(self) -> Dict[str, StageStats]:
+        with self._lock:
+            return {name: StageStats(s.processed, s.busy_seconds) for name, s in self._stats.items()}
+
+    def report(self) -> str:
+        depths = self.queue_depths()
+        stats = self.stats()
+        return " ".join(
+            f"{name}={depths[name]}q/{stats[name].processed}done/{stats[name].busy_seconds:.1f}s"
+            for name in depths
+        )
+
+    def wait(self, report_every: Optional[float] = None) -> None:
+        """Block until every submitted job has finished."""
+        with self._idle:
+            while self._in_flight:
+                if not self._idle.wait(report_every) and report_every:
+                    print(f"[pipeline] {self.report()}")
+
+    def shutdown(self) -> None:
+        self.wait()
+        for index, spec in enumerate(self.stages):
+            for _ in range(spec.workers):
+                self._queues[index].put(_STOP)
+        for t in self._threads:
+            t.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "StagedPipeline":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+
+    # ---------------- helpers ----------------
+
+    def _worker(self, index: int) -> None:
+        spec = self.stages[index]
+        inbox = self._queues[index]
+
+        while True:
+            job = inbox.get()
+            if job is _STOP:
+                return
+
+            if not job.done and not job.skips(spec.name):
+                job = self._run_stage(spec, job)
+                if not job.done and self._job_store is not None:
+                    self._job_store.save(job, spec.name)
+
+            if index + 1 < len(self.stages):
+                self._queues[index + 1].put(job)
+            else:
+                self._finish(job)
+
+    def _run_stage(self, spec: StageSpec, job: PipelineJob) -> PipelineJob:
+        started = time.monotonic()
+
+        try:
+            if spec.processes:
+                job = self._pool.submit(spec.fn, job).result()
+            else:
+                job = spec.fn(job)
+        except Exception as e:
+            job.result = PipelineResult(False, job.final_record, errors=job.errors + [f"{spec.name}: {e}"])
+
+        with self._lock:
+            stats = self._stats[spec.name]
+            stats.processed += 1
+            stats.busy_seconds += time.monotonic() - started
+
+        return job
+
+    def _finish(self, job: PipelineJob) -> None:
+        try:
+            self._on_result(job.record, close_job(job, self._job_store))
+        except Exception as e:
+            print(f"[pipeline] result handler failed for {job.record.path}: {e}")
+        finally:
+            with self._idle:
+                self._in_flight.discard(job.record.path)
+                if not self._in_flight:
+                    self._idle.notify_all()
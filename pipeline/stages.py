@@ -0,0 +1,346 @@
+import asyncio
+import os
+import time
+from copy import deepcopy
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+from models.book import BookRecord
+from models.pipeline import PipelineResult
+from move.mover import install_file, move_file, place_file, target_path, temp_path
+from naming.renamer import build_filename
+from utils.debug import Debugger
+
+from metadata.reader.registry import read_metadata
+from metadata.cleaner import clean_record
+from ai.enrich import aenrich, enrich
+from ai.registry import get_policy
+from metadata.merge.book_record_merger import merge_book_records
+from metadata.writer.base import WriteResult
+from metadata.writer.registry import write_metadata
+from pipeline.grouping import get_group_enricher, grouping_enabled
+
+
+@dataclass
+class PipelineJob:
+    """
+    State of one file travelling through the pipeline stages.
+    A stage that ends the job early sets `result`.
+    """
+    record: BookRecord
+    debugger: Debugger
+    records: List[BookRecord] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    final_record: Optional[BookRecord] = None
+    # Metadata as read from the file, before cleaning: the write baseline
+    file_record: Optional[BookRecord] = None
+    filename: Optional[str] = None
+    result: Optional[PipelineResult] = None
+    # Last stage restored from a checkpoint; it and earlier stages are skipped
+    completed: Optional[str] = None
+
+    @property
+    def path(self) -> Path:
+        return Path(self.record.path)
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    @property
+    def ai_record(self) -> Optional[BookRecord]:
+        for record in self.records:
+            if record.source == "ai":
+                return record
+        return None
+
+    def skips(self, stage_name: str) -> bool:
+        if self.completed is None or stage_name not in STAGE_NAMES:
+            return False
+        return STAGE_NAMES.index(stage_name) <= STAGE_NAMES.index(self.completed)
+
+
+def start_job(record: BookRecord) -> PipelineJob:
+    job = PipelineJob(record=record, debugger=Debugger(Path(record.path)))
+    job.debugger.log("init", "input BookRecord from scanner", record)
+    job.records.append(record)
+    return job
+
+
+def finish_job(job: PipelineJob) -> PipelineResult:
+    if job.result is None:
+        raise RuntimeError(f"pipeline job for {job.record.path} did not finish")
+    return job.result
+
+
+# 2. Read embedded metadata
+def read_stage(job: PipelineJob) -> PipelineJob:
+    try:
+        if grouping_enabled() and get_group_enricher().was_read(job.record):
+            # Read when its series group was registered
+            record_with_meta = job.record
+        else:
+            record_with_meta = read_metadata(job.record)
+        job.debugger.log("read_metadata", "metadata read from file", record_with_meta)
+        if not record_with_meta.errors:
+            job.file_record = deepcopy(record_with_meta)
+
+        # 2a. Clean file metadata from null-equivalent values
+        record_with_meta = clean_record(record_with_meta)
+        job.debugger.log("clean_file_meta", "cleaned file metadata", record_with_meta)
+
+        job.records.append(record_with_meta)
+    except Exception as e:
+        job.errors.append(f"read_metadata: {e}")
+        job.debugger.log("read_metadata_error", str(e), job.record)
+
+    return job
+
+
+# 3. AI enrichment
+def enrich_stage(job: PipelineJob) -> PipelineJob:
+    tier = _ai_tier(job)
+    if tier == "skip":
+        return job
+
+    started = time.monotonic()
+    try:
+        provider_name = os.getenv("AI_PROVIDER")
+        ai_record = _group_enrich(job, provider_name, tier) or enrich(job.record, provider_name, tier)
+        add_ai_record(job, ai_record)
+    except Exception as e:
+        _ai_error(job, e)
+    _count_ai(tier, time.monotonic() - started)
+
+    return job
+
+
+async def aenrich_stage(job: PipelineJob) -> PipelineJob:
+    tier = _ai_tier(job)
+    if tier == "skip":
+        return job
+
+    started = time.monotonic()
+    try:
+        provider_name = os.getenv("AI_PROVIDER")
+        ai_record = (
+            await asyncio.to_thread(_group_enrich, job, provider_name, tier)
+            or await aenrich(job.record, provider_name, tier)
+        )
+        add_ai_record(job, ai_record)
+    except Exception as e:
+        _ai_error(job, e)
+    _count_ai(tier, time.monotonic() - started)
+
+    return job
+
+
+def _group_enrich(job: PipelineJob, provider_name: str, tier: str) -> Optional[BookRecord]:
+    """ENRICH_GROUPS: the answer from the one call made for the job's series group."""
+    if not grouping_enabled():
+        return None
+    ai_record = get_group_enricher().enrich(job.record, provider_name, tier)
+    if ai_record is not None:
+        job.debugger.log("ai_group", "AI metadata from the series group request", ai_record)
+    return ai_record
+
+
+def _ai_tier(job: PipelineJob) -> str:
+    """AI_POLICY: judge the cleaned file metadata (last record read) before calling AI."""
+    policy = get_policy()
+    if policy is None:
+        return "full"
+
+    tier, reason = policy.evaluate(job.records[-1])
+    job.debugger.log("ai_policy", f"{tier}: {reason}", job.records[-1])
+    if tier == "skip":
+        policy.record("skip")
+    return tier
+
+
+def _count_ai(tier: str, seconds: float) -> None:
+    policy = get_policy()
+    if policy is not None:
+        policy.record(tier, seconds)
+
+
+def add_ai_record(job: PipelineJob, ai_record: BookRecord) -> None:
+    ai_record = clean_record(ai_record)
+    job.debugger.log("ai_enrich", "AI metadata enrichment (cleaned)", ai_record)
+    job.records.append(ai_record)
+
+
+def _ai_error(job: PipelineJob, e: Exception) -> None:
+    job.errors.append(f"ai_enrich: {e}")
+    job.debugger.log("ai_enrich_error", str(e), job.record)
+
+
+# 4. Merge
+def merge_stage(job: PipelineJob) -> PipelineJob:
+    try:
+        job.final_record = merge_book_records(job.records)
+        job.debugger.log("merge", "merged metadata from all sources", job.final_record)
+    except Exception as e:
+        job.debugger.log("merge_error", str(e))
+        job.result = PipelineResult(False, errors=job.errors + [f"merge: {e}"])
+
+    return job
+
+
+def write_to_destination() -> bool:
+    """
+    WRITE_TO_DESTINATION=1: the writer's output goes straight to
+    BOOKS_READY_DIR. Implied by the keep-original placement modes, where
+    the source must never be rewritten in place.
+    """
+    return os.environ.get("WRITE_TO_DESTINATION") == "1" or placement_mode() != "move"
+
+
+def placement_mode() -> str:
+    """MOVE_MODE: move (default), or reflink / hardlink / copy to keep the original."""
+    return os.environ.get("MOVE_MODE", "move")
+
+
+# 5. Write metadata
+def write_stage(job: PipelineJob) -> PipelineJob:
+    if write_to_destination():
+        # Done by move_stage, once the final filename is known
+        return job
+
+    write_result = write_metadata(job.final_record, job.file_record)
+    _report_write(job, write_result)
+    return job
+
+
+def _report_write(job: PipelineJob, write_result: WriteResult) -> None:
+    final_record = job.final_record
+
+    if write_result.skipped:
+        if write_result.success:
+            job.debugger.log("write_metadata", "metadata unchanged, writing skipped", final_record)
+        else:
+            job.debugger.log("write_metadata", "metadata writing skipped", final_record)
+    elif write_result.success:
+        changed = write_result.changed_fields
+        detail = f" (changed: {', '.join(changed)})" if changed else ""
+        job.debugger.log("write_metadata", f"metadata written to file{detail}", final_record)
+    else:
+        job.errors.extend(write_result.errors)
+        job.debugger.log("write_metadata_error", "; ".join(write_result.errors), final_record)
+
+
+# 6. Rename
+def rename_stage(job: PipelineJob) -> PipelineJob:
+    final_record = job.final_record
+
+    try:
+        template = os.environ.get("FILENAME_TEMPLATE")
+        if not template:
+            raise RuntimeError("FILENAME_TEMPLATE not set")
+
+        filename = build_filename(final_record, template)
+        job.filename = f"{filename}.{final_record.extension}"
+        job.debugger.log("rename", f"filename built: {job.filename}", final_record)
+    except Exception as e:
+        job.debugger.log("rename_error", str(e), final_record)
+        job.result = PipelineResult(False, final_record, errors=job.errors + [f"rename: {e}"])
+
+    return job
+
+
+# 7. Move
+def move_stage(job: PipelineJob) -> PipelineJob:
+    final_record = job.final_record
+
+    try:
+        target_dir = Path(os.environ.get("BOOKS_READY_DIR", "books_ready"))
+        if write_to_destination():
+            final_path = _write_and_move(job, target_dir)
+            if placement_mode() != "move":
+                _archive_original(job)
+        else:
+            final_path = move_file(
+                job.path,
+                target_dir,
+                job.filename,
+                subdirs=job.record.directories,
+                on_collision=_collision_mode(),
+            )
+        job.debugger.log("move", f"file moved to {final_path}", final_record)
+    except Exception as e:
+        job.debugger.log("move_error", str(e), final_record)
+        job.result = PipelineResult(False, final_record, errors=job.errors + [f"move: {e}"])
+        return job
+
+    job.result = PipelineResult(
+        success=len(job.errors) == 0,
+        record=final_record,
+        final_path=final_path,
+        errors=job.errors,
+    )
+    return job
+
+
+def _write_and_move(job: PipelineJob, target_dir: Path) -> Path:
+    """
+    Write the metadata straight into a temp file next to the final path,
+    rename it into place and drop the source (unless MOVE_MODE keeps it):
+    one read, one write. When nothing is written the file is placed as is,
+    which in the keep-original modes costs a reflink or a hardlink.
+    """
+    mode = placement_mode()
+    target = target_path(target_dir, job.filename, job.record.directories)
+    tmp = temp_path(target)
+
+    write_result = write_metadata(job.final_record, job.file_record, output_path=str(tmp))
+    _report_write(job, write_result)
+
+    if write_result.success and not write_result.skipped:
+        return install_file(
+            job.path, tmp, target, on_collision=_collision_mode(), keep_source=mode != "move"
+        )
+
+    if tmp.exists():
+        tmp.unlink()
+    return place_file(
+        job.path,
+        target_dir,
+        job.filename,
+        subdirs=job.record.directories,
+        mode=mode,
+        on_collision=_collision_mode(),
+    )
+
+
+def _archive_original(job: PipelineJob) -> None:
+    """Keep-original modes: move the untouched source to ARCHIVE_DIR, if set."""
+    archive_dir = os.environ.get("ARCHIVE_DIR")
+    if not archive_dir:
+        return
+
+    archived = move_file(
+        job.path,
+        Path(archive_dir),
+        job.record.original_filename,
+        subdirs=job.record.directories,
+        on_collision="version",
+    )
+    job.debugger.log("archive", f"original archived to {archived}", job.final_record)
+
+
+def _collision_mode() -> str:
+    """MOVE_ON_COLLISION: overwrite (default), version (name_v1.ext, ...) or fail."""
+    return os.environ.get("MOVE_ON_COLLISION", "overwrite")
+
+
+STAGES = (
+    ("read", read_stage),
+    ("enrich", enrich_stage),
+    ("merge", merge_stage),
+    ("write", write_stage),
+    ("rename", rename_stage),
+    ("move", move_stage),
+)
+
+STAGE_NAMES = tuple(name for name, _ in STAGES)
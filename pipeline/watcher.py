@@ -1,12 +1,25 @@
 import os
 import time
-from typing import List
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
 
 from dotenv import load_dotenv
 
+from ai.cascade import get_cascade_stats
+from ai.registry import get_hedger, get_policy
 from models.book import BookRecord
-from pipeline.process_file import process_file
-from scanner.directory_scanner import scan_directory
+from models.pipeline import PipelineResult
+from move.mover import MoveError, move_file, place_file
+from pipeline.dedup import DEDUP_ACTIONS, DedupIndex, content_hash
+from pipeline.executor import AsyncPipelineExecutor, PipelineExecutor
+from pipeline.failures import FailureRegistry
+from pipeline.grouping import get_group_enricher, groups_from_env, grouping_enabled, windows_from_env
+from pipeline.job_store import JobStore
+from pipeline.process_file import aprocess_file, process_file
+from pipeline.staged import StagedPipeline, stages_from_env
+from scanner.directory_scanner import iter_directory, scan_directory_incremental
+from scanner.inotify import InotifyUnavailable, InotifyWatcher
+from scanner.manifest import FileManifest, FileState
 
 
 def run_watcher() -> None:
@@ -17,35 +30,477 @@ def run_watcher() -> None:
         raise RuntimeError("NEW_BOOKS_DIR is not set")
 
     sleep_seconds = int(os.environ.get("WATCH_SLEEP_SECONDS", "10"))
+    concurrency = int(os.environ.get("WATCH_CONCURRENCY", "1"))
+    use_async = os.environ.get("WATCH_ASYNC") == "1"
+    use_staged = os.environ.get("WATCH_STAGED") == "1"
+    ignore = _split_env("SCAN_IGNORE")
+
+    manifest: Optional[FileManifest] = None
+    manifest_path = os.environ.get("SCAN_MANIFEST_PATH")
+    if manifest_path:
+        manifest = FileManifest.load(Path(manifest_path))
+
+    # Failure memory needs the job store: a retried file must resume from
+    # its checkpoints instead of paying for another AI call. Either path
+    # enables both, sharing one database unless both are set.
+    job_store: Optional[JobStore] = None
+    job_store_path = os.environ.get("JOB_STORE_PATH") or os.environ.get("FAILURE_DB_PATH")
+    if job_store_path:
+        job_store = JobStore(Path(job_store_path))
+
+    failures: Optional[FailureRegistry] = None
+    failure_db_path = os.environ.get("FAILURE_DB_PATH") or job_store_path
+    if failure_db_path:
+        failures = FailureRegistry.from_env(Path(failure_db_path))
+
+    quarantine_dir = os.environ.get("QUARANTINE_DIR")
+
+    dedup: Optional[DedupIndex] = None
+    dedup_path = os.environ.get("DEDUP_DB_PATH")
+    dedup_action = os.environ.get("DEDUP_ACTION", "skip")
+    if dedup_action not in DEDUP_ACTIONS:
+        raise RuntimeError(f"unknown DEDUP_ACTION: {dedup_action}")
+    if dedup_path:
+        dedup = DedupIndex(Path(dedup_path))
 
     print(f"[watcher] watching NEW_BOOKS_DIR: {new_books_dir}")
     print(f"[watcher] sleep when idle: {sleep_seconds}s")
+    if use_staged:
+        print("[watcher] staged pipeline")
+    else:
+        print(f"[watcher] concurrency: {concurrency}{' (asyncio)' if use_async else ''}")
+    if ignore:
+        print(f"[watcher] ignoring: {', '.join(ignore)}")
+    if manifest is not None:
+        print(f"[watcher] incremental scan, manifest: {manifest_path} ({len(manifest)} files)")
+    if job_store is not None:
+        print(f"[watcher] resuming jobs from: {job_store_path}")
+    if failures is not None:
+        print(
+            f"[watcher] failed files back off from {failures.backoff_seconds:g}s, "
+            f"max attempts: {failures.max_attempts}"
+            + (f", then quarantined to: {quarantine_dir}" if quarantine_dir else "")
+        )
+    if grouping_enabled():
+        print("[watcher] series volumes found in one scan are enriched together")
+    policy = get_policy()
+    if policy is not None:
+        print(
+            f"[watcher] AI policy: skip at score {policy.skip_score:g} with {', '.join(policy.required)}, "
+            f"cheap from {policy.cheap_score:g}"
+        )
+    if dedup is not None:
+        print(f"[watcher] duplicates: {dedup_action}, index: {dedup_path} ({len(dedup)} books)")
 
-    while True:
-        try:
-            records: List[BookRecord] = scan_directory(new_books_dir)
-        except Exception as e:
-            print(f"[watcher] scan error: {e}")
-            time.sleep(sleep_seconds)
-            continue
+    move_mode = os.environ.get("MOVE_MODE", "move")
+    if move_mode != "move":
+        # The original stays in NEW_BOOKS_DIR unless archived: without a
+        # manifest every scan would process it again
+        if not os.environ.get("ARCHIVE_DIR") and manifest is None:
+            raise RuntimeError(f"MOVE_MODE={move_mode} needs ARCHIVE_DIR or SCAN_MANIFEST_PATH")
+        print(f"[watcher] placement: {move_mode}, originals kept")
 
-        if not records:
-            time.sleep(sleep_seconds)
-            continue
+    backend = os.environ.get("WATCH_BACKEND", "auto")
+    if backend not in ("auto", "inotify", "poll"):
+        raise RuntimeError(f"unknown WATCH_BACKEND: {backend}")
 
-        for record in records:
-            try:
-                print(f"[watcher] processing: {record.path}")
-                result = process_file(record)
+    watcher = _Watcher(new_books_dir, ignore, manifest, job_store, sleep_seconds)
+    watcher.failures = failures
+    watcher.quarantine_dir = Path(quarantine_dir) if quarantine_dir else None
+    watcher.dedup = dedup
+    watcher.dedup_action = dedup_action
+
+    if use_staged:
+        executor = StagedPipeline(stages_from_env(), watcher.report, job_store)
+    elif use_async:
+        executor = AsyncPipelineExecutor(concurrency)
+    else:
+        executor = PipelineExecutor(concurrency)
+
+    with executor:
+        watcher.executor = executor
 
-                if result.success:
-                    print(f"[watcher] OK: {record.path}")
+        try:
+            if backend != "poll":
+                try:
+                    inotify = InotifyWatcher(new_books_dir, ignore)
+                except InotifyUnavailable as e:
+                    if backend == "inotify":
+                        raise
+                    print(f"[watcher] inotify unavailable, falling back to polling: {e}")
                 else:
-                    print(f"[watcher] FAILED: {record.path}")
-                    for err in result.errors:
-                        print(f"  - {err}")
+                    with inotify:
+                        watcher.run_inotify(inotify)
+                    return
+
+            watcher.run_polling()
+        finally:
+            # Files finished since the last save (e.g. on Ctrl+C)
+            watcher._save_manifest()
+
+
+class _Watcher:
+    def __init__(
+        self,
+        new_books_dir: str,
+        ignore: List[str],
+        manifest: Optional[FileManifest],
+        job_store: Optional[JobStore],
+        sleep_seconds: int,
+    ):
+        self.new_books_dir = new_books_dir
+        self.ignore = ignore
+        self.manifest = manifest
+        self.job_store = job_store
+        self.sleep_seconds = sleep_seconds
+        self.executor: PipelineExecutor | AsyncPipelineExecutor | StagedPipeline | None = None
+        self.report_seconds = float(os.environ.get("STAGE_REPORT_SECONDS", "30"))
+        # The whole manifest is rewritten on save: not after every file
+        self.manifest_save_seconds = float(os.environ.get("SCAN_MANIFEST_SAVE_SECONDS", "60"))
+        self._manifest_saved = time.monotonic()
+        self.failures: Optional[FailureRegistry] = None
+        self.dedup: Optional[DedupIndex] = None
+        self.dedup_action = "skip"
+        # Content hashes claimed by submitted files, earlier outputs a
+        # DEDUP_ACTION=replace job supersedes and duplicates left in
+        # NEW_BOOKS_DIR; all keyed by input path
+        self._hashes: Dict[str, str] = {}
+        self._replacing: Dict[str, Path] = {}
+        self._left: Dict[str, FileState] = {}
+        self.quarantine_dir: Optional[Path] = None
+
+    def run_polling(self) -> None:
+        print("[watcher] backend: polling")
 
+        while True:
+            try:
+                processed = self._scan_and_process()
             except Exception as e:
-                print(f"[watcher] unexpected error for {record.path}: {e}")
+                print(f"[watcher] scan error: {e}")
+                time.sleep(self.sleep_seconds)
+                continue
+
+            if not processed:
+                time.sleep(self.sleep_seconds)
+                continue
+
+            time.sleep(1)
+
+    def run_inotify(self, inotify: InotifyWatcher) -> None:
+        # Full rescans still run periodically: they pick up files that were
+        # already present at startup, failed files that stay in the inbox and
+        # anything the kernel did not report (e.g. changes made over NFS).
+        rescan_seconds = int(os.environ.get("WATCH_RESCAN_SECONDS", "300"))
+        print(f"[watcher] backend: inotify, full rescan every {rescan_seconds}s")
+
+        next_rescan = 0.0
+
+        while True:
+            if time.monotonic() >= next_rescan:
+                try:
+                    self._scan_and_process()
+                except Exception as e:
+                    print(f"[watcher] scan error: {e}")
+                    time.sleep(self.sleep_seconds)
+                    continue
+                next_rescan = (
+                    time.monotonic() + rescan_seconds if rescan_seconds > 0 else float("inf")
+                )
+
+            timeout = None
+            if next_rescan != float("inf"):
+                timeout = max(0.0, next_rescan - time.monotonic())
+
+            events = inotify.read(timeout)
+            if events.overflow:
+                print("[watcher] inotify queue overflow, rescanning")
+                next_rescan = 0.0
+
+            for record in events.records:
+                # The event may be stale: the file was already processed and moved
+                if not os.path.isfile(record.path):
+                    continue
+                self._submit(record)
+
+            self._wait()
+            self._save_manifest()
+
+    def report(self, record: BookRecord, result: PipelineResult) -> None:
+        if result.success:
+            print(f"[watcher] OK: {record.path}")
+            # Only a finished job marks its file as seen (a kept original
+            # is skipped from now on). Saved at the end of the pass, and
+            # every manifest_save_seconds during long ones
+            self._remember(record)
+            self._save_manifest_due()
+        else:
+            print(f"[watcher] FAILED: {record.path}")
+            for err in result.errors:
+                print(f"  - {err}")
+            self._forget(record)
+
+        if result.final_path is None:
+            self._failed(record, result.errors)
+        elif self.failures is not None:
+            self.failures.clear(record.path)
+
+        self._indexed(record, result.final_path)
+
+    # ---------------- helpers ----------------
+
+    def _scan_and_process(self) -> int:
+        processed = 0
+
+        if grouping_enabled():
+            # Volumes of a series are enriched together: the scan is
+            # grouped a directory (bounded window) at a time as it streams
+            for window in windows_from_env(self._scan()):
+                admitted = [record for record in window if self._admit(record)]
+                get_group_enricher().add(groups_from_env(admitted))
+                for record in admitted:
+                    if self._dispatch(record):
+                        processed += 1
+        else:
+            for record in self._scan():
+                if self._submit(record):
+                    processed += 1
+
+        self._wait()
+        self._save_manifest()
+        get_group_enricher().clear()
+
+        policy = get_policy()
+        if processed and policy is not None:
+            print(f"[watcher] AI policy: {policy.stats().summary()}")
+        hedger = get_hedger()
+        if processed and hedger is not None:
+            print(f"[watcher] AI hedging: {hedger.stats().summary()}")
+        cascade = get_cascade_stats().summary()
+        if processed and cascade:
+            print(f"[watcher] AI cascade: {cascade}")
+
+        return processed
+
+    def _scan(self) -> Iterable[BookRecord]:
+        if self.manifest is None:
+            return iter_directory(self.new_books_dir, self.ignore)
+
+        # Changed files enter the manifest when their job succeeds (report)
+        delta = scan_directory_incremental(self.new_books_dir, self.manifest, self.ignore, update_changed=False)
+        for path in delta.removed:
+            print(f"[watcher] removed: {path}")
+        self.manifest.save()
+
+        return delta.changed
+
+    def _submit(self, record: BookRecord) -> bool:
+        return self._admit(record) and self._dispatch(record)
+
+    def _admit(self, record: BookRecord) -> bool:
+        """False for files that must not be processed now."""
+        if self.failures is not None and not self.failures.is_due(record.path):
+            # Still backing off; keep it out of the manifest so a later
+            # scan sees it again
+            self._forget(record)
+            return False
+
+        if self.dedup is not None and self._duplicate(record):
+            return False
+
+        return True
+
+    def _dispatch(self, record: BookRecord) -> bool:
+        if isinstance(self.executor, StagedPipeline):
+            print(f"[watcher] queued: {record.path}")
+            return self.executor.submit(record)
+        if self.executor.asynchronous:
+            return self.executor.submit(record.path, lambda: self._aprocess(record))
+        return self.executor.submit(record.path, lambda: self._process(record))
+
+    def _wait(self) -> None:
+        if isinstance(self.executor, StagedPipeline):
+            self.executor.wait(self.report_seconds)
+        else:
+            self.executor.wait()
+
+    def _process(self, record: BookRecord) -> None:
+        try:
+            print(f"[watcher] processing: {record.path}")
+            self.report(record, process_file(record, self.job_store))
+        except Exception as e:
+            print(f"[watcher] unexpected error for {record.path}: {e}")
+            self._forget(record)
+            self._failed(record, [str(e)])
+            self._indexed(record, None)
+
+    async def _aprocess(self, record: BookRecord) -> None:
+        try:
+            print(f"[watcher] processing: {record.path}")
+            self.report(record, await aprocess_file(record, self.job_store))
+        except Exception as e:
+            print(f"[watcher] unexpected error for {record.path}: {e}")
+            self._forget(record)
+            self._failed(record, [str(e)])
+            self._indexed(record, None)
+
+    def _remember(self, record: BookRecord) -> None:
+        if self.manifest is None:
+            return
+        try:
+            self.manifest.update(record.path, FileState.from_stat(os.stat(record.path)))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _state(record: BookRecord) -> Optional[FileState]:
+        try:
+            return FileState.from_stat(os.stat(record.path))
+        except OSError:
+            return None
+
+    def _forget(self, record: BookRecord) -> None:
+        # Failed files stay in NEW_BOOKS_DIR; drop them from the manifest
+        # so the next scan picks them up again.
+        if self.manifest is not None:
+            self.manifest.remove(record.path)
+
+    def _failed(self, record: BookRecord, errors: List[str]) -> None:
+        if self.failures is None:
+            return
+
+        attempts = self.failures.record_failure(record.path, errors)
+        if attempts == 0:
+            return
+        if not self.failures.exhausted(attempts) or self.quarantine_dir is None:
+            print(f"[watcher] attempt {attempts} failed, backing off: {record.path}")
+            return
+
+        try:
+            target = move_file(
+                Path(record.path),
+                self.quarantine_dir,
+                record.original_filename,
+                subdirs=record.directories,
+                # An earlier failure with the same name is kept too
+                on_collision="version",
+            )
+        except MoveError as e:
+            print(f"[watcher] quarantine failed for {record.path}: {e}")
+            return
+
+        print(f"[watcher] quarantined after {attempts} attempts: {target}")
+        self.failures.clear(record.path)
+        if self.job_store is not None:
+            self.job_store.delete(record.path)
+
+    def _duplicate(self, record: BookRecord) -> bool:
+        """
+        Hash the file and claim the hash before any parsing or AI work.
+        True when the file must not be processed: DEDUP_ACTION handled
+        it (skip, link) or a copy is still being processed (it is left for
+        a later scan). With replace the file is processed and its output
+        supersedes the old one.
+        """
+        if record.path in self._hashes:
+            # Already in flight; the executor refuses it
+            return False
+
+        state = self._state(record)
+        if state is not None and self._left.get(record.path) == state:
+            return True
+
+        try:
+            digest = content_hash(record.path)
+        except OSError as e:
+            print(f"[watcher] cannot hash {record.path}: {e}")
+            return False
+
+        existing, holder = self.dedup.claim(digest, record.path)
+        if holder is not None:
+            print(f"[watcher] duplicate of {holder}, still in progress: {record.path}")
+            return True
+
+        self._hashes[record.path] = digest
+        if existing is None:
+            return False
+
+        if self.dedup_action == "replace":
+            print(f"[watcher] duplicate of {existing}, replacing it: {record.path}")
+            self._replacing[record.path] = existing
+            return False
+
+        self._indexed(record, None)
+        try:
+            if self.dedup_action == "link":
+                linked = self._link_duplicate(record, existing)
+                if linked is not None:
+                    print(f"[watcher] duplicate of {existing}, linked: {linked}")
+            self._set_aside(record, state)
+        except (OSError, MoveError) as e:
+            print(f"[watcher] duplicate handling failed for {record.path}: {e}")
+            return True
+
+        print(f"[watcher] duplicate of {existing}, skipped: {record.path}")
+        return True
+
+    @staticmethod
+    def _link_duplicate(record: BookRecord, existing: Path) -> Optional[Path]:
+        """Hardlink the earlier output into the duplicate's own subdirectory."""
+        ready_dir = Path(os.environ.get("BOOKS_READY_DIR", "books_ready"))
+        target_dir = ready_dir.joinpath(*record.directories) if record.directories else ready_dir
+        if target_dir.resolve() == existing.parent.resolve():
+            return None
+        return place_file(
+            existing, ready_dir, existing.name, subdirs=record.directories, mode="hardlink", on_collision="version"
+        )
+
+    def _set_aside(self, record: BookRecord, state: Optional[FileState]) -> None:
+        """
+        Take the duplicate out of NEW_BOOKS_DIR into ARCHIVE_DIR, else
+        QUARANTINE_DIR. Without either it stays where it is and is skipped
+        until it changes: a duplicate is never deleted, the hash match
+        may be wrong.
+        """
+        archive_dir = os.environ.get("ARCHIVE_DIR")
+        target_dir = Path(archive_dir) if archive_dir else self.quarantine_dir
+        if target_dir is not None:
+            move_file(
+                Path(record.path),
+                target_dir,
+                record.original_filename,
+                subdirs=record.directories,
+                on_collision="version",
+            )
+            return
+
+        self._remember(record)
+        if state is not None:
+            self._left[record.path] = state
+
+    def _indexed(self, record: BookRecord, final_path: Optional[Path]) -> None:
+        """Record the output for the file's hash, or release the claim."""
+        digest = self._hashes.pop(record.path, None)
+        replaced = self._replacing.pop(record.path, None)
+        if self.dedup is None or digest is None:
+            return
+        if final_path is None:
+            self.dedup.release(digest, record.path)
+            return
+
+        self.dedup.record(digest, final_path)
+        if replaced is not None and Path(replaced) != Path(final_path):
+            replaced.unlink(missing_ok=True)
+            print(f"[watcher] replaced: {replaced}")
+
+    def _save_manifest(self) -> None:
+        if self.manifest is not None:
+            self.manifest.save()
+            self._manifest_saved = time.monotonic()
+
+    def _save_manifest_due(self) -> None:
+        if self.manifest is not None and time.monotonic() - self._manifest_saved >= self.manifest_save_seconds:
+            self._save_manifest()
+
 
-        time.sleep(1)
+def _split_env(name: str) -> List[str]:
+    return [p.strip() for p in os.environ.get(name, "").split(",") if p.strip()]
@@ -0,0 +1,35 @@
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from pipeline.batch import batch_dir, export_pending, ingest, refresh, submit
+from scanner.directory_scanner import iter_directory
+
+USAGE = "usage: python run_batch.py export|submit|status|ingest"
+
+
+def run_batch(command: str) -> None:
+    load_dotenv()
+    directory = batch_dir()
+
+    if command == "export":
+        new_books_dir = os.environ.get("NEW_BOOKS_DIR")
+        if not new_books_dir:
+            raise RuntimeError("NEW_BOOKS_DIR is not set")
+        ignore = [p.strip() for p in os.environ.get("SCAN_IGNORE", "").split(",") if p.strip()]
+        export_pending(iter_directory(new_books_dir, ignore), directory)
+    elif command == "submit":
+        submit(directory)
+    elif command == "status":
+        refresh(directory)
+    elif command == "ingest":
+        ingest(directory)
+    else:
+        raise SystemExit(USAGE)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        raise SystemExit(USAGE)
+    run_batch(sys.argv[1])
@@ -1,11 +1,144 @@
+import fnmatch
+import os
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from scanner.file_scanner import scan_file
+from scanner.file_scanner import build_record
+from scanner.manifest import FileManifest, FileState
 from models.book import BookRecord
 
 
-def scan_directory(root_dir: str) -> List[BookRecord]:
+# Hidden files/directories and writer temp output are never books
+DEFAULT_IGNORE: Tuple[str, ...] = (".*", "*.tmp")
+
+
+@dataclass
+class ScanDelta:
+    changed: List[BookRecord] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+
+def scan_directory(root_dir: str, ignore: Iterable[str] = ()) -> List[BookRecord]:
+    return list(iter_directory(root_dir, ignore))
+
+
+def iter_directory(
+    root_dir: str,
+    ignore: Iterable[str] = (),
+    subdir: Sequence[str] = (),
+) -> Iterator[BookRecord]:
+    """
+    Yield a BookRecord for every file under root_dir as soon as it is found.
+
+    Ignored entries (DEFAULT_IGNORE plus `ignore` globs, matched against
+    the entry name and its path relative to root_dir) are pruned before
+    descending, so ignored subtrees are never listed.
+    `subdir` limits the walk to one subtree while keeping
+    BookRecord.directories relative to root_dir.
+    """
+    root = _resolve_root(root_dir)
+    top = os.path.join(str(root), *subdir)
+
+    for entry, directories in _walk(top, ignore_patterns(ignore), list(subdir)):
+        yield build_record(entry.path, directories)
+
+
+def scan_directory_incremental(
+    root_dir: str,
+    manifest: FileManifest,
+    ignore: Iterable[str] = (),
+    update_changed: bool = True,
+) -> ScanDelta:
+    """
+    Scan root_dir and report only files that are new or changed since
+    the manifest last saw them, plus manifest entries that disappeared.
+    The manifest is updated in memory; the caller decides when to save it.
+    With update_changed=False changed files are only reported: the caller
+    records them once they are processed, so a crash in between leaves
+    them changed for the next scan.
+    """
+    root = _resolve_root(root_dir)
+
+    delta = ScanDelta()
+    seen: set[str] = set()
+
+    for entry, directories in _walk(str(root), ignore_patterns(ignore)):
+        try:
+            st = entry.stat()
+        except FileNotFoundError:
+            continue
+
+        seen.add(entry.path)
+
+        state = FileState.from_stat(st)
+        if manifest.get(entry.path) == state:
+            continue
+
+        if update_changed:
+            manifest.update(entry.path, state)
+        delta.changed.append(build_record(entry.path, directories))
+
+    prefix = str(root) + os.sep
+    for key in manifest.paths():
+        if key.startswith(prefix) and key not in seen:
+            manifest.remove(key)
+            delta.removed.append(key)
+
+    return delta
+
+
+def _walk(
+    top: str,
+    patterns: Sequence[str],
+    base: Optional[List[str]] = None,
+) -> Iterator[Tuple[os.DirEntry, List[str]]]:
+    """
+    Depth-first os.scandir walk yielding (file entry, directories relative
+    to the scan root). Symlinked directories are not followed.
+    """
+    stack: List[Tuple[str, List[str]]] = [(top, base or [])]
+
+    while stack:
+        current, directories = stack.pop()
+
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except (FileNotFoundError, PermissionError, NotADirectoryError):
+            continue
+
+        subdirs: List[Tuple[str, List[str]]] = []
+
+        for entry in entries:
+            if is_ignored(entry.name, directories, patterns):
+                continue
+
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append((entry.path, directories + [entry.name]))
+                elif entry.is_file():
+                    yield entry, directories
+            except OSError:
+                continue
+
+        # Reversed so directories are visited in name order
+        stack.extend(reversed(subdirs))
+
+
+def is_ignored(name: str, directories: List[str], patterns: Sequence[str]) -> bool:
+    relative = "/".join(directories + [name])
+    for pattern in patterns:
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative, pattern):
+            return True
+    return False
+
+
+def ignore_patterns(ignore: Iterable[str]) -> Tuple[str, ...]:
+    return DEFAULT_IGNORE + tuple(p for p in ignore if p)
+
+
+def _resolve_root(root_dir: str) -> Path:
     root = Path(root_dir).resolve()
 
     if not root.exists():
@@ -14,13 +147,4 @@ def scan_directory(root_dir: str) -> List[BookRecord]:
     if not root.is_dir():
         raise ValueError("Root path is not a directory")
 
-    records: List[BookRecord] = []
-
-    for path in root.rglob("*"):
-        if not path.is_file():
-            continue
-
-        record = scan_file(str(path), str(root))
-        records.append(record)
-
-    return records
+    return root
@@ -1,4 +1,7 @@
+import os
 from pathlib import Path
+from typing import List
+
 from models.book import BookRecord
 
 
@@ -13,13 +16,21 @@ def scan_file(file_path: str, root_dir: str) -> BookRecord:
 
     directories = list(relative_path.parent.parts)
 
-    filename = file_path.name
-    extension = file_path.suffix.lstrip(".") if file_path.suffix else ""
+    return build_record(str(file_path), directories)
+
+
+def build_record(file_path: str, directories: List[str]) -> BookRecord:
+    """
+    Build a scanner BookRecord for an already resolved path.
+    No filesystem access; directories are relative to the scan root.
+    """
+    filename = os.path.basename(file_path)
+    extension = os.path.splitext(filename)[1].lstrip(".")
 
     return BookRecord(
-        path=str(file_path),
+        path=file_path,
         original_filename=filename,
         extension=extension,
-        directories=directories,
+        directories=list(directories),
         source="file",
     )
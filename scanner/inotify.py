@@ -0,0 +1,202 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from models.book import BookRecord
+from scanner.directory_scanner import ignore_patterns, is_ignored, iter_directory
+from scanner.file_scanner import build_record
+
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+_READ_SIZE = 64 * 1024
+
+
+class InotifyUnavailable(Exception):
+    pass
+
+
+@dataclass
+class InotifyEvents:
+    records: List[BookRecord] = field(default_factory=list)
+    # Kernel queue overflowed: events were lost, caller must rescan
+    overflow: bool = False
+
+
+class InotifyWatcher:
+    """
+    Recursive inotify watch over a scan root.
+
+    Reports files that were closed after writing or moved into the tree;
+    directories created or moved in are watched and their existing files
+    reported. Ignore rules are the same as for iter_directory.
+    """
+
+    def __init__(self, root_dir: str, ignore: Iterable[str] = ()):
+        self.root = str(Path(root_dir).resolve())
+        self._ignore = list(ignore)
+        self._patterns = ignore_patterns(self._ignore)
+        self._libc = _load_libc()
+
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise InotifyUnavailable(f"inotify_init1 failed: {os.strerror(err)}")
+
+        # wd -> directories relative to root
+        self._watches: Dict[int, List[str]] = {}
+
+        try:
+            self._watch_tree([])
+        except Exception:
+            self.close()
+            raise
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._watches.clear()
+
+    def __enter__(self) -> "InotifyWatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def read(self, timeout: float | None = None) -> InotifyEvents:
+        """
+        Wait up to `timeout` seconds for events and return the affected
+        files. An empty result means the timeout expired.
+        """
+        result = InotifyEvents()
+
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return result
+
+        seen: set[str] = set()
+
+        for wd, mask, name in self._read_events():
+            if mask & IN_Q_OVERFLOW:
+                result.overflow = True
+                continue
+
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            directories = self._watches.get(wd)
+            if directories is None or not name:
+                continue
+
+            if is_ignored(name, directories, self._patterns):
+                continue
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    subdir = directories + [name]
+                    self._watch_tree(subdir)
+                    # Files may have landed before the watch was added
+                    for record in iter_directory(self.root, self._ignore, subdir):
+                        if record.path not in seen:
+                            seen.add(record.path)
+                            result.records.append(record)
+                continue
+
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                path = os.path.join(self.root, *directories, name)
+                if path not in seen:
+                    seen.add(path)
+                    result.records.append(build_record(path, directories))
+
+        return result
+
+    # ---------------- helpers ----------------
+
+    def _read_events(self) -> Iterable[Tuple[int, int, str]]:
+        while True:
+            try:
+                buf = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                return
+
+            offset = 0
+            while offset + _EVENT.size <= len(buf):
+                wd, mask, _cookie, length = _EVENT.unpack_from(buf, offset)
+                offset += _EVENT.size
+                raw = buf[offset:offset + length]
+                offset += length
+                name = os.fsdecode(raw.rstrip(b"\0"))
+                yield wd, mask, name
+
+    def _watch_tree(self, subdir: Sequence[str]) -> None:
+        stack = [list(subdir)]
+
+        while stack:
+            directories = stack.pop()
+            path = os.path.join(self.root, *directories)
+
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                # Directory vanished or became unreadable before we got to it
+                if err in (errno.ENOENT, errno.EACCES, errno.ENOTDIR):
+                    continue
+                raise InotifyUnavailable(f"inotify_add_watch failed for {path}: {os.strerror(err)}")
+
+            self._watches[wd] = directories
+
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if is_ignored(entry.name, directories, self._patterns):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(directories + [entry.name])
+            except (FileNotFoundError, PermissionError, NotADirectoryError):
+                continue
+
+
+def _load_libc() -> ctypes.CDLL:
+    name = ctypes.util.find_library("c")
+    try:
+        libc = ctypes.CDLL(name or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_init1.restype = ctypes.c_int
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_add_watch.restype = ctypes.c_int
+    except (OSError, AttributeError) as e:
+        raise InotifyUnavailable(f"inotify not supported: {e}")
+    return libc
@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+
+MANIFEST_VERSION = 1
+
+
+@dataclass(frozen=True)
+class FileState:
+    inode: int
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def from_stat(cls, st: os.stat_result) -> "FileState":
+        return cls(inode=st.st_ino, size=st.st_size, mtime_ns=st.st_mtime_ns)
+
+
+class FileManifest:
+    """
+    On-disk record of files already seen by the scanner.
+
+    Keyed by absolute path; a file counts as unchanged while its
+    inode, size and mtime stay the same.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._files: Dict[str, FileState] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path) -> "FileManifest":
+        manifest = cls(path)
+
+        if not manifest.path.exists():
+            return manifest
+
+        with manifest.path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"unsupported manifest version: {data.get('version')}")
+
+        for file_path, (inode, size, mtime_ns) in data.get("files", {}).items():
+            manifest._files[file_path] = FileState(inode, size, mtime_ns)
+
+        return manifest
+
+    def save(self) -> None:
+        # Held while writing: jobs finishing on several threads save
+        # through the same temp file
+        with self._lock:
+            if not self._dirty:
+                return
+
+            data = {
+                "version": MANIFEST_VERSION,
+                "files": {
+                    p: [s.inode, s.size, s.mtime_ns] for p, s in self._files.items()
+                },
+            }
+            self._dirty = False
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+    def get(self, file_path: str) -> Optional[FileState]:
+        return self._files.get(file_path)
+
+    def update(self, file_path: str, state: FileState) -> None:
+        with self._lock:
+            if self._files.get(file_path) != state:
+                self._files[file_path] = state
+                self._dirty = True
+
+    def remove(self, file_path: str) -> None:
+        with self._lock:
+            if self._files.pop(file_path, None) is not None:
+                self._dirty = True
+
+    def paths(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._files))
+
+    def __len__(self) -> int:
+        return len(self._files)
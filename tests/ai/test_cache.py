@@ -0,0 +1,205 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ai.cache import ResponseCache, cache_key, independent_calls
+from ai.providers import OpenAIProvider
+from ai.registry import set_cache
+from models.book import BookRecord
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = ResponseCache(tmp_path / "cache.sqlite", ttl_seconds=60, max_entries=2)
+    yield c
+    c.close()
+
+
+def test_key_ignores_whitespace_but_not_content():
+    request = {"model": "m", "instructions": "system", "input": "File: a.fb2\n"}
+
+    assert cache_key("openai", request) == cache_key("openai", {**request, "input": "  File: a.fb2  "})
+    assert cache_key("openai", request) != cache_key("openai", {**request, "input": "File: b.fb2"})
+    assert cache_key("openai", request) != cache_key("openai", {**request, "model": "other"})
+    assert cache_key("openai", request) != cache_key("dummy", request)
+
+
+def test_entries_expire(cache):
+    cache.put("k", {"title": "T"})
+    assert cache.get("k") == {"title": "T"}
+
+    cache.ttl_seconds = 0.01
+    time.sleep(0.02)
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_is_evicted(cache):
+    cache.put("a", 1)
+    time.sleep(0.01)
+    cache.put("b", 2)
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_identical_calls_are_collapsed(cache):
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"title": "T"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_call("k", slow))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"title": "T"}] * 4
+    assert cache.get_or_call("k", lambda: pytest.fail("cached")) == {"title": "T"}
+
+
+def test_failures_are_shared_but_not_cached(cache):
+    def failing():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_call("k", failing)
+    assert cache.get_or_call("k", lambda: "ok") == "ok"
+
+
+def test_rejected_answers_are_not_cached(cache):
+    def usable(answer):
+        return "edition" in answer
+
+    assert cache.get_or_call("k", lambda: {"error": "no edition"}, usable) == {"error": "no edition"}
+    assert cache.get("k") is None
+    assert asyncio.run(cache.aget_or_call("k", _async({"error": "again"}), usable)) == {"error": "again"}
+    assert cache.get("k") is None
+
+    cache.get_or_call("k", lambda: {"edition": {}}, usable)
+    assert cache.get("k") == {"edition": {}}
+
+
+def _async(value):
+    async def fn():
+        return value
+    return fn
+
+
+def test_async_identical_calls_are_collapsed(cache):
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"title": "T"}
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_call("k", slow) for _ in range(4)))
+
+    assert asyncio.run(main()) == [{"title": "T"}] * 4
+    assert len(calls) == 1
+
+
+def test_independent_call_does_not_join_in_flight(cache):
+    release = threading.Event()
+    leader = threading.Thread(target=cache.get_or_call, args=("k", lambda: release.wait() and "slow"))
+    leader.start()
+    time.sleep(0.02)
+
+    with independent_calls():
+        assert cache.get_or_call("k", lambda: "fast") == "fast"
+
+    release.set()
+    leader.join()
+
+
+def test_cancelled_async_leader_is_taken_over(cache):
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"title": "T"}
+
+    async def main():
+        leader = asyncio.ensure_future(cache.aget_or_call("k", slow))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(cache.aget_or_call("k", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == {"title": "T"}
+    assert len(calls) == 2
+
+
+def test_provider_serves_repeated_prompts_from_cache(cache, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    calls = []
+
+    def create(**request):
+        calls.append(request)
+        return SimpleNamespace(output_text=json.dumps({"edition": {"title": "Cached"}}), usage=None)
+
+    provider = OpenAIProvider()
+    provider._client = SimpleNamespace(responses=SimpleNamespace(create=create))
+    set_cache(cache)
+    try:
+        record = BookRecord(path="book.fb2", original_filename="book.fb2", extension="fb2", directories=[])
+        first = provider.enrich(record)
+        second = provider.enrich(record)
+    finally:
+        set_cache(None, reload=True)
+
+    assert len(calls) == 1
+    assert first.title == second.title == "Cached"
+
+
+def test_provider_does_not_cache_invalid_answers(cache, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    answers = iter([
+        {"edition": {"series_index": "one"}},
+        {"confidence": 0.9},
+        {"edition": {"title": "Valid"}},
+    ])
+    calls = []
+
+    def create(**request):
+        calls.append(request)
+        return SimpleNamespace(output_text=json.dumps(next(answers)), usage=None)
+
+    provider = OpenAIProvider()
+    provider._client = SimpleNamespace(responses=SimpleNamespace(create=create))
+    set_cache(cache)
+    try:
+        record = BookRecord(path="book.fb2", original_filename="book.fb2", extension="fb2", directories=[])
+        results = [provider.enrich(record) for _ in range(4)]
+    finally:
+        set_cache(None, reload=True)
+
+    # Malformed, then without an edition: asked again each time
+    assert len(calls) == 3
+    assert results[0].errors
+    assert [r.title for r in results[2:]] == ["Valid", "Valid"]
@@ -0,0 +1,83 @@
+import pytest
+
+from ai.cascade import CascadeTier, get_cascade_stats, parse_cascade
+from ai.providers import OpenAIProvider
+from models.book import BookRecord
+
+
+def _record() -> BookRecord:
+    return BookRecord(path="book.fb2", original_filename="book.fb2", extension="fb2", directories=[])
+
+
+def _answer(title, confidence, **edition):
+    return {"edition": {"title": title, **edition}, "confidence": confidence}
+
+
+@pytest.fixture
+def cascade(monkeypatch):
+    monkeypatch.setenv("OPENAI_CASCADE", "mini:low,:high")
+    monkeypatch.setenv("OPENAI_MODEL", "big")
+    monkeypatch.setenv("OPENAI_CASCADE_MIN_CONFIDENCE", "0.8")
+
+
+def _provider(monkeypatch, answers):
+    provider = OpenAIProvider()
+    sent = []
+
+    def fake_send(request):
+        tier = f"{request['model']}:{request['reasoning']['effort']}"
+        sent.append(tier)
+        return answers[tier]
+
+    monkeypatch.setattr(provider, "_send", fake_send)
+    return provider, sent
+
+
+def test_parse_cascade():
+    assert parse_cascade("mini:low, :high", "big") == [CascadeTier("mini", "low"), CascadeTier("big", "high")]
+    assert parse_cascade("", "big") == []
+    with pytest.raises(ValueError):
+        parse_cascade("mini", "big")
+
+
+def test_confident_cheap_answer_is_kept(cascade, monkeypatch):
+    provider, sent = _provider(monkeypatch, {"mini:low": _answer("Cheap", 0.95)})
+    before = get_cascade_stats().snapshot().get("mini:low")
+
+    result = provider.enrich(_record())
+
+    assert sent == ["mini:low"]
+    assert result.title == "Cheap"
+    after = get_cascade_stats().snapshot()["mini:low"]
+    assert after.calls == (before.calls if before else 0) + 1
+    assert after.accepted == (before.accepted if before else 0) + 1
+
+
+def test_low_confidence_escalates(cascade, monkeypatch):
+    provider, sent = _provider(monkeypatch, {
+        "mini:low": _answer("Unsure", 0.4),
+        "big:high": _answer("Sure", 0.9),
+    })
+
+    assert provider.enrich(_record()).title == "Sure"
+    assert sent == ["mini:low", "big:high"]
+
+
+def test_invalid_answer_escalates(cascade, monkeypatch):
+    provider, sent = _provider(monkeypatch, {
+        "mini:low": _answer("Broken", 0.99, series_index="first"),
+        "big:high": _answer("Fixed", 0.5),
+    })
+
+    # The last tier is kept whatever its confidence
+    assert provider.enrich(_record()).title == "Fixed"
+    assert sent == ["mini:low", "big:high"]
+
+
+def test_without_cascade_one_high_effort_call(monkeypatch):
+    monkeypatch.delenv("OPENAI_CASCADE", raising=False)
+    monkeypatch.setenv("OPENAI_MODEL", "big")
+    provider, sent = _provider(monkeypatch, {"big:high": _answer("Only", 0.1)})
+
+    assert provider.enrich(_record()).title == "Only"
+    assert sent == ["big:high"]
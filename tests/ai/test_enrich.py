@@ -1,5 +1,7 @@
+import asyncio
+
 from models.book import BookRecord
-from ai.enrich import enrich
+from ai.enrich import aenrich, enrich
 
 
 def test_dummy_ai_provider_overwrites_metadata():
@@ -21,3 +23,20 @@ def test_dummy_ai_provider_overwrites_metadata():
     assert result.language == "en"
     assert result.source == "ai"
     assert result.confidence == 0.9
+
+
+def test_aenrich_uses_provider_default_async_path():
+    record = BookRecord(
+        path="book.epub",
+        original_filename="book.epub",
+        extension="epub",
+        directories=[],
+        title="Old",
+        source="file",
+    )
+
+    result = asyncio.run(aenrich(record, provider_name="dummy"))
+
+    assert record.title == "Old"
+    assert result.title == "AI Title"
+    assert result.source == "ai"
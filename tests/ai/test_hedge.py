@@ -0,0 +1,218 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import ai.providers  # noqa: F401  registers built-in providers
+from ai.base import AIProvider
+from ai.cache import ResponseCache
+from ai.enrich import enrich
+from ai.hedge import Hedger
+from ai.providers import OpenAIProvider
+from ai.registry import register, set_cache, set_hedger
+from models.book import BookRecord
+
+
+def _answer(title, errors=()):
+    record = BookRecord(path="book.fb2", original_filename="book.fb2", extension="fb2", directories=[])
+    record.title = title
+    record.source = "ai"
+    record.errors = list(errors)
+    return record
+
+
+def _slow(title, seconds, errors=()):
+    def call():
+        time.sleep(seconds)
+        return _answer(title, errors)
+    return call
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = Hedger(default_delay=1.0, budget=1.0)
+    backup_calls = []
+
+    result = hedger.call(_slow("primary", 0), lambda: backup_calls.append(1))
+
+    assert result.title == "primary"
+    assert backup_calls == []
+    assert hedger.stats().hedges == 0
+
+
+def test_slow_primary_loses_to_backup():
+    hedger = Hedger(default_delay=0.05, budget=1.0)
+
+    started = time.monotonic()
+    result = hedger.call(_slow("primary", 1.0), _slow("backup", 0))
+
+    assert result.title == "backup"
+    assert time.monotonic() - started < 0.5
+    assert hedger.stats().hedges == 1 and hedger.stats().wins == 1
+
+
+def test_invalid_fast_answer_waits_for_valid_one():
+    hedger = Hedger(default_delay=0.05, budget=1.0)
+
+    result = hedger.call(_slow("primary", 0.2), _slow("backup", 0, errors=["openai: 500"]))
+
+    assert result.title == "primary"
+    assert hedger.stats().wins == 0
+
+
+def test_budget_caps_hedges():
+    hedger = Hedger(default_delay=0.01, budget=0.5)
+
+    for _ in range(4):
+        hedger.call(_slow("primary", 0.05), _slow("backup", 0))
+
+    assert hedger.stats().calls == 4
+    assert hedger.stats().hedges == 2
+
+
+def test_delay_follows_latency_percentile():
+    hedger = Hedger(percentile=0.9, min_samples=10, default_delay=5.0)
+    assert hedger.delay() == 5.0
+
+    for n in range(1, 11):
+        hedger._observe(n / 10)
+
+    assert hedger.delay() == 1.0
+
+
+def test_async_backup_wins_and_primary_is_cancelled():
+    hedger = Hedger(default_delay=0.05, budget=1.0)
+    cancelled = []
+
+    async def primary():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return _answer("primary")
+
+    async def backup():
+        return _answer("backup")
+
+    async def main():
+        result = await hedger.acall(primary, backup)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()).title == "backup"
+    assert cancelled == [True]
+
+
+class SlowProvider(AIProvider):
+    name = "slow-hedge"
+
+    def enrich(self, record):
+        time.sleep(1.0)
+        record.title = "slow"
+        record.source = "ai"
+        return record
+
+
+class FastProvider(AIProvider):
+    name = "fast-hedge"
+
+    def enrich(self, record):
+        record.title = "fast"
+        record.source = "ai"
+        return record
+
+
+@pytest.fixture
+def hedged():
+    register(SlowProvider())
+    register(FastProvider())
+    set_hedger(Hedger(default_delay=0.05, budget=1.0, backup_provider="fast-hedge"))
+    yield
+    set_hedger(None, reload=True)
+
+
+def test_enrich_hedges_to_alternate_provider(hedged):
+    record = BookRecord(path="book.fb2", original_filename="book.fb2", extension="fb2", directories=[])
+
+    result = enrich(record, "slow-hedge")
+
+    assert result.title == "fast"
+    assert record.title is None
+
+
+def test_errors_already_on_the_input_do_not_invalidate_answers():
+    hedger = Hedger(default_delay=0.05, budget=1.0)
+    warning = ["epub: read warning"]
+
+    started = time.monotonic()
+    result = hedger.call(_slow("primary", 1.0, warning), _slow("backup", 0, warning), known_errors=1)
+
+    assert result.title == "backup"
+    assert time.monotonic() - started < 0.5
+
+
+def test_async_primary_latency_is_recorded_when_backup_wins():
+    hedger = Hedger(default_delay=0.05, budget=1.0)
+
+    async def primary():
+        await asyncio.sleep(5)
+        return _answer("primary")
+
+    async def backup():
+        await asyncio.sleep(0.05)
+        return _answer("backup")
+
+    async def main():
+        result = await hedger.acall(primary, backup)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()).title == "backup"
+    assert len(hedger._latencies) == 1
+    assert hedger._latencies[0] >= 0.1
+
+
+class _Responses:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **request):
+        self.calls += 1
+        if self.calls == 1:
+            time.sleep(1.0)
+        answer = {"edition": {"title": f"call {self.calls}", "authors": ["A"]}, "original": None, "confidence": 0.9}
+        return type("Response", (), {"output_text": json.dumps(answer), "usage": None})()
+
+
+class CachedProvider(OpenAIProvider):
+    name = "openai-hedge-cached"
+
+    def __init__(self):
+        super().__init__()
+        self.responses = _Responses()
+        self._client = type("Client", (), {"responses": self.responses})()
+
+
+@pytest.fixture
+def cached(tmp_path, monkeypatch):
+    for name in ("AI_PACK_SIZE", "OPENAI_CASCADE"):
+        monkeypatch.delenv(name, raising=False)
+    provider = CachedProvider()
+    register(provider)
+    set_cache(ResponseCache(tmp_path / "cache.sqlite"))
+    set_hedger(Hedger(default_delay=0.05, budget=1.0))
+    yield provider
+    set_hedger(None, reload=True)
+    set_cache(None, reload=True)
+
+
+def test_backup_does_not_wait_on_cached_in_flight_primary(cached):
+    record = BookRecord(path="book.fb2", original_filename="book.fb2", extension="fb2", directories=[])
+
+    started = time.monotonic()
+    result = enrich(record, cached.name)
+
+    assert time.monotonic() - started < 0.5
+    assert result.title == "call 2"
+    assert cached.responses.calls == 2
@@ -1,3 +1,5 @@
+import time
+
 from ai.providers import OpenAIProvider
 from models.book import BookRecord
 
@@ -51,3 +53,131 @@ def test_openai_provider_v2_applies_edition_and_original(monkeypatch):
     # Provenance
     assert result.source == "ai"
     assert result.confidence == 0.93
+
+
+def test_openai_provider_group_request_fans_out(monkeypatch):
+    provider = OpenAIProvider()
+    requests = []
+
+    def fake_send(request, valid=None):
+        requests.append(request)
+        return {
+            "shared": {
+                "authors": ["Дэн Абнетт"],
+                "series": "Ересь Хоруса",
+                "series_total": 0,
+                "language": "ru",
+                "publisher": "",
+                "universe": "Warhammer 40k",
+            },
+            "volumes": [
+                {"file": 1, "edition": {"title": "Лжебоги", "series_index": 2, "tags": []}, "confidence": 0.8},
+                {"file": 0, "edition": {"title": "Восхождение Хоруса", "series_index": 1, "tags": []}, "confidence": 0.9},
+            ],
+        }
+
+    monkeypatch.setattr(provider, "_send", fake_send)
+    monkeypatch.setattr(provider, "_enrich_one", lambda record: record)
+
+    records = [
+        BookRecord(path=f"{n}.fb2", original_filename=f"0{n} Ересь Хоруса.fb2", extension="fb2", directories=["warhammer"])
+        for n in (1, 2, 3)
+    ]
+    first, second, third = provider.enrich_group(records)
+
+    assert len(requests) == 1
+    assert requests[0]["input"].count("warhammer") == 1
+    assert first.title == "Восхождение Хоруса" and first.series_index == 1
+    assert second.title == "Лжебоги" and second.authors == ["Дэн Абнетт"]
+    assert second.series == "Ересь Хоруса"
+    assert second.tags == ["Warhammer 40k"]
+    # Not in the answer: enriched on its own
+    assert third.title is None
+
+
+def test_openai_provider_packs_books_and_retries_malformed_entries(monkeypatch):
+    provider = OpenAIProvider()
+    requests = []
+
+    def fake_send(request, valid=None):
+        requests.append(request)
+        return {
+            "books": [
+                {"id": "b1", "edition": {"title": "Second", "language": "en"}, "confidence": 0.7},
+                {"id": "b0", "edition": {"title": "First", "series_index": "one"}, "confidence": 0.9},
+            ]
+        }
+
+    single = []
+
+    def fake_single(record):
+        single.append(record.original_filename)
+        record.title = "Single"
+        return record
+
+    monkeypatch.setattr(provider, "_send", fake_send)
+    monkeypatch.setattr(provider, "_enrich_one", fake_single)
+
+    records = [
+        BookRecord(path=f"{n}.fb2", original_filename=f"{n}.fb2", extension="fb2", directories=[])
+        for n in ("a", "b", "c")
+    ]
+    first, second, third = provider.enrich_many(records)
+
+    assert len(requests) == 1
+    assert "[b0]" in requests[0]["input"] and "[b2]" in requests[0]["input"]
+    assert second.title == "Second" and second.source == "ai"
+    # b0 has an invalid field, b2 is missing: each gets its own call
+    assert single == ["a.fb2", "c.fb2"]
+    assert first.title == third.title == "Single"
+
+
+def test_openai_provider_packs_concurrent_calls(monkeypatch):
+    import threading
+
+    monkeypatch.setenv("AI_PACK_SIZE", "3")
+    monkeypatch.setenv("AI_PACK_WAIT_MS", "2000")
+    monkeypatch.setenv("WATCH_CONCURRENCY", "3")
+    provider = OpenAIProvider()
+    batches = []
+
+    def fake_many(records):
+        batches.append([r.path for r in records])
+        return records
+
+    provider._get_packer()._send = fake_many
+
+    records = [
+        BookRecord(path=f"{n}.fb2", original_filename=f"{n}.fb2", extension="fb2", directories=[])
+        for n in range(3)
+    ]
+    results = {}
+    threads = [threading.Thread(target=lambda r=r: results.update({r.path: provider.enrich(r)})) for r in records]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(batches) == 1 and sorted(batches[0]) == ["0.fb2", "1.fb2", "2.fb2"]
+    assert sorted(results) == ["0.fb2", "1.fb2", "2.fb2"]
+
+
+def test_openai_provider_single_job_does_not_wait_to_pack(monkeypatch):
+    monkeypatch.setenv("AI_PACK_SIZE", "3")
+    monkeypatch.setenv("AI_PACK_WAIT_MS", "60000")
+    monkeypatch.setenv("WATCH_CONCURRENCY", "1")
+    provider = OpenAIProvider()
+    batches = []
+
+    def fake_many(records):
+        batches.append([r.path for r in records])
+        return records
+
+    provider._get_packer()._send = fake_many
+
+    started = time.monotonic()
+    record = BookRecord(path="0.fb2", original_filename="0.fb2", extension="fb2", directories=[])
+    assert provider.enrich(record) is record
+
+    assert batches == [["0.fb2"]]
+    assert time.monotonic() - started < 5
@@ -0,0 +1,100 @@
+from datetime import date
+
+import pytest
+
+import ai.providers  # noqa: F401  registers built-in providers
+from ai.base import AIProvider
+from ai.policy import AIPolicy, isbn_valid
+from ai.registry import register, set_policy
+from models.book import BookRecord
+from pipeline.stages import enrich_stage, start_job
+
+
+def _record(**fields) -> BookRecord:
+    return BookRecord(path="book.fb2", original_filename="book.fb2", extension="fb2", directories=[], **fields)
+
+
+WELL_TAGGED = dict(
+    title="Dune",
+    authors=["Frank Herbert"],
+    language="en",
+    series="Dune",
+    isbn13="978-0-441-17271-9",
+    publisher="Ace",
+    published=date(1990, 9, 1),
+    description="Desert planet.",
+)
+
+
+class TierProvider(AIProvider):
+    name = "tier-policy"
+
+    def __init__(self, tier="full"):
+        self.tier = tier
+        self.calls = []
+
+    def for_tier(self, tier):
+        self.calls.append(tier)
+        return self
+
+    def enrich(self, record: BookRecord) -> BookRecord:
+        record.source = "ai"
+        return record
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    p = TierProvider()
+    register(p)
+    monkeypatch.setenv("AI_PROVIDER", p.name)
+    monkeypatch.delenv("DEBUG", raising=False)
+    yield p
+    set_policy(None, reload=True)
+
+
+def test_isbn_check_digits():
+    assert isbn_valid("978-0-441-17271-9")
+    assert isbn_valid("0-441-17271-7")
+    assert isbn_valid("080442957X")
+    assert not isbn_valid("978-0-441-17271-8")
+    assert not isbn_valid("12345")
+
+
+def test_tiers():
+    policy = AIPolicy(skip_score=0.8, cheap_score=0.5)
+
+    assert policy.evaluate(_record(**WELL_TAGGED))[0] == "skip"
+    assert policy.evaluate(_record(**{**WELL_TAGGED, "isbn13": "978-0-441-17271-8"})) == (
+        "cheap", "invalid ISBN, score 0.78",
+    )
+    assert policy.evaluate(_record(**{**WELL_TAGGED, "language": None}))[0] == "cheap"
+    assert policy.evaluate(_record(title="Dune"))[0] == "full"
+
+
+def test_enrich_stage_follows_policy_and_counts(provider):
+    policy = AIPolicy()
+    set_policy(policy)
+
+    tagged = start_job(_record(**WELL_TAGGED))
+    enrich_stage(tagged)
+    bare = start_job(_record(title="Dune"))
+    enrich_stage(bare)
+
+    assert tagged.ai_record is None
+    assert bare.ai_record is not None
+    assert provider.calls == ["full"]
+
+    stats = policy.stats()
+    assert stats.decisions == {"skip": 1, "cheap": 0, "full": 1}
+    assert stats.skip_rate == 0.5
+    assert stats.full_calls == 1
+
+
+def test_without_policy_every_book_is_enriched(provider):
+    set_policy(None)
+
+    job = start_job(_record(**WELL_TAGGED))
+    enrich_stage(job)
+
+    assert job.ai_record is not None
+    assert provider.calls == ["full"]
@@ -0,0 +1,214 @@
+import asyncio
+import itertools
+import threading
+import time
+
+import pytest
+
+from ai.rate_limit import AdaptiveRateLimiter, RetryableError
+
+
+def test_call_retries_retryable_errors():
+    limiter = AdaptiveRateLimiter(max_retries=3, backoff_base=0.001)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RetryableError("server error", status=500)
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    assert len(attempts) == 3
+    assert limiter.stats().retries == 2
+    assert limiter.stats().in_flight == 0
+
+
+def test_call_gives_up_after_max_retries():
+    limiter = AdaptiveRateLimiter(max_retries=1, backoff_base=0.001)
+
+    def failing():
+        raise RetryableError("server error", status=500)
+
+    with pytest.raises(RetryableError):
+        limiter.call(failing)
+    assert limiter.stats().in_flight == 0
+
+
+def test_non_retryable_errors_propagate_immediately():
+    limiter = AdaptiveRateLimiter(backoff_base=0.001)
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        limiter.call(broken)
+    assert len(attempts) == 1
+
+
+def test_throttling_halves_window_and_successes_grow_it():
+    limiter = AdaptiveRateLimiter(max_concurrency=8, max_retries=1, backoff_base=0.001)
+
+    for _ in range(20):
+        limiter.call(lambda: None)
+    grown = limiter.stats().limit
+    assert grown > 1
+
+    attempts = []
+
+    def throttled_once():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RetryableError("rate limited", status=429, throttled=True)
+        return None
+
+    limiter.call(throttled_once)
+    assert limiter.stats().throttled == 1
+    assert limiter.stats().limit < grown
+
+
+def test_retry_after_pauses_all_callers():
+    limiter = AdaptiveRateLimiter(max_retries=1, backoff_base=0.001)
+    attempts = []
+
+    def throttled_once():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RetryableError("rate limited", status=429, retry_after=0.2, throttled=True)
+        return None
+
+    limiter.call(throttled_once)
+    assert attempts[1] - attempts[0] >= 0.2
+
+
+def test_window_bounds_in_flight_calls():
+    limiter = AdaptiveRateLimiter(max_concurrency=2, min_concurrency=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.pop()
+
+    threads = [threading.Thread(target=limiter.call, args=(work,)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max(peak) <= 2
+
+
+def test_requests_per_minute_budget():
+    # 600 rpm = 10 per second, bucket starts full with 600
+    limiter = AdaptiveRateLimiter(rpm=600)
+    limiter._requests.level = 1
+
+    started = time.monotonic()
+    limiter.call(lambda: None)
+    limiter.call(lambda: None)
+    assert time.monotonic() - started >= 0.09
+
+
+def test_tokens_are_corrected_from_usage():
+    limiter = AdaptiveRateLimiter(tpm=6000)
+
+    limiter.call(lambda: 100, tokens=1000, usage=lambda used: used)
+    # Estimated 1000, used 100: 900 refunded
+    assert limiter._tokens.level == pytest.approx(5900, abs=5)
+
+
+def test_acall_retries():
+    limiter = AdaptiveRateLimiter(max_retries=2, backoff_base=0.001)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise RetryableError("timeout")
+        return "ok"
+
+    assert asyncio.run(limiter.acall(flaky)) == "ok"
+    assert len(attempts) == 2
+
+
+@pytest.fixture
+def steady_clock(monkeypatch):
+    # Every call takes one tick: no latency blow-up shrinks the window
+    ticks = itertools.count(step=0.01)
+    monkeypatch.setattr("ai.rate_limit.time.monotonic", lambda: next(ticks))
+
+
+def test_window_starts_at_initial_limit_and_ramps_up_fast(steady_clock):
+    limiter = AdaptiveRateLimiter(max_concurrency=32, initial_concurrency=4)
+    assert limiter.stats().limit == 4
+
+    for _ in range(28):
+        limiter.call(lambda: None)
+    assert limiter.stats().limit == 32
+
+
+def test_growth_turns_additive_after_throttling(steady_clock):
+    limiter = AdaptiveRateLimiter(max_concurrency=32, initial_concurrency=16, max_retries=1, backoff_base=0.001)
+    attempts = []
+
+    def throttled_once():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RetryableError("rate limited", status=429, throttled=True)
+        return None
+
+    limiter.call(throttled_once)
+    # Halved to 8, then one additive step
+    assert limiter.stats().limit == pytest.approx(8 + 1 / 8)
+
+    for _ in range(8):
+        limiter.call(lambda: None)
+    assert limiter.stats().limit < 10
+
+
+def test_waiter_wakes_on_release():
+    limiter = AdaptiveRateLimiter(max_concurrency=1, min_concurrency=1, initial_concurrency=1)
+    release = threading.Event()
+    finished = []
+
+    holder = threading.Thread(target=limiter.call, args=(release.wait,))
+    holder.start()
+    while limiter.stats().in_flight == 0:
+        time.sleep(0.001)
+
+    waiter = threading.Thread(target=lambda: finished.append(limiter.call(time.monotonic)))
+    waiter.start()
+    time.sleep(0.05)
+    released_at = time.monotonic()
+    release.set()
+    holder.join()
+    waiter.join()
+
+    # Woken by the release itself, not by a polling interval
+    assert finished[0] - released_at < 0.02
+    assert limiter.stats().in_flight == 0
+
+
+def test_async_waiter_wakes_on_release():
+    limiter = AdaptiveRateLimiter(max_concurrency=1, min_concurrency=1, initial_concurrency=1)
+    order = []
+
+    async def work(name):
+        order.append(f"start {name}")
+        await asyncio.sleep(0.01)
+        order.append(f"end {name}")
+
+    async def main():
+        await asyncio.gather(limiter.acall(lambda: work("a")), limiter.acall(lambda: work("b")))
+
+    asyncio.run(main())
+    assert order == ["start a", "end a", "start b", "end b"]
+    assert limiter.stats().in_flight == 0
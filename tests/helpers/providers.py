@@ -0,0 +1,18 @@
+from ai.base import AIProvider
+from models.book import BookRecord
+
+
+class CountingProvider(AIProvider):
+    """Offline provider counting its calls; `title` may number them ("Title {n}")."""
+    name = "counting"
+
+    def __init__(self, title: str = "Counted"):
+        self.title = title
+        self.calls = 0
+
+    def enrich(self, record: BookRecord) -> BookRecord:
+        self.calls += 1
+        record.title = self.title.format(n=self.calls)
+        record.authors = ["Some Author"]
+        record.source = "ai"
+        return record
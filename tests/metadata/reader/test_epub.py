@@ -24,3 +24,83 @@ def test_epub_reader_basic(monkeypatch):
     assert record.title == "EPUB Book"
     assert record.authors == ["Alice", "Bob"]
     assert record.language == "en"
+
+
+_OPF = """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="id">urn:uuid:1</dc:identifier>
+<dc:identifier>978-5-17-000000-2</dc:identifier>
+<dc:title id="t1">Main</dc:title>
+<dc:title id="t2">Sub</dc:title>
+<meta refines="#t2" property="title-type">subtitle</meta>
+<dc:creator>Alice</dc:creator>
+<dc:language>ru</dc:language>
+<dc:date>2006-04</dc:date>
+<!-- calibre -->
+<meta name="calibre:series" content="Saga"/>
+<meta name="calibre:series_index" content="2.0"/>
+</metadata>
+<manifest><item id="c" href="c.xhtml" media-type="application/xhtml+xml"/></manifest>
+<spine><itemref idref="c"/></spine>
+</package>"""
+
+_CONTAINER = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>"""
+
+
+def _write_epub(path):
+    import zipfile
+
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("mimetype", "application/epub+zip")
+        z.writestr("META-INF/container.xml", _CONTAINER)
+        z.writestr("OEBPS/content.opf", _OPF)
+        z.writestr("OEBPS/c.xhtml", "<html xmlns='http://www.w3.org/1999/xhtml'><body/></html>")
+
+
+def _epub_record(path):
+    return BookRecord(path=str(path), original_filename=path.name, extension="epub", directories=[])
+
+
+def test_header_reader_matches_ebooklib(tmp_path):
+    from ebooklib import epub
+    from metadata.reader.epub import read_opf_metadata
+
+    path = tmp_path / "book.epub"
+    _write_epub(path)
+
+    assert read_opf_metadata(str(path)).metadata == epub.read_epub(str(path)).metadata
+
+    with patch("metadata.reader.epub.epub.read_epub") as read_epub:
+        record = read_metadata(_epub_record(path))
+    read_epub.assert_not_called()
+
+    assert record.title == "Main"
+    assert record.subtitle == "Sub"
+    assert record.authors == ["Alice"]
+    assert record.isbn13 == "978-5-17-000000-2"
+    assert record.series == "Saga"
+    assert record.series_index == 2
+    assert record.year == 2006
+
+
+def test_malformed_archive_falls_back_to_ebooklib(tmp_path):
+    import zipfile
+
+    path = tmp_path / "broken.epub"
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("mimetype", "application/epub+zip")
+
+    fake_book = MagicMock()
+    fake_book.get_metadata.side_effect = lambda namespace, tag: (
+        [("Fallback", {})] if (namespace, tag) == ("DC", "title") else []
+    )
+
+    with patch("metadata.reader.epub.epub.read_epub", return_value=fake_book) as read_epub:
+        record = read_metadata(_epub_record(path))
+
+    read_epub.assert_called_once()
+    assert record.title == "Fallback"
@@ -216,3 +216,37 @@ def test_fb2_does_not_override_existing_fields(tmp_path):
     record = read_metadata(record)
 
     assert record.title == "Predefined Title"
+
+
+def test_fb2_header_parse_stops_at_description(tmp_path):
+    fb2 = tmp_path / "book.fb2"
+    # Everything after </description> is broken: it must never be parsed
+    fb2.write_text(
+        """<?xml version="1.0" encoding="utf-8"?>
+        <FictionBook xmlns="http://www.gribuser.ru/xml/fictionbook/2.0">
+          <description>
+            <title-info>
+              <book-title>Header Only</book-title>
+              <lang>en</lang>
+            </title-info>
+          </description>
+          <body><section><subtitle>Chapter subtitle</subtitle></section></body>
+          <binary id="cover.jpg">"""
+        + "A" * 200_000
+        + "<unclosed>",
+        encoding="utf-8"
+    )
+
+    record = BookRecord(
+        path=str(fb2),
+        original_filename="book.fb2",
+        extension="fb2",
+        directories=[]
+    )
+
+    record = read_metadata(record)
+
+    assert record.errors == []
+    assert record.title == "Header Only"
+    assert record.language == "en"
+    assert record.subtitle is None
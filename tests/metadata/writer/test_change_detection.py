@@ -0,0 +1,149 @@
+from datetime import date
+
+import metadata.writer  # noqa: F401  registers built-in writers
+from metadata import read_metadata
+from metadata.merge.book_record_merger import merge_book_records
+from metadata.writer.registry import write_metadata
+from models.book import BookRecord, OriginalWork
+
+from tests.metadata.writer.test_epub_writer import _OPF, _write_epub
+
+
+def _record(path, **fields):
+    return BookRecord(
+        path=str(path),
+        original_filename=path.name,
+        extension=path.suffix.lstrip("."),
+        directories=[],
+        **fields,
+    )
+
+
+_FIELDS = dict(
+    title="Восхождение Хоруса",
+    authors=["Дэн Абнетт"],
+    description="Первая книга цикла.",
+    series="Ересь Хоруса",
+    series_index=1,
+    language="ru",
+    publisher="Фантастика",
+    isbn13="978-5-17-000000-2",
+    published=date(2006, 4, 1),
+    tags=["фантастика", "война"],
+    original=OriginalWork(title="Horus Rising", authors=["Dan Abnett"], language="en"),
+)
+
+
+def _roundtrip(path):
+    first = write_metadata(_record(path, **_FIELDS))
+    assert first.success, first.errors
+    assert first.changed_fields is None
+
+    current = read_metadata(_record(path))
+    before = path.read_bytes()
+
+    result = write_metadata(_record(path, **_FIELDS), current)
+
+    assert result.success
+    assert result.skipped
+    assert result.changed_fields == []
+    assert path.read_bytes() == before
+
+    changed = write_metadata(_record(path, **{**_FIELDS, "title": "Лжебоги"}), current)
+
+    assert changed.success and not changed.skipped
+    assert changed.changed_fields == ["title"]
+    assert read_metadata(_record(path)).title == "Лжебоги"
+
+
+def test_epub_unchanged_metadata_is_not_rewritten(tmp_path):
+    path = tmp_path / "book.epub"
+    _write_epub(path)
+    _roundtrip(path)
+
+
+def test_epub2_subtitle_is_not_rewritten(tmp_path):
+    path = tmp_path / "book.epub"
+    _write_epub(path, _OPF.replace('version="3.0"', 'version="2.0"'))
+    fields = {**_FIELDS, "subtitle": "Начало Ереси"}
+
+    assert write_metadata(_record(path, **fields)).success
+    current = read_metadata(_record(path))
+    assert current.title == "Восхождение Хоруса: Начало Ереси"
+
+    result = write_metadata(_record(path, **fields), current)
+
+    assert result.skipped, result.changed_fields
+
+
+def test_fb2_unchanged_metadata_is_not_rewritten(tmp_path):
+    path = tmp_path / "book.fb2"
+    path.write_text(
+        """<?xml version="1.0" encoding="utf-8"?>
+<FictionBook xmlns="http://www.gribuser.ru/xml/fictionbook/2.0">
+<description>
+  <title-info><book-title>Old</book-title></title-info>
+  <document-info><author><nickname>scanner</nickname><first-name>Some</first-name></author></document-info>
+</description>
+<body><p>text</p></body>
+</FictionBook>
+""",
+        encoding="utf-8",
+    )
+    _roundtrip(path)
+
+
+def test_fb2_written_by_us_is_skipped_after_merge(tmp_path):
+    path = tmp_path / "book.fb2"
+    path.write_text(
+        """<?xml version="1.0" encoding="utf-8"?>
+<FictionBook xmlns="http://www.gribuser.ru/xml/fictionbook/2.0">
+<description><title-info><book-title>Old</book-title></title-info></description>
+<body><p>text</p></body>
+</FictionBook>
+""",
+        encoding="utf-8",
+    )
+    assert write_metadata(_record(path, **_FIELDS)).success
+    before = path.read_bytes()
+
+    # Re-dropped: the description now comes from the file, ending with the
+    # generated original-work and tag paragraphs
+    current = read_metadata(_record(path))
+    ai = _record(path, **{**_FIELDS, "description": None}, source="ai")
+    merged = merge_book_records([ai, read_metadata(_record(path))])
+    assert merged.description.endswith("Теги: фантастика, война")
+
+    result = write_metadata(merged, current)
+
+    assert result.success
+    assert result.skipped, result.changed_fields
+    assert path.read_bytes() == before
+
+    # Even when written, the annotation does not grow
+    assert write_metadata(merged).success
+    assert read_metadata(_record(path)).description == current.description
+
+
+def test_fb2_keeps_description_text_that_looks_generated(tmp_path):
+    path = tmp_path / "book.fb2"
+    path.write_text(
+        """<?xml version="1.0" encoding="utf-8"?>
+<FictionBook xmlns="http://www.gribuser.ru/xml/fictionbook/2.0">
+<description><title-info><book-title>Old</book-title></title-info></description>
+<body><p>text</p></body>
+</FictionBook>
+""",
+        encoding="utf-8",
+    )
+    description = "Сборник рассказов. Автор: известный писатель, Теги: нет."
+    assert write_metadata(_record(path, **{**_FIELDS, "description": description})).success
+
+    current = read_metadata(_record(path))
+    assert current.description.startswith(description + "Оригинальное название: Horus Rising")
+    assert write_metadata(_record(path, **{**_FIELDS, "description": description}), current).skipped
+
+    # Only the description changes: the old one is not hidden behind "Автор:"
+    changed = write_metadata(_record(path, **{**_FIELDS, "description": "Автор: Иванов"}), current)
+    assert changed.changed_fields == ["description"]
+    assert read_metadata(_record(path)).description.startswith("Автор: ИвановОригинальное название")
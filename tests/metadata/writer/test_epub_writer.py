@@ -0,0 +1,92 @@
+import os
+import zipfile
+
+from ebooklib import epub
+
+from metadata.writer.epub import EPUBMetadataWriter
+from models.book import BookRecord
+
+
+_OPF = """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="id">urn:uuid:1</dc:identifier>
+<dc:title>Old Title</dc:title>
+<dc:language>en</dc:language>
+</metadata>
+<manifest><item id="c" href="c.xhtml" media-type="application/xhtml+xml"/></manifest>
+<spine><itemref idref="c"/></spine>
+</package>"""
+
+_CONTAINER = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>"""
+
+
+def _write_epub(path, opf=_OPF):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        z.writestr("META-INF/container.xml", _CONTAINER)
+        z.writestr("OEBPS/content.opf", opf)
+        z.writestr("OEBPS/c.xhtml", "<html xmlns='http://www.w3.org/1999/xhtml'><body/></html>")
+        z.writestr("OEBPS/cover.jpg", os.urandom(300_000), compress_type=zipfile.ZIP_STORED)
+        z.writestr("OEBPS/big.xhtml", "<p>text</p>" * 50_000)
+
+
+def test_epub_writer_streams_untouched_entries(tmp_path):
+    path = tmp_path / "book.epub"
+    _write_epub(path)
+    with zipfile.ZipFile(path) as z:
+        before = {i.filename: (i.CRC, i.compress_size, i.compress_type) for i in z.infolist()}
+
+    record = BookRecord(
+        path=str(path),
+        original_filename="book.epub",
+        extension="epub",
+        directories=[],
+        title="New Title",
+        authors=["Alice"],
+    )
+
+    result = EPUBMetadataWriter().write(record)
+
+    assert result.success, result.errors
+    assert not (tmp_path / "book.epub.tmp").exists()
+
+    with zipfile.ZipFile(path) as z:
+        assert z.testzip() is None
+        infos = z.infolist()
+        assert infos[0].filename == "mimetype"
+        assert infos[0].compress_type == zipfile.ZIP_STORED
+        assert [i.filename for i in infos] == list(before)
+
+        for info in infos:
+            if info.filename in ("mimetype", "OEBPS/content.opf"):
+                continue
+            assert (info.CRC, info.compress_size, info.compress_type) == before[info.filename]
+
+    book = epub.read_epub(str(path))
+    assert book.get_metadata("DC", "title")[0][0] == "New Title"
+    assert book.get_metadata("DC", "creator")[0][0] == "Alice"
+
+
+def test_epub_writer_failure_keeps_original(tmp_path):
+    path = tmp_path / "book.epub"
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("mimetype", "application/epub+zip")
+        z.writestr("OEBPS/content.opf", "<package/>")
+    original = path.read_bytes()
+
+    record = BookRecord(
+        path=str(path),
+        original_filename="book.epub",
+        extension="epub",
+        directories=[],
+        title="New Title",
+    )
+
+    result = EPUBMetadataWriter().write(record)
+
+    assert not result.success
+    assert path.read_bytes() == original
@@ -0,0 +1,75 @@
+from metadata import read_metadata
+from metadata.writer.fb2 import FB2MetadataWriter
+from models.book import BookRecord
+
+
+_HEAD = """<?xml version="1.0" encoding="{encoding}"?>
+<FictionBook xmlns="http://www.gribuser.ru/xml/fictionbook/2.0" xmlns:l="http://www.w3.org/1999/xlink">
+<description>
+  <title-info>
+    <book-title>Старое название</book-title>
+    <lang>ru</lang>
+  </title-info>
+</description>
+"""
+
+_TAIL = """<body><section><p>Текст   с  пробелами</p></section></body>
+<binary id="cover.jpg" content-type="image/jpeg">{blob}</binary>
+</FictionBook>
+"""
+
+
+def _record(path, **fields):
+    return BookRecord(
+        path=str(path),
+        original_filename=path.name,
+        extension="fb2",
+        directories=[],
+        **fields,
+    )
+
+
+def test_fb2_writer_splices_header_and_keeps_tail(tmp_path):
+    fb2 = tmp_path / "book.fb2"
+    tail = _TAIL.format(blob="QUJD" * 100_000).encode("utf-8")
+    fb2.write_bytes(_HEAD.format(encoding="utf-8").encode("utf-8") + tail)
+
+    result = FB2MetadataWriter().write(
+        _record(fb2, title="Новое название", authors=["Иван Петров"], series="Цикл", series_index=2)
+    )
+
+    assert result.success, result.errors
+    data = fb2.read_bytes()
+    assert data.endswith(tail)
+    assert data.count(b"xmlns=") == 1
+    assert not (tmp_path / "book.fb2.tmp").exists()
+
+    record = read_metadata(_record(fb2))
+    assert record.title == "Новое название"
+    assert record.authors == ["Иван Петров"]
+    assert record.series == "Цикл"
+    assert record.series_index == 2
+
+
+def test_fb2_writer_keeps_file_encoding(tmp_path):
+    fb2 = tmp_path / "book.fb2"
+    content = _HEAD.format(encoding="windows-1251") + _TAIL.format(blob="QUJD")
+    fb2.write_bytes(content.encode("cp1251"))
+
+    result = FB2MetadataWriter().write(_record(fb2, title="Новое название"))
+
+    assert result.success, result.errors
+    text = fb2.read_bytes().decode("cp1251")
+    assert text.startswith('<?xml version="1.0" encoding="windows-1251"?>')
+    assert "<book-title>Новое название</book-title>" in text
+    assert text.endswith(_TAIL.format(blob="QUJD"))
+
+
+def test_fb2_writer_without_description_fails(tmp_path):
+    fb2 = tmp_path / "book.fb2"
+    fb2.write_text("<FictionBook><body/></FictionBook>", encoding="utf-8")
+
+    result = FB2MetadataWriter().write(_record(fb2, title="T"))
+
+    assert not result.success
+    assert result.errors == ["fb2: no description"]
@@ -15,3 +15,125 @@ def test_move_with_multiple_collisions(tmp_path):
 
     assert result.exists()
     assert "_v" in result.name
+
+
+def test_move_overwrites_by_default(tmp_path):
+    src = tmp_path / "a.fb2"
+    src.write_text("new")
+    dst = tmp_path / "dst"
+    dst.mkdir()
+    (dst / "a.fb2").write_text("old")
+
+    result = move_file(src, dst, "a.fb2", on_collision="overwrite")
+
+    assert result == dst / "a.fb2"
+    assert result.read_text() == "new"
+    assert not src.exists()
+
+
+def test_move_version_never_clobbers(tmp_path):
+    dst = tmp_path / "dst"
+    dst.mkdir()
+    (dst / "a.fb2").write_text("1")
+    (dst / "a_v1.fb2").write_text("2")
+
+    src = tmp_path / "a.fb2"
+    src.write_text("3")
+
+    result = move_file(src, dst, "a.fb2", on_collision="version")
+
+    assert result == dst / "a_v2.fb2"
+    assert [p.read_text() for p in sorted(dst.iterdir())] == ["1", "2", "3"]
+
+
+def test_move_fail_on_collision(tmp_path):
+    import pytest
+    from move.mover import MoveError
+
+    dst = tmp_path / "dst"
+    dst.mkdir()
+    (dst / "a.fb2").write_text("1")
+    src = tmp_path / "a.fb2"
+    src.write_text("2")
+
+    with pytest.raises(MoveError):
+        move_file(src, dst, "a.fb2", on_collision="fail")
+
+    assert src.exists()
+    assert (dst / "a.fb2").read_text() == "1"
+
+
+def test_cross_device_move_copies_and_unlinks(tmp_path, monkeypatch):
+    import errno
+    import os
+
+    src = tmp_path / "a.fb2"
+    src.write_bytes(b"x" * 100_000)
+    dst = tmp_path / "dst"
+
+    real_replace = os.replace
+
+    def replace(a, b):
+        # Only the direct source -> target rename crosses "devices"
+        if str(a) == str(src):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return real_replace(a, b)
+
+    monkeypatch.setattr(os, "replace", replace)
+
+    result = move_file(src, dst, "a.fb2")
+
+    assert result.read_bytes() == b"x" * 100_000
+    assert not src.exists()
+    assert [p.name for p in dst.iterdir()] == ["a.fb2"]
+
+
+def test_recreates_cached_directory_removed_externally(tmp_path):
+    import shutil
+
+    dst = tmp_path / "dst"
+    first = tmp_path / "a.fb2"
+    first.write_text("1")
+    move_file(first, dst, "a.fb2", subdirs=["series"])
+
+    shutil.rmtree(dst)
+
+    second = tmp_path / "b.fb2"
+    second.write_text("2")
+    result = move_file(second, dst, "b.fb2", subdirs=["series"])
+
+    assert result.read_text() == "2"
+
+
+def test_place_file_keeps_source(tmp_path):
+    import os
+    from move.mover import place_file
+
+    src = tmp_path / "a.fb2"
+    src.write_text("book")
+    dst = tmp_path / "dst"
+
+    for mode in ("reflink", "hardlink", "copy"):
+        result = place_file(src, dst, f"{mode}.fb2", mode=mode)
+
+        assert result.read_text() == "book"
+        assert src.read_text() == "book"
+
+    # Same filesystem: the hardlink really is one
+    assert os.stat(dst / "hardlink.fb2").st_ino == os.stat(src).st_ino
+    assert os.stat(dst / "copy.fb2").st_ino != os.stat(src).st_ino
+    assert sorted(p.name for p in dst.iterdir()) == ["copy.fb2", "hardlink.fb2", "reflink.fb2"]
+
+
+def test_clone_file_falls_back_when_reflink_unsupported(tmp_path, monkeypatch):
+    import errno
+    import move.mover as mover
+
+    def no_reflink(src, dst):
+        raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+    monkeypatch.setattr(mover, "reflink", no_reflink)
+    src = tmp_path / "a.fb2"
+    src.write_text("book")
+
+    assert mover.clone_file(src, tmp_path / "b.fb2", "reflink") == "hardlink"
@@ -0,0 +1,33 @@
+import pytest
+
+import ai.providers  # noqa: F401  registers built-in providers
+from ai.registry import register
+from tests.helpers.providers import CountingProvider
+
+
+@pytest.fixture
+def ready(tmp_path, monkeypatch):
+    path = tmp_path / "ready"
+    monkeypatch.setenv("BOOKS_READY_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def inbox(tmp_path, ready, monkeypatch):
+    """NEW_BOOKS_DIR with the dummy provider and a plain filename template."""
+    root = tmp_path / "new_books"
+    root.mkdir()
+    monkeypatch.setenv("AI_PROVIDER", "dummy")
+    monkeypatch.setenv("FILENAME_TEMPLATE", "{Authors} - {Title}")
+    for name in ("DEBUG", "ARCHIVE_DIR", "MOVE_MODE", "WRITE_TO_DESTINATION"):
+        monkeypatch.delenv(name, raising=False)
+    return root
+
+
+@pytest.fixture
+def provider(inbox, monkeypatch):
+    # Depends on inbox so its AI_PROVIDER wins over the dummy default
+    p = CountingProvider()
+    register(p)
+    monkeypatch.setenv("AI_PROVIDER", p.name)
+    return p
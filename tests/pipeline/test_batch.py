@@ -0,0 +1,110 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from ai.batch import BatchState, LocalBatchBackend
+from pipeline.batch import STATE_FILE, export_pending, ingest, submit
+from scanner.directory_scanner import scan_directory
+
+
+@pytest.fixture
+def inbox(inbox):
+    (inbox / "sci-fi").mkdir()
+    return inbox
+
+
+def _answer(title):
+    return {
+        "edition": {"title": title, "authors": ["Batch Author"], "language": "en"},
+        "original": None,
+        "confidence": 0.9,
+    }
+
+
+def test_export_submit_ingest_offline(inbox, tmp_path):
+    (inbox / "sci-fi" / "one.txt").write_text("one")
+    (inbox / "two.txt").write_text("two")
+    directory = tmp_path / "batch"
+
+    state = export_pending(scan_directory(str(inbox)), directory)
+
+    (input_file,) = state.input_files
+    lines = [json.loads(l) for l in open(input_file, encoding="utf-8")]
+    assert [l["custom_id"] for l in lines] == ["book-0", "book-1"]
+    assert all(l["url"] == "/v1/responses" and "input" in l["body"] for l in lines)
+
+    def respond(body):
+        if "two.txt" in body["input"]:
+            raise RuntimeError("server error")
+        return _answer("Batch Title")
+
+    backend = LocalBatchBackend(directory / "local", respond)
+    submitted = submit(directory, backend)
+    (batch_id,) = submitted.batch_ids
+    assert batch_id.startswith("batch_local_")
+
+    results = ingest(directory, backend)
+
+    assert BatchState.load(directory / STATE_FILE).status == "ingested"
+    assert (tmp_path / "ready" / "sci-fi" / "Batch Author - Batch Title.txt").exists()
+    # The failed request leaves its book for the next export
+    failed = [r for r in results if not r.success]
+    assert len(failed) == 1 and "openai batch" in failed[0].errors[0]
+    assert (inbox / "two.txt").exists()
+
+
+def test_submit_twice_is_refused(inbox, tmp_path):
+    (inbox / "two.txt").write_text("two")
+    directory = tmp_path / "batch"
+    export_pending(scan_directory(str(inbox)), directory)
+    backend = LocalBatchBackend(directory / "local", lambda body: _answer("T"))
+
+    submit(directory, backend)
+    with pytest.raises(RuntimeError):
+        submit(directory, backend)
+
+
+def test_export_is_quiet(inbox, tmp_path, capsys):
+    for n in range(3):
+        (inbox / f"book{n}.txt").write_text(f"book {n}")
+
+    export_pending(scan_directory(str(inbox)), tmp_path / "batch")
+
+    out = capsys.readouterr().out
+    assert out.splitlines() == [f"[batch] exported 3 requests: {tmp_path / 'batch' / 'input-000.jsonl'}"]
+
+
+def test_export_is_split_into_batches_within_limits(inbox, tmp_path, monkeypatch):
+    for n in range(5):
+        (inbox / f"book{n}.txt").write_text(f"book {n}")
+    directory = tmp_path / "batch"
+    monkeypatch.setenv("AI_BATCH_MAX_REQUESTS", "2")
+
+    state = export_pending(scan_directory(str(inbox)), directory)
+
+    sizes = [len(open(f, encoding="utf-8").readlines()) for f in state.input_files]
+    assert sizes == [2, 2, 1]
+
+    backend = LocalBatchBackend(directory / "local", lambda body: _answer("Batch Title"))
+    assert len(submit(directory, backend).batch_ids) == 3
+
+    results = ingest(directory, backend)
+
+    assert len(results) == 5 and all(r.success for r in results)
+    assert len(BatchState.load(directory / STATE_FILE).output_files) == 3
+    assert not list(inbox.glob("*.txt"))
+
+
+def test_export_file_stays_under_byte_limit(inbox, tmp_path, monkeypatch):
+    for n in range(4):
+        (inbox / f"book{n}.txt").write_text(f"book {n}")
+    directory = tmp_path / "batch"
+    export_pending(scan_directory(str(inbox)), tmp_path / "single")
+    line_size = max(len(l.encode("utf-8")) for l in open(tmp_path / "single" / "input-000.jsonl", encoding="utf-8"))
+    monkeypatch.setenv("AI_BATCH_MAX_BYTES", str(line_size * 2 + 1))
+
+    state = export_pending(scan_directory(str(inbox)), directory)
+
+    assert len(state.input_files) == 2
+    assert all(Path(f).stat().st_size <= line_size * 2 + 1 for f in state.input_files)
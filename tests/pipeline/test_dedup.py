@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from pipeline.dedup import DedupIndex, content_hash
+from pipeline.executor import PipelineExecutor
+from pipeline.watcher import _Watcher
+from scanner.directory_scanner import iter_directory
+
+
+@pytest.fixture
+def inbox(inbox):
+    (inbox / "a").mkdir()
+    (inbox / "b").mkdir()
+    return inbox
+
+
+@pytest.fixture
+def provider(provider):
+    provider.title = "Title {n}"
+    return provider
+
+
+def _watcher(inbox, tmp_path, action):
+    watcher = _Watcher(str(inbox), [], None, None, 0)
+    watcher.dedup = DedupIndex(tmp_path / "dedup.sqlite")
+    watcher.dedup_action = action
+    watcher.executor = PipelineExecutor()
+    return watcher
+
+
+def test_content_hash_ignores_name(tmp_path):
+    (tmp_path / "x.txt").write_bytes(b"same" * 1000)
+    (tmp_path / "y.txt").write_bytes(b"same" * 1000)
+    (tmp_path / "z.txt").write_bytes(b"diff" * 1000)
+
+    assert content_hash(str(tmp_path / "x.txt")) == content_hash(str(tmp_path / "y.txt"))
+    assert content_hash(str(tmp_path / "x.txt")) != content_hash(str(tmp_path / "z.txt"))
+
+
+def test_duplicate_is_skipped_without_ai(inbox, provider, tmp_path):
+    (inbox / "a" / "book.txt").write_text("content")
+    watcher = _watcher(inbox, tmp_path, "skip")
+    assert watcher._scan_and_process() == 1
+
+    (inbox / "b" / "copy.txt").write_text("content")
+    assert watcher._scan_and_process() == 0
+    assert watcher._scan_and_process() == 0
+
+    assert provider.calls == 1
+    # Never deleted: without ARCHIVE_DIR or QUARANTINE_DIR it stays put
+    assert (inbox / "b" / "copy.txt").read_text() == "content"
+    assert not (tmp_path / "ready" / "b").exists()
+
+
+def test_skipped_duplicate_goes_to_quarantine(inbox, provider, tmp_path):
+    (inbox / "a" / "book.txt").write_text("content")
+    watcher = _watcher(inbox, tmp_path, "skip")
+    watcher.quarantine_dir = tmp_path / "quarantine"
+    watcher._scan_and_process()
+
+    (inbox / "b" / "copy.txt").write_text("content")
+    watcher._scan_and_process()
+
+    assert provider.calls == 1
+    assert not (inbox / "b" / "copy.txt").exists()
+    assert (tmp_path / "quarantine" / "b" / "copy.txt").read_text() == "content"
+
+
+def test_copy_in_flight_is_not_admitted(inbox, tmp_path):
+    (inbox / "a" / "book.txt").write_text("content")
+    (inbox / "b" / "copy.txt").write_text("content")
+    first, second = sorted(iter_directory(str(inbox)), key=lambda r: r.path)
+    watcher = _watcher(inbox, tmp_path, "skip")
+
+    assert watcher._admit(first)
+    assert not watcher._admit(second)
+
+    # The first job fails: its claim is released
+    watcher._indexed(first, None)
+    assert watcher._admit(second)
+    assert (inbox / "a" / "book.txt").exists() and (inbox / "b" / "copy.txt").exists()
+
+
+def test_duplicate_is_linked_into_its_directory(inbox, provider, tmp_path):
+    (inbox / "a" / "book.txt").write_text("content")
+    watcher = _watcher(inbox, tmp_path, "link")
+    watcher._scan_and_process()
+    first = tmp_path / "ready" / "a" / "Some Author - Title 1.txt"
+
+    (inbox / "b" / "copy.txt").write_text("content")
+    watcher._scan_and_process()
+
+    linked = tmp_path / "ready" / "b" / "Some Author - Title 1.txt"
+    assert provider.calls == 1
+    assert os.stat(linked).st_ino == os.stat(first).st_ino
+    assert (inbox / "b" / "copy.txt").exists()
+
+
+def test_duplicate_replaces_earlier_output(inbox, provider, tmp_path):
+    (inbox / "a" / "book.txt").write_text("content")
+    watcher = _watcher(inbox, tmp_path, "replace")
+    watcher._scan_and_process()
+
+    (inbox / "b" / "copy.txt").write_text("content")
+    watcher._scan_and_process()
+
+    assert provider.calls == 2
+    assert not (tmp_path / "ready" / "a" / "Some Author - Title 1.txt").exists()
+    replacement = tmp_path / "ready" / "b" / "Some Author - Title 2.txt"
+    assert replacement.exists()
+    assert watcher.dedup.lookup(content_hash(str(replacement))) == replacement
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+from pipeline.executor import AsyncPipelineExecutor, PipelineExecutor
+
+
+def test_inline_executor_runs_in_caller_thread():
+    seen = []
+
+    with PipelineExecutor(1) as executor:
+        executor.submit("a", lambda: seen.append(threading.current_thread()))
+        executor.wait()
+
+    assert seen == [threading.current_thread()]
+
+
+def test_tasks_run_concurrently():
+    barrier = threading.Barrier(3, timeout=2)
+    done = []
+
+    def task(n):
+        barrier.wait()
+        done.append(n)
+
+    with PipelineExecutor(3) as executor:
+        for n in range(3):
+            executor.submit(str(n), lambda n=n: task(n))
+        executor.wait()
+
+    assert sorted(done) == [0, 1, 2]
+
+
+def test_duplicate_key_is_not_submitted_while_in_flight():
+    release = threading.Event()
+    calls = []
+
+    def task():
+        calls.append(1)
+        release.wait(2)
+
+    with PipelineExecutor(2) as executor:
+        assert executor.submit("book.fb2", task)
+        assert not executor.submit("book.fb2", task)
+        release.set()
+        executor.wait()
+
+        assert executor.submit("book.fb2", lambda: calls.append(1))
+        executor.wait()
+
+    assert len(calls) == 2
+
+
+def test_concurrency_is_bounded():
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def task():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+
+    with PipelineExecutor(2) as executor:
+        for n in range(10):
+            executor.submit(str(n), task)
+        executor.wait()
+
+    assert peak <= 2
+
+
+def test_async_executor_overlaps_coroutines():
+    started = []
+
+    async def task(n):
+        started.append(n)
+        await asyncio.sleep(0.05)
+
+    executor = AsyncPipelineExecutor(10)
+    t0 = time.monotonic()
+    for n in range(10):
+        executor.submit(str(n), lambda n=n: task(n))
+    executor.wait()
+    elapsed = time.monotonic() - t0
+    executor.shutdown()
+
+    assert sorted(started) == list(range(10))
+    assert elapsed < 0.4
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from pipeline.executor import PipelineExecutor
+from pipeline.failures import FailureRegistry
+from pipeline.job_store import JobStore
+from pipeline.watcher import _Watcher
+
+
+@pytest.fixture
+def inbox(inbox, monkeypatch):
+    # No FILENAME_TEMPLATE: every run fails at rename and the file stays put
+    monkeypatch.delenv("FILENAME_TEMPLATE")
+    return inbox
+
+
+def _watcher(inbox, tmp_path, failures, quarantine_dir=None):
+    watcher = _Watcher(str(inbox), [], None, JobStore(tmp_path / "state.sqlite"), 0)
+    watcher.failures = failures
+    watcher.quarantine_dir = quarantine_dir
+    watcher.executor = PipelineExecutor()
+    return watcher
+
+
+def test_backoff_grows_and_resets_on_change(tmp_path):
+    book = tmp_path / "book.txt"
+    book.write_text("dummy")
+    registry = FailureRegistry(tmp_path / "state.sqlite", backoff_seconds=10)
+
+    assert registry.is_due(str(book))
+    assert registry.record_failure(str(book), ["rename: boom"]) == 1
+    assert not registry.is_due(str(book))
+    assert registry.is_due(str(book), now=time.time() + 11)
+
+    registry.record_failure(str(book), ["rename: boom"])
+    state = registry.get(str(book))
+    assert state.attempts == 2
+    assert state.next_retry - time.time() > 15
+
+    book.write_text("a different, longer body")
+    assert registry.get(str(book)) is None
+    assert registry.is_due(str(book))
+
+
+def test_failed_file_is_skipped_while_backing_off(inbox, provider, tmp_path):
+    (inbox / "book.txt").write_text("dummy")
+    watcher = _watcher(inbox, tmp_path, FailureRegistry(tmp_path / "state.sqlite", backoff_seconds=60))
+
+    assert watcher._scan_and_process() == 1
+    assert watcher._scan_and_process() == 0
+    assert provider.calls == 1
+
+
+def test_retry_reuses_cached_stages(inbox, provider, tmp_path):
+    (inbox / "book.txt").write_text("dummy")
+    watcher = _watcher(inbox, tmp_path, FailureRegistry(tmp_path / "state.sqlite", backoff_seconds=0))
+
+    for _ in range(3):
+        assert watcher._scan_and_process() == 1
+
+    assert provider.calls == 1
+    assert watcher.failures.get(str(inbox / "book.txt")).attempts == 3
+
+
+def test_quarantine_after_max_attempts(inbox, provider, tmp_path):
+    sub = inbox / "series"
+    sub.mkdir()
+    book = sub / "book.txt"
+    book.write_text("dummy")
+    quarantine = tmp_path / "quarantine"
+    failures = FailureRegistry(tmp_path / "state.sqlite", backoff_seconds=0, max_attempts=2)
+    watcher = _watcher(inbox, tmp_path, failures, quarantine)
+
+    watcher._scan_and_process()
+    assert book.exists()
+
+    watcher._scan_and_process()
+    assert not book.exists()
+    assert (quarantine / "series" / "book.txt").exists()
+    assert failures.get(str(book)) is None
+    assert watcher.job_store.stage_of(str(book)) is None
+
+
+def test_quarantine_keeps_earlier_file_with_same_name(inbox, provider, tmp_path):
+    book = inbox / "book.txt"
+    book.write_text("dummy")
+    quarantine = tmp_path / "quarantine"
+    quarantine.mkdir()
+    (quarantine / "book.txt").write_text("earlier")
+    failures = FailureRegistry(tmp_path / "state.sqlite", backoff_seconds=0, max_attempts=1)
+    watcher = _watcher(inbox, tmp_path, failures, quarantine)
+
+    watcher._scan_and_process()
+
+    assert not book.exists()
+    assert (quarantine / "book.txt").read_text() == "earlier"
+    assert (quarantine / "book_v1.txt").read_text() == "dummy"
@@ -0,0 +1,146 @@
+import pytest
+
+import ai.providers  # noqa: F401  registers built-in providers
+from ai.base import AIProvider
+from ai.registry import register
+from models.book import BookRecord
+from pipeline.executor import PipelineExecutor
+from pipeline.grouping import GroupEnricher, group_records, series_key, windows
+from pipeline.watcher import _Watcher
+
+
+def _record(name, directories=("Author", "Series")) -> BookRecord:
+    return BookRecord(
+        path=f"/in/{'/'.join(directories)}/{name}",
+        original_filename=name,
+        extension="txt",
+        directories=list(directories),
+    )
+
+
+class GroupProvider(AIProvider):
+    name = "group-provider"
+
+    def __init__(self):
+        self.single = 0
+        self.groups = []
+
+    def enrich(self, record: BookRecord) -> BookRecord:
+        self.single += 1
+        record.title = f"Single {record.original_filename}"
+        record.authors = ["Author"]
+        record.source = "ai"
+        return record
+
+    def enrich_group(self, records):
+        self.groups.append([r.original_filename for r in records])
+        for r in records:
+            r.title = f"Grouped {r.original_filename}"
+            r.authors = ["Author"]
+            r.source = "ai"
+        return records
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    p = GroupProvider()
+    register(p)
+    monkeypatch.setenv("AI_PROVIDER", p.name)
+    return p
+
+
+def test_series_key_drops_volume_numbers():
+    assert series_key("01 Ересь Хоруса. Том 1.fb2") == series_key("12 Ересь Хоруса. Том 12.fb2")
+    assert series_key("Dune Book 2.epub") == "dune"
+
+
+def test_groups_need_same_directory_and_similar_names():
+    records = [
+        _record("01 Horus Rising.fb2"),
+        _record("02 Horus Rising.fb2"),
+        _record("03 Horus Rising.fb2"),
+        _record("Unrelated Cookbook.fb2"),
+        _record("04 Horus Rising.fb2", directories=("Other",)),
+    ]
+
+    groups = group_records(records, max_size=2)
+
+    assert [[r.original_filename for r in g] for g in groups] == [
+        ["01 Horus Rising.fb2", "02 Horus Rising.fb2"],
+    ]
+    assert len(group_records(records, max_size=12)[0]) == 3
+
+
+def test_first_member_calls_for_the_group(provider):
+    a, b, c = _record("01 Saga.txt"), _record("02 Saga.txt"), _record("Alone.txt")
+    enricher = GroupEnricher()
+    enricher.add([[a, b]])
+
+    first = enricher.enrich(a, provider.name)
+    second = enricher.enrich(b, provider.name)
+
+    assert provider.groups == [["01 Saga.txt", "02 Saga.txt"]]
+    assert first.title == "Grouped 01 Saga.txt"
+    assert second.title == "Grouped 02 Saga.txt"
+    assert enricher.enrich(c, provider.name) is None
+    assert len(enricher) == 0
+
+
+def test_watcher_enriches_series_with_one_call(provider, tmp_path, monkeypatch):
+    inbox = tmp_path / "new_books"
+    series = inbox / "Author" / "Saga"
+    series.mkdir(parents=True)
+    for n in range(1, 4):
+        (series / f"0{n} Saga.txt").write_text(f"volume {n}")
+    (inbox / "Alone.txt").write_text("alone")
+    monkeypatch.setenv("ENRICH_GROUPS", "1")
+    monkeypatch.setenv("BOOKS_READY_DIR", str(tmp_path / "ready"))
+    monkeypatch.setenv("FILENAME_TEMPLATE", "{Authors} - {Title}")
+    monkeypatch.delenv("DEBUG", raising=False)
+
+    watcher = _Watcher(str(inbox), [], None, None, 0)
+    watcher.executor = PipelineExecutor()
+
+    assert watcher._scan_and_process() == 4
+    assert len(provider.groups) == 1
+    assert sorted(provider.groups[0]) == ["01 Saga.txt", "02 Saga.txt", "03 Saga.txt"]
+    assert provider.single == 1
+    assert (tmp_path / "ready" / "Author" / "Saga" / "Author - Grouped 02 Saga.txt.txt").exists()
+
+
+def test_windows_follow_directories_and_size():
+    records = [_record(f"0{n} Saga.txt") for n in range(1, 6)] + [_record("Other.txt", directories=("Other",))]
+
+    assert [[r.original_filename for r in w] for w in windows(records, size=3)] == [
+        ["01 Saga.txt", "02 Saga.txt", "03 Saga.txt"],
+        ["04 Saga.txt", "05 Saga.txt"],
+        ["Other.txt"],
+    ]
+
+
+def test_watcher_reads_each_member_once(provider, tmp_path, monkeypatch):
+    inbox = tmp_path / "new_books"
+    series = inbox / "Author" / "Saga"
+    series.mkdir(parents=True)
+    for n in range(1, 4):
+        (series / f"0{n} Saga.txt").write_text(f"volume {n}")
+    monkeypatch.setenv("ENRICH_GROUPS", "1")
+    monkeypatch.setenv("BOOKS_READY_DIR", str(tmp_path / "ready"))
+    monkeypatch.setenv("FILENAME_TEMPLATE", "{Authors} - {Title}")
+    monkeypatch.delenv("DEBUG", raising=False)
+
+    reads = []
+
+    def counting_read(record):
+        reads.append(record.original_filename)
+        return record
+
+    monkeypatch.setattr("pipeline.grouping.read_metadata", counting_read)
+    monkeypatch.setattr("pipeline.stages.read_metadata", counting_read)
+
+    watcher = _Watcher(str(inbox), [], None, None, 0)
+    watcher.executor = PipelineExecutor()
+
+    assert watcher._scan_and_process() == 3
+    assert provider.groups == [["01 Saga.txt", "02 Saga.txt", "03 Saga.txt"]]
+    assert sorted(reads) == ["01 Saga.txt", "02 Saga.txt", "03 Saga.txt"]
@@ -0,0 +1,76 @@
+from datetime import date
+
+import pytest
+
+from models.book import BookRecord, OriginalWork
+from models.serialize import book_record_from_dict, book_record_to_dict
+from pipeline.job_store import JobStore
+from pipeline.process_file import process_file
+from scanner.file_scanner import scan_file
+
+
+@pytest.fixture
+def inbox(inbox, monkeypatch):
+    # No FILENAME_TEMPLATE: the first run fails at rename
+    monkeypatch.delenv("FILENAME_TEMPLATE")
+    return inbox
+
+
+def test_record_serialization_roundtrip():
+    record = BookRecord(
+        path="a.fb2",
+        original_filename="a.fb2",
+        extension="fb2",
+        directories=["x"],
+        title="T",
+        published=date(2006, 4, 1),
+        original=OriginalWork(title="O", authors=["A"], year=2006),
+    )
+
+    assert book_record_from_dict(book_record_to_dict(record)) == record
+
+
+def test_resume_skips_ai_after_late_failure(inbox, provider, tmp_path, monkeypatch):
+    book = inbox / "book.txt"
+    book.write_text("dummy")
+    store = JobStore(tmp_path / "jobs.sqlite")
+
+    first = process_file(scan_file(str(book), str(inbox)), store)
+
+    assert not first.success
+    assert provider.calls == 1
+    assert store.stage_of(str(book)) == "write"
+
+    monkeypatch.setenv("FILENAME_TEMPLATE", "{Title}")
+    second = process_file(scan_file(str(book), str(inbox)), store)
+
+    assert second.success
+    assert second.final_path.name == "Counted.txt"
+    assert provider.calls == 1
+    assert store.stage_of(str(book)) is None
+
+
+def test_changed_file_discards_checkpoint(inbox, provider, tmp_path, monkeypatch):
+    book = inbox / "book.txt"
+    book.write_text("dummy")
+    store = JobStore(tmp_path / "jobs.sqlite")
+
+    process_file(scan_file(str(book), str(inbox)), store)
+    book.write_text("a different, longer body")
+
+    monkeypatch.setenv("FILENAME_TEMPLATE", "{Title}")
+    result = process_file(scan_file(str(book), str(inbox)), store)
+
+    assert result.success
+    assert provider.calls == 2
+
+
+def test_failed_ai_call_is_not_checkpointed(inbox, tmp_path, monkeypatch):
+    monkeypatch.setenv("AI_PROVIDER", "missing-provider")
+    book = inbox / "book.txt"
+    book.write_text("dummy")
+    store = JobStore(tmp_path / "jobs.sqlite")
+
+    process_file(scan_file(str(book), str(inbox)), store)
+
+    assert store.stage_of(str(book)) == "read"
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from pipeline.process_file import aprocess_file, process_file
+from scanner.file_scanner import scan_file
+
+
+@pytest.fixture
+def inbox(inbox):
+    (inbox / "sci-fi").mkdir()
+    return inbox
+
+
+def test_process_file_moves_renamed_book(inbox, ready):
+    book = inbox / "sci-fi" / "book.txt"
+    book.write_text("dummy")
+
+    result = process_file(scan_file(str(book), str(inbox)))
+
+    assert result.success
+    assert result.final_path == ready / "sci-fi" / "AI Author - AI Title.txt"
+    assert result.final_path.exists()
+    assert not book.exists()
+
+
+def test_aprocess_file_matches_process_file(inbox, ready):
+    book = inbox / "sci-fi" / "book.txt"
+    book.write_text("dummy")
+
+    result = asyncio.run(aprocess_file(scan_file(str(book), str(inbox))))
+
+    assert result.success
+    assert result.record.title == "AI Title"
+    assert result.final_path == ready / "sci-fi" / "AI Author - AI Title.txt"
+    assert not book.exists()
+
+
+def test_process_file_reports_rename_failure(inbox, monkeypatch):
+    monkeypatch.delenv("FILENAME_TEMPLATE")
+    book = inbox / "book.txt"
+    book.write_text("dummy")
+
+    result = process_file(scan_file(str(book), str(inbox)))
+
+    assert not result.success
+    assert any(e.startswith("rename:") for e in result.errors)
+    assert book.exists()
+
+
+def test_write_to_destination_writes_once_and_removes_source(inbox, ready, monkeypatch):
+    from metadata import read_metadata
+    from models.book import BookRecord
+
+    monkeypatch.setenv("WRITE_TO_DESTINATION", "1")
+    book = inbox / "sci-fi" / "book.fb2"
+    book.write_text(
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        "<FictionBook><description><title-info><book-title>Old</book-title></title-info></description>"
+        "<body><p>text</p></body></FictionBook>",
+        encoding="utf-8",
+    )
+
+    result = process_file(scan_file(str(book), str(inbox)))
+
+    assert result.success, result.errors
+    assert result.final_path == ready / "sci-fi" / "AI Author - AI Title.fb2"
+    assert not book.exists()
+    assert sorted(p.name for p in (ready / "sci-fi").iterdir()) == ["AI Author - AI Title.fb2"]
+
+    written = read_metadata(BookRecord(
+        path=str(result.final_path),
+        original_filename=result.final_path.name,
+        extension="fb2",
+        directories=[],
+    ))
+    assert written.title == "AI Title"
+    assert written.authors == ["AI Author"]
+
+
+def test_write_to_destination_moves_unsupported_files(inbox, ready, monkeypatch):
+    monkeypatch.setenv("WRITE_TO_DESTINATION", "1")
+    book = inbox / "sci-fi" / "book.txt"
+    book.write_text("dummy")
+
+    result = process_file(scan_file(str(book), str(inbox)))
+
+    assert result.success
+    assert result.final_path.read_text() == "dummy"
+    assert sorted(p.name for p in (ready / "sci-fi").iterdir()) == ["AI Author - AI Title.txt"]
+
+
+def test_copy_mode_keeps_original_and_archives_it(inbox, tmp_path, monkeypatch):
+    archive = tmp_path / "archive"
+    monkeypatch.setenv("MOVE_MODE", "copy")
+    monkeypatch.setenv("ARCHIVE_DIR", str(archive))
+    book = inbox / "sci-fi" / "book.fb2"
+    original = (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        "<FictionBook><description><title-info><book-title>Old</book-title></title-info></description>"
+        "<body><p>text</p></body></FictionBook>"
+    )
+    book.write_text(original, encoding="utf-8")
+
+    result = process_file(scan_file(str(book), str(inbox)))
+
+    assert result.success, result.errors
+    assert "AI Title" in result.final_path.read_text(encoding="utf-8")
+    assert not book.exists()
+    assert (archive / "sci-fi" / "book.fb2").read_text(encoding="utf-8") == original
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from pipeline.staged import StagedPipeline, StageSpec, stages_from_env
+from pipeline.stages import read_stage
+from scanner.file_scanner import scan_file
+
+
+@pytest.fixture
+def inbox(inbox, monkeypatch):
+    monkeypatch.setenv("FILENAME_TEMPLATE", "{Title}")
+    return inbox
+
+
+def _collect():
+    results = {}
+    lock = threading.Lock()
+
+    def on_result(record, result):
+        with lock:
+            results[record.original_filename] = result
+
+    return results, on_result
+
+
+def test_staged_pipeline_processes_all_books(inbox):
+    records = []
+    for n in range(5):
+        book = inbox / f"book{n}.txt"
+        book.write_text("dummy")
+        records.append(scan_file(str(book), str(inbox)))
+
+    results, on_result = _collect()
+
+    with StagedPipeline(stages_from_env(), on_result) as pipeline:
+        for record in records:
+            assert pipeline.submit(record)
+        pipeline.wait()
+
+        assert set(pipeline.queue_depths()) == {"read", "enrich", "merge", "write", "rename", "move"}
+        assert all(depth == 0 for depth in pipeline.queue_depths().values())
+        assert pipeline.stats()["enrich"].processed == 5
+
+    assert len(results) == 5
+    assert all(r.success for r in results.values())
+    assert not any(inbox.iterdir())
+
+
+def test_failed_stage_short_circuits_remaining_stages(inbox):
+    book = inbox / "book.txt"
+    book.write_text("dummy")
+
+    def broken(job):
+        raise RuntimeError("boom")
+
+    visited = []
+
+    def later(job):
+        visited.append(job)
+        return job
+
+    results, on_result = _collect()
+    stages = [StageSpec("read", read_stage), StageSpec("broken", broken), StageSpec("later", later)]
+
+    with StagedPipeline(stages, on_result) as pipeline:
+        pipeline.submit(scan_file(str(book), str(inbox)))
+        pipeline.wait()
+
+    assert visited == []
+    assert results["book.txt"].errors == ["broken: boom"]
+
+
+def test_read_stage_in_process_pool(inbox, ready, monkeypatch):
+    monkeypatch.setenv("STAGE_READ_PROCESSES", "1")
+    book = inbox / "book.txt"
+    book.write_text("dummy")
+
+    results, on_result = _collect()
+
+    with StagedPipeline(stages_from_env(), on_result) as pipeline:
+        assert pipeline.stages[0].processes
+        pipeline.submit(scan_file(str(book), str(inbox)))
+        pipeline.wait()
+
+    assert results["book.txt"].success
+    assert (ready / "AI Title.txt").exists()
@@ -0,0 +1,77 @@
+from pathlib import Path
+
+from models.pipeline import PipelineResult
+from pipeline.watcher import _Watcher
+from scanner.manifest import FileManifest
+
+
+def _watcher(inbox, manifest_path):
+    return _Watcher(str(inbox), [], FileManifest.load(manifest_path), None, 0)
+
+
+def test_crash_before_completion_rescans_file(tmp_path):
+    inbox = tmp_path / "new_books"
+    inbox.mkdir()
+    (inbox / "book.fb2").write_text("dummy")
+    manifest_path = tmp_path / "manifest.json"
+
+    watcher = _watcher(inbox, manifest_path)
+    assert [r.original_filename for r in watcher._scan()] == ["book.fb2"]
+    # Crash: the job never reports; a new process loads the saved manifest
+
+    restarted = _watcher(inbox, manifest_path)
+    assert [r.original_filename for r in restarted._scan()] == ["book.fb2"]
+
+
+def test_completed_file_is_not_rescanned(tmp_path):
+    inbox = tmp_path / "new_books"
+    inbox.mkdir()
+    (inbox / "book.fb2").write_text("dummy")
+    manifest_path = tmp_path / "manifest.json"
+
+    watcher = _watcher(inbox, manifest_path)
+    (record,) = watcher._scan()
+    # Kept original (MOVE_MODE=copy): the file stays in the inbox
+    watcher.report(record, PipelineResult(True, record, Path(tmp_path / "ready" / "book.fb2")))
+    # End of the scan pass
+    watcher._save_manifest()
+
+    restarted = _watcher(inbox, manifest_path)
+    assert list(restarted._scan()) == []
+
+
+def test_failed_file_is_rescanned(tmp_path):
+    inbox = tmp_path / "new_books"
+    inbox.mkdir()
+    (inbox / "book.fb2").write_text("dummy")
+    manifest_path = tmp_path / "manifest.json"
+
+    watcher = _watcher(inbox, manifest_path)
+    (record,) = watcher._scan()
+    watcher.report(record, PipelineResult(False, errors=["rename: boom"]))
+    watcher._save_manifest()
+
+    restarted = _watcher(inbox, manifest_path)
+    assert [r.original_filename for r in restarted._scan()] == ["book.fb2"]
+
+
+def test_manifest_is_saved_per_pass_not_per_file(tmp_path, monkeypatch):
+    inbox = tmp_path / "new_books"
+    inbox.mkdir()
+    for n in range(3):
+        (inbox / f"book{n}.fb2").write_text(f"dummy {n}")
+    manifest_path = tmp_path / "manifest.json"
+
+    watcher = _watcher(inbox, manifest_path)
+    saves = []
+    monkeypatch.setattr(watcher.manifest, "save", lambda: saves.append(1))
+
+    records = list(watcher._scan())
+    saves.clear()
+    for record in records:
+        watcher.report(record, PipelineResult(True, record, Path(tmp_path / "ready" / record.original_filename)))
+    assert saves == []
+
+    watcher.manifest_save_seconds = 0
+    watcher.report(record, PipelineResult(True, record, Path(tmp_path / "ready" / record.original_filename)))
+    assert saves == [1]
@@ -1,4 +1,4 @@
-from scanner.directory_scanner import scan_directory
+from scanner.directory_scanner import iter_directory, scan_directory
 
 
 def test_empty_directory(tmp_path):
@@ -50,3 +50,43 @@ def test_nonexistent_root(tmp_path):
         assert "does not exist" in str(e)
     else:
         assert False, "Expected ValueError"
+
+
+def test_iter_directory_is_lazy(tmp_path):
+    root = tmp_path / "new_books"
+    root.mkdir()
+    (root / "a.fb2").write_text("dummy")
+    (root / "b.fb2").write_text("dummy")
+
+    it = iter_directory(str(root))
+
+    assert next(it).original_filename == "a.fb2"
+    assert next(it).original_filename == "b.fb2"
+
+
+def test_hidden_and_tmp_entries_are_pruned(tmp_path):
+    root = tmp_path / "new_books"
+    hidden = root / ".sync" / "nested"
+    hidden.mkdir(parents=True)
+    (hidden / "book.fb2").write_text("dummy")
+    (root / ".hidden.fb2").write_text("dummy")
+    (root / "book.epub.tmp").write_text("dummy")
+    (root / "book.epub").write_text("dummy")
+
+    records = scan_directory(str(root))
+
+    assert [r.original_filename for r in records] == ["book.epub"]
+
+
+def test_user_ignore_globs(tmp_path):
+    root = tmp_path / "new_books"
+    (root / "incoming").mkdir(parents=True)
+    (root / "archive" / "old").mkdir(parents=True)
+    (root / "incoming" / "book.fb2").write_text("dummy")
+    (root / "incoming" / "cover.jpg").write_text("dummy")
+    (root / "archive" / "old" / "book.fb2").write_text("dummy")
+
+    records = scan_directory(str(root), ignore=["archive", "*.jpg"])
+
+    assert len(records) == 1
+    assert records[0].directories == ["incoming"]
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from scanner.inotify import InotifyUnavailable, InotifyWatcher
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    root = tmp_path / "new_books"
+    (root / "sci-fi").mkdir(parents=True)
+    try:
+        w = InotifyWatcher(str(root))
+    except InotifyUnavailable as e:
+        pytest.skip(str(e))
+    yield root, w
+    w.close()
+
+
+def test_reports_closed_file(watcher):
+    root, w = watcher
+
+    (root / "sci-fi" / "book.fb2").write_text("dummy")
+
+    events = w.read(timeout=2)
+
+    assert [r.original_filename for r in events.records] == ["book.fb2"]
+    assert events.records[0].directories == ["sci-fi"]
+
+
+def test_reports_moved_in_file_and_ignores_tmp(watcher, tmp_path):
+    root, w = watcher
+
+    outside = tmp_path / "book.epub"
+    outside.write_text("dummy")
+    os.rename(outside, root / "book.epub")
+    (root / "book.epub.tmp").write_text("dummy")
+
+    events = w.read(timeout=2)
+
+    assert [r.original_filename for r in events.records] == ["book.epub"]
+
+
+def test_moved_in_directory_is_watched(watcher, tmp_path):
+    root, w = watcher
+
+    incoming = tmp_path / "series"
+    incoming.mkdir()
+    (incoming / "01.fb2").write_text("dummy")
+    os.rename(incoming, root / "series")
+
+    events = w.read(timeout=2)
+    assert [r.original_filename for r in events.records] == ["01.fb2"]
+
+    (root / "series" / "02.fb2").write_text("dummy")
+    events = w.read(timeout=2)
+    assert [r.directories for r in events.records] == [["series"]]
+
+
+def test_timeout_without_events(watcher):
+    _, w = watcher
+
+    events = w.read(timeout=0.05)
+
+    assert events.records == []
+    assert not events.overflow
@@ -0,0 +1,85 @@
+import os
+
+from scanner.directory_scanner import scan_directory_incremental
+from scanner.manifest import FileManifest
+
+
+def test_first_scan_reports_all_files(tmp_path):
+    root = tmp_path / "new_books"
+    (root / "sci-fi").mkdir(parents=True)
+    (root / "sci-fi" / "a.fb2").write_text("a")
+    (root / "b.epub").write_text("b")
+
+    manifest = FileManifest(tmp_path / "manifest.json")
+    delta = scan_directory_incremental(str(root), manifest)
+
+    assert {r.original_filename for r in delta.changed} == {"a.fb2", "b.epub"}
+    assert delta.removed == []
+    assert len(manifest) == 2
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    root = tmp_path / "new_books"
+    root.mkdir()
+    (root / "a.fb2").write_text("a")
+
+    manifest = FileManifest(tmp_path / "manifest.json")
+    scan_directory_incremental(str(root), manifest)
+
+    delta = scan_directory_incremental(str(root), manifest)
+
+    assert delta.changed == []
+    assert delta.removed == []
+
+
+def test_changed_and_removed_files(tmp_path):
+    root = tmp_path / "new_books"
+    root.mkdir()
+    a = root / "a.fb2"
+    b = root / "b.fb2"
+    a.write_text("a")
+    b.write_text("b")
+
+    manifest = FileManifest(tmp_path / "manifest.json")
+    scan_directory_incremental(str(root), manifest)
+
+    a.write_text("changed content")
+    st = a.stat()
+    os.utime(a, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    b.unlink()
+
+    delta = scan_directory_incremental(str(root), manifest)
+
+    assert [r.original_filename for r in delta.changed] == ["a.fb2"]
+    assert delta.removed == [str(b.resolve())]
+
+
+def test_manifest_roundtrip(tmp_path):
+    root = tmp_path / "new_books"
+    root.mkdir()
+    (root / "a.fb2").write_text("a")
+
+    manifest_path = tmp_path / "state" / "manifest.json"
+    manifest = FileManifest(manifest_path)
+    scan_directory_incremental(str(root), manifest)
+    manifest.save()
+
+    reloaded = FileManifest.load(manifest_path)
+    delta = scan_directory_incremental(str(root), reloaded)
+
+    assert len(reloaded) == 1
+    assert delta.changed == []
+
+
+def test_changed_files_left_to_caller(tmp_path):
+    root = tmp_path / "new_books"
+    root.mkdir()
+    (root / "a.fb2").write_text("a")
+
+    manifest = FileManifest(tmp_path / "manifest.json")
+    first = scan_directory_incremental(str(root), manifest, update_changed=False)
+    second = scan_directory_incremental(str(root), manifest, update_changed=False)
+
+    assert [r.original_filename for r in first.changed] == ["a.fb2"]
+    assert [r.original_filename for r in second.changed] == ["a.fb2"]
+    assert len(manifest) == 0
@@ -0,0 +1,52 @@
+import errno
+import os
+
+_CHUNK = 1024 * 1024
+
+# errnos meaning "this fast path is not available here", not a real I/O error
+_UNSUPPORTED = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+
+def copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> None:
+    """
+    Copy `count` bytes of src_fd starting at `offset` to the current
+    position of dst_fd (which advances). Uses copy_file_range, then
+    sendfile, and falls back to a userspace read/write loop.
+    """
+    copied = 0
+
+    if hasattr(os, "copy_file_range"):
+        copied = _kernel_copy(
+            lambda off, n: os.copy_file_range(src_fd, dst_fd, n, off), offset, count
+        )
+
+    if copied < count and hasattr(os, "sendfile"):
+        copied += _kernel_copy(
+            lambda off, n: os.sendfile(dst_fd, src_fd, off, n), offset + copied, count - copied
+        )
+
+    while copied < count:
+        chunk = os.pread(src_fd, min(_CHUNK, count - copied), offset + copied)
+        if not chunk:
+            raise EOFError(f"source ended {count - copied} bytes early")
+        view = memoryview(chunk)
+        while view:
+            written = os.write(dst_fd, view)
+            view = view[written:]
+        copied += len(chunk)
+
+
+def _kernel_copy(call, offset: int, count: int) -> int:
+    """Run a copy syscall until done; returns bytes copied before giving up."""
+    copied = 0
+    while copied < count:
+        try:
+            n = call(offset + copied, min(count - copied, 1 << 30))
+        except OSError as e:
+            if e.errno in _UNSUPPORTED and copied == 0:
+                return 0
+            raise
+        if n == 0:
+            break
+        copied += n
+    return copied